@@ -10,19 +10,42 @@ This is part of Phase 3 (Analytical Modules) of the MPAgent project.
 """
 
 import os
-import json
+import time
+from functools import lru_cache, partial
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait, FIRST_COMPLETED
 from typing import Dict, List, Any, Optional, Union
-from langchain.chat_models import ChatOpenAI
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
 from dotenv import load_dotenv
+from llm_client import run_prompt
+from llm_backends import LLMBackend, create_backend
+from llm_scheduler import submit
+from instrumentation import traced
+from output_parsing import parse_json_output, report_truncation, OutputParsingError
+from text_chunking import chunk_token_budget, get_token_counter
+from result_merging import normalize_text, dedupe
+from literature_retrieval import top_k_references
+from prompt_encoding import encode_zones, encode_objectives, encode_congruence
 
-# Load environment variables (OpenAI API key)
+# Load environment variables (API keys, backend and model settings)
 load_dotenv()
 
 # Get default model from environment or use GPT-4
 default_model = os.getenv("DEFAULT_MODEL", "gpt-4")
 
+# Maximum number of LLM requests in flight at once within an evaluator
+default_max_workers = int(os.getenv("MAX_CONCURRENT_REQUESTS", "4"))
+
+# Maximum objectives evaluated per SMART request in batched mode
+default_smart_batch_size = int(os.getenv("SMART_BATCH_SIZE", "10"))
+
+# Candidate references retrieved per objective for the congruence analysis
+default_congruence_top_k = int(os.getenv("CONGRUENCE_TOP_K", "5"))
+
+# Tokens reserved in the answer for each objective's SMART evaluation
+SMART_OUTPUT_TOKENS_PER_OBJECTIVE = 150
+
+# Maximum seconds each evaluator may take in analyze_all before it is reported as timed out
+default_evaluator_timeout = float(os.getenv("EVALUATOR_TIMEOUT_SECONDS", "300"))
+
 
 class MPAGuideEvaluator:
     """
@@ -35,15 +58,19 @@ class MPAGuideEvaluator:
     - Minimally Protected
     """
     
-    def __init__(self, model_name: str = None):
+    # Required keys of the JSON answer and the accepted types of their list items
+    output_schema = {"evaluacion_zonas": dict}
+    
+    def __init__(self, model_name: str = None, backend: LLMBackend = None):
         """
         Initialize the MPA Guide evaluator.
         
         Args:
-            model_name: OpenAI model name to use (defaults to environment setting or gpt-4)
+            model_name: Model name to use (defaults to environment setting or gpt-4)
+            backend: LLM backend to query (defaults to the LLM_BACKEND environment setting)
         """
         self.model_name = model_name or default_model
-        self.llm = ChatOpenAI(model_name=self.model_name, temperature=0)
+        self.backend = backend or create_backend(self.model_name)
         
         # Define the prompt template for MPA Guide evaluation
         self.mpa_guide_template = """
@@ -102,35 +129,33 @@ class MPAGuideEvaluator:
         JSON:
         """
         
-        self.prompt = PromptTemplate(
-            template=self.mpa_guide_template,
-            input_variables=["zonation_data"]
-        )
-        self.chain = LLMChain(llm=self.llm, prompt=self.prompt, output_key="json_result")
+        self.template = self.mpa_guide_template
     
-    def evaluate(self, zonation_data: Dict) -> Dict:
+    @traced("evaluator.mpa_guide")
+    def evaluate(self, zonation_data: Dict, use_cache: bool = True) -> Dict:
         """
         Evaluate zonation using the MPA Guide framework.
         
         Args:
             zonation_data: Dictionary containing zonation information
+            use_cache: Whether to reuse a cached response for identical input
             
         Returns:
             Dictionary containing the MPA Guide evaluation results
         """
         try:
-            # Convert dictionary to string for the prompt
-            zonation_str = json.dumps(zonation_data, ensure_ascii=False, indent=2)
+            # Encode only the zone names and regulations, compactly
+            zonation_str = encode_zones(zonation_data)
             
             # Get evaluation
-            json_str = self.chain.run(zonation_data=zonation_str)
+            json_str = run_prompt(self.backend, self.template, validate=partial(parse_json_output, schema=self.output_schema), use_cache=use_cache, zonation_data=zonation_str)
             
             # Parse JSON and handle potential errors
-            result = json.loads(json_str)
+            result = report_truncation(parse_json_output(json_str, self.output_schema))
             return result
-        except json.JSONDecodeError:
+        except OutputParsingError as e:
             # Handle error if output isn't valid JSON
-            return {"evaluacion_zonas": [], "error": "Error al procesar la respuesta JSON"}
+            return {"evaluacion_zonas": [], "error": f"Error al procesar la respuesta JSON: {str(e)}"}
         except Exception as e:
             return {"evaluacion_zonas": [], "error": f"Error durante la evaluación: {str(e)}"}
 
@@ -147,15 +172,19 @@ class SMARTCriteriaEvaluator:
     - Time-bound (Con Plazo definido)
     """
     
-    def __init__(self, model_name: str = None):
+    # Required keys of the JSON answer and the accepted types of their list items
+    output_schema = {"evaluacion_objetivos": dict}
+    
+    def __init__(self, model_name: str = None, backend: LLMBackend = None):
         """
         Initialize the SMART criteria evaluator.
         
         Args:
-            model_name: OpenAI model name to use (defaults to environment setting or gpt-4)
+            model_name: Model name to use (defaults to environment setting or gpt-4)
+            backend: LLM backend to query (defaults to the LLM_BACKEND environment setting)
         """
         self.model_name = model_name or default_model
-        self.llm = ChatOpenAI(model_name=self.model_name, temperature=0)
+        self.backend = backend or create_backend(self.model_name)
         
         # Define the prompt template for SMART criteria evaluation
         self.smart_template = """
@@ -206,53 +235,196 @@ class SMARTCriteriaEvaluator:
         JSON:
         """
         
-        self.prompt = PromptTemplate(
-            template=self.smart_template,
-            input_variables=["objectives_data"]
-        )
-        self.chain = LLMChain(llm=self.llm, prompt=self.prompt, output_key="json_result")
+        self.template = self.smart_template
     
-    def evaluate(self, objectives_data: Dict) -> Dict:
+    @traced("evaluator.smart")
+    def evaluate(self, objectives_data: Dict, use_cache: bool = True) -> Dict:
         """
         Evaluate conservation objectives using SMART criteria.
         
         Args:
             objectives_data: Dictionary containing conservation objectives
+            use_cache: Whether to reuse a cached response for identical input
             
         Returns:
             Dictionary containing the SMART evaluation results
         """
         try:
-            # Convert dictionary to string for the prompt
-            objectives_str = json.dumps(objectives_data, ensure_ascii=False, indent=2)
+            # Encode the objectives as numbered lines (or minified JSON)
+            objectives_str = encode_objectives(objectives_data)
             
             # Get evaluation
-            json_str = self.chain.run(objectives_data=objectives_str)
+            json_str = run_prompt(self.backend, self.template, validate=partial(parse_json_output, schema=self.output_schema), use_cache=use_cache, objectives_data=objectives_str)
             
             # Parse JSON and handle potential errors
-            result = json.loads(json_str)
+            result = report_truncation(parse_json_output(json_str, self.output_schema))
             return result
-        except json.JSONDecodeError:
+        except OutputParsingError as e:
             # Handle error if output isn't valid JSON
-            return {"evaluacion_objetivos": [], "error": "Error al procesar la respuesta JSON"}
+            return {"evaluacion_objetivos": [], "error": f"Error al procesar la respuesta JSON: {str(e)}"}
         except Exception as e:
             return {"evaluacion_objetivos": [], "error": f"Error durante la evaluación: {str(e)}"}
 
+    def batch_objectives(self, objectives: List[str], max_batch_size: int = None) -> List[List[int]]:
+        """
+        Group objectives into batches that fit the model's context window.
+        
+        Each objective costs its own tokens plus an allowance for its evaluation
+        in the answer, so a batch's prompt and answer fit together.
+        
+        Args:
+            objectives: Objective texts
+            max_batch_size: Maximum objectives per batch (defaults to SMART_BATCH_SIZE)
+            
+        Returns:
+            Batches as lists of indices into ``objectives``
+        """
+        max_batch_size = max_batch_size or default_smart_batch_size
+        count_tokens = get_token_counter(self.model_name)
+        budget = chunk_token_budget(self.model_name, self.smart_template, max_output_tokens=0)
+        
+        batches = []
+        current = []
+        current_tokens = 0
+        for index, objective in enumerate(objectives):
+            tokens = count_tokens(encode_objectives({"objetivos_conservacion": [objective]})) + SMART_OUTPUT_TOKENS_PER_OBJECTIVE
+            if current and (current_tokens + tokens > budget or len(current) >= max_batch_size):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(index)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+    
+    def _evaluate_batch(self, objectives: List[str], indices: List[int], max_retries: int, use_cache: bool) -> Dict[int, Dict]:
+        """
+        Evaluate one batch, retrying it on its own, and map evaluations back to objective indices.
+        
+        Objectives the model left out, or whose evaluation cannot be told apart,
+        have no entry in the returned mapping.
+        """
+        batch = [objectives[index] for index in indices]
+        for attempt in range(max_retries + 1):
+            result = self.evaluate({"objetivos_conservacion": batch}, use_cache=use_cache and attempt == 0)
+            evaluations = result.get("evaluacion_objetivos") or []
+            if "error" not in result and evaluations:
+                break
+        else:
+            raise ValueError(result.get("error", "La evaluación no devolvió resultados"))
+        
+        # Match evaluations to objectives by text
+        evaluations = [evaluation for evaluation in evaluations if isinstance(evaluation, dict)]
+        by_text = {normalize_text(objectives[index]): index for index in indices}
+        assigned = {}
+        unmatched = []
+        for evaluation in evaluations:
+            index = by_text.get(normalize_text(evaluation.get("objetivo", "")))
+            if index is not None and index not in assigned:
+                assigned[index] = evaluation
+            else:
+                unmatched.append(evaluation)
+        # Reworded evaluations are only assigned in order when there is exactly one per
+        # objective; otherwise a skipped objective would take another one's evaluation
+        if len(evaluations) == len(indices):
+            remaining = [index for index in indices if index not in assigned]
+            for index, evaluation in zip(remaining, unmatched):
+                assigned[index] = evaluation
+        
+        # Report each evaluation under the objective's original wording
+        for index, evaluation in assigned.items():
+            evaluation["objetivo"] = objectives[index]
+        return assigned
+    
+    @traced("evaluator.smart_batched")
+    def evaluate_batched(
+        self,
+        objectives_data: Dict,
+        max_batch_size: int = None,
+        max_workers: int = None,
+        max_retries: int = 1,
+        use_cache: bool = True
+    ) -> Dict:
+        """
+        Evaluate conservation objectives in token-budgeted batches run in parallel.
+        
+        A batch that still fails after its retries is split in half and the halves
+        are evaluated again, so a single oversized or malformed answer only costs
+        the objectives it covers. Objectives missing from an otherwise valid answer
+        are evaluated again on their own batch, and reported in "errores" if they
+        can never be evaluated. Evaluations are returned in the original
+        objective order.
+        
+        Args:
+            objectives_data: Dictionary containing conservation objectives
+            max_batch_size: Maximum objectives per batch (defaults to SMART_BATCH_SIZE)
+            max_workers: Maximum concurrent batch requests (defaults to MAX_CONCURRENT_REQUESTS)
+            max_retries: Extra attempts for a failed batch before it is split
+            use_cache: Whether to reuse a cached response for identical input
+            
+        Returns:
+            Dictionary containing the SMART evaluation results
+        """
+        objectives = (objectives_data or {}).get("objetivos_conservacion") or []
+        if not objectives:
+            return self.evaluate(objectives_data, use_cache=use_cache)
+        
+        evaluations = {}
+        errors = []
+        with ThreadPoolExecutor(max_workers=max_workers or default_max_workers) as executor:
+            pending = {
+                submit(executor, self._evaluate_batch, objectives, indices, max_retries, use_cache): indices
+                for indices in self.batch_objectives(objectives, max_batch_size)
+            }
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    indices = pending.pop(future)
+                    try:
+                        assigned = future.result()
+                        missing = [index for index in indices if index not in assigned]
+                        if missing and len(missing) == len(indices):
+                            raise ValueError("La evaluación omitió los objetivos solicitados")
+                    except Exception as e:
+                        if len(indices) > 1:
+                            middle = len(indices) // 2
+                            for half in (indices[:middle], indices[middle:]):
+                                pending[submit(executor, self._evaluate_batch, objectives, half, max_retries, use_cache)] = half
+                        else:
+                            errors.append(f"Objetivo {indices[0] + 1}: {str(e)}")
+                        continue
+                    
+                    evaluations.update(assigned)
+                    if missing:
+                        # Objectives left out of the answer are evaluated again as a smaller batch
+                        pending[submit(executor, self._evaluate_batch, objectives, missing, max_retries, use_cache)] = missing
+        
+        result = {"evaluacion_objetivos": [evaluations[index] for index in sorted(evaluations)]}
+        if errors:
+            result["error"] = f"No se pudieron evaluar {len(errors)} de {len(objectives)} objetivos"
+            result["errores"] = errors
+        return result
+
 
 class LiteratureCongruenceAnalyzer:
     """
     Analyzes thematic congruence between conservation objectives and cited literature.
     """
     
-    def __init__(self, model_name: str = None):
+    # Required keys of the JSON answer and the accepted types of their list items
+    output_schema = {"congruencia_tematica": dict}
+    
+    def __init__(self, model_name: str = None, backend: LLMBackend = None):
         """
         Initialize the literature congruence analyzer.
         
         Args:
-            model_name: OpenAI model name to use (defaults to environment setting or gpt-4)
+            model_name: Model name to use (defaults to environment setting or gpt-4)
+            backend: LLM backend to query (defaults to the LLM_BACKEND environment setting)
         """
         self.model_name = model_name or default_model
-        self.llm = ChatOpenAI(model_name=self.model_name, temperature=0)
+        self.backend = backend or create_backend(self.model_name)
         
         # Define the prompt template for literature congruence analysis
         self.congruence_template = """
@@ -297,71 +469,209 @@ class LiteratureCongruenceAnalyzer:
         JSON:
         """
         
-        self.prompt = PromptTemplate(
-            template=self.congruence_template,
-            input_variables=["combined_data"]
-        )
-        self.chain = LLMChain(llm=self.llm, prompt=self.prompt, output_key="json_result")
+        self.template = self.congruence_template
     
-    def analyze(self, objectives_data: Dict, literature_data: Dict) -> Dict:
+    @traced("evaluator.congruence")
+    def analyze(self, objectives_data: Dict, literature_data: Dict, use_cache: bool = True) -> Dict:
         """
         Analyze congruence between conservation objectives and literature.
         
         Args:
             objectives_data: Dictionary containing conservation objectives
             literature_data: Dictionary containing literature citations
+            use_cache: Whether to reuse a cached response for identical input
             
         Returns:
             Dictionary containing the congruence analysis results
         """
         try:
-            # Combine the data
-            combined_data = {
-                "objetivos": objectives_data,
-                "literatura": literature_data
-            }
-            
-            # Convert combined dictionary to string for the prompt
-            combined_str = json.dumps(combined_data, ensure_ascii=False, indent=2)
+            # Encode the objectives and the identifying fields of each reference, compactly
+            combined_str = encode_congruence(objectives_data, literature_data)
             
             # Get analysis
-            json_str = self.chain.run(combined_data=combined_str)
+            json_str = run_prompt(self.backend, self.template, validate=partial(parse_json_output, schema=self.output_schema), use_cache=use_cache, combined_data=combined_str)
             
             # Parse JSON and handle potential errors
-            result = json.loads(json_str)
+            result = report_truncation(parse_json_output(json_str, self.output_schema))
             return result
-        except json.JSONDecodeError:
+        except OutputParsingError as e:
             # Handle error if output isn't valid JSON
-            return {"congruencia_tematica": [], "error": "Error al procesar la respuesta JSON"}
+            return {"congruencia_tematica": [], "error": f"Error al procesar la respuesta JSON: {str(e)}"}
         except Exception as e:
             return {"congruencia_tematica": [], "error": f"Error durante el análisis: {str(e)}"}
+    
+    @traced("evaluator.congruence_per_objective")
+    def analyze_per_objective(
+        self,
+        objectives_data: Dict,
+        literature_data: Dict,
+        top_k: int = None,
+        max_workers: int = None,
+        use_cache: bool = True
+    ) -> Dict:
+        """
+        Analyze congruence one objective at a time against retrieved candidate references.
+        
+        A local TF-IDF retrieval stage picks the ``top_k`` references most similar
+        to each objective; only those are sent to the model with that objective.
+        Objectives without any similar reference are reported as unsupported
+        without calling the model.
+        
+        Args:
+            objectives_data: Dictionary containing conservation objectives
+            literature_data: Dictionary containing literature citations
+            top_k: Maximum candidate references per objective (defaults to CONGRUENCE_TOP_K)
+            max_workers: Maximum concurrent requests (defaults to MAX_CONCURRENT_REQUESTS)
+            use_cache: Whether to reuse a cached response for identical input
+            
+        Returns:
+            Dictionary containing the congruence analysis results
+        """
+        objectives = (objectives_data or {}).get("objetivos_conservacion") or []
+        references = (literature_data or {}).get("referencias_bibliograficas") or []
+        if not objectives or not references:
+            return self.analyze(objectives_data, literature_data, use_cache=use_cache)
+        
+        candidates = top_k_references(objectives, references, k=top_k or default_congruence_top_k)
+        
+        def analyze_objective(index: int) -> Dict:
+            result = self.analyze(
+                {"objetivos_conservacion": [objectives[index]]},
+                {"referencias_bibliograficas": [references[i] for i in candidates[index]]},
+                use_cache=use_cache
+            )
+            if "error" in result:
+                raise ValueError(result["error"])
+            return result
+        
+        items = [None] * len(objectives)
+        gaps = []
+        errors = []
+        with ThreadPoolExecutor(max_workers=max_workers or default_max_workers) as executor:
+            futures = {
+                submit(executor, analyze_objective, index): index
+                for index in range(len(objectives))
+                if candidates[index]
+            }
+            for future, index in futures.items():
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors.append(f"Objetivo {index + 1}: {str(e)}")
+                    continue
+                analysis = (result.get("congruencia_tematica") or [{}])[0]
+                items[index] = {**analysis, "objetivo": objectives[index]}
+                gaps.extend(result.get("brechas_tematicas_generales") or [])
+        
+        for index, objective in enumerate(objectives):
+            if items[index] is None and not candidates[index]:
+                items[index] = {
+                    "objetivo": objective,
+                    "respaldado_por_literatura": False,
+                    "temas_relacionados_literatura": [],
+                    "referencias_relacionadas": [],
+                    "comentarios": "No se encontraron referencias relacionadas con este objetivo en la literatura citada."
+                }
+        
+        result = {
+            "congruencia_tematica": [item for item in items if item is not None],
+            "brechas_tematicas_generales": dedupe(gaps)
+        }
+        if errors:
+            result["error"] = f"No se pudieron analizar {len(errors)} de {len(objectives)} objetivos"
+            result["errores"] = errors
+        return result
 
 
-def analyze_all(zonation_data: Dict, objectives_data: Dict, literature_data: Dict, model_name: str = None) -> Dict:
+@lru_cache(maxsize=None)
+def _build_evaluators(model_name: str) -> Dict[str, Any]:
+    """Create one instance of each evaluator for the given model."""
+    return {
+        "mpa_guide": MPAGuideEvaluator(model_name),
+        "smart": SMARTCriteriaEvaluator(model_name),
+        "congruence": LiteratureCongruenceAnalyzer(model_name)
+    }
+
+
+def get_evaluators(model_name: str = None) -> Dict[str, Any]:
+    """
+    Get the shared evaluator instances for a model.
+    
+    Evaluators are created once per model name and reused across calls, so their
+    LLM clients and parsed prompt templates are shared.
+    
+    Args:
+        model_name: Model name to use (defaults to environment setting or gpt-4)
+        
+    Returns:
+        Dictionary with the "mpa_guide", "smart" and "congruence" evaluators
     """
-    Run all analytical assessments.
+    return _build_evaluators(model_name or default_model)
+
+
+@traced("analyze_all")
+def analyze_all(
+    zonation_data: Dict,
+    objectives_data: Dict,
+    literature_data: Dict,
+    model_name: str = None,
+    use_cache: bool = True,
+    evaluators: Optional[Dict[str, Any]] = None,
+    timeouts: Optional[Dict[str, float]] = None
+) -> Dict:
+    """
+    Run all analytical assessments concurrently.
+    
+    The three evaluators share no state, so they run in parallel and the
+    analysis takes about as long as the slowest one. An evaluator that fails or
+    exceeds its timeout yields an empty result with an "error" message while
+    the others are still returned.
     
     Args:
         zonation_data: Dictionary containing zonation information
         objectives_data: Dictionary containing conservation objectives
         literature_data: Dictionary containing literature citations
-        model_name: OpenAI model name to use
+        model_name: Model name to use
+        use_cache: Whether to reuse cached responses
+        evaluators: Evaluator instances keyed like get_evaluators (defaults to
+            the shared instances)
+        timeouts: Optional per-analysis timeouts in seconds, keyed like the
+            returned dictionary (defaults to EVALUATOR_TIMEOUT_SECONDS)
         
     Returns:
         Dictionary containing all analytical results
     """
-    mpa_evaluator = MPAGuideEvaluator(model_name)
-    smart_evaluator = SMARTCriteriaEvaluator(model_name)
-    congruence_analyzer = LiteratureCongruenceAnalyzer(model_name)
+    evaluators = evaluators or get_evaluators(model_name)
+    timeouts = timeouts or {}
     
-    # Run all analyses
-    mpa_results = mpa_evaluator.evaluate(zonation_data)
-    smart_results = smart_evaluator.evaluate(objectives_data)
-    congruence_results = congruence_analyzer.analyze(objectives_data, literature_data)
-    
-    # Combine results
-    return {
-        "mpa_guide_evaluation": mpa_results,
-        "smart_criteria_evaluation": smart_results,
-        "literature_congruence_analysis": congruence_results
+    # Each analysis: (evaluator call, arguments, result key holding its items)
+    analyses = {
+        "mpa_guide_evaluation": (evaluators["mpa_guide"].evaluate, (zonation_data,), "evaluacion_zonas"),
+        "smart_criteria_evaluation": (evaluators["smart"].evaluate_batched, (objectives_data,), "evaluacion_objetivos"),
+        "literature_congruence_analysis": (evaluators["congruence"].analyze_per_objective, (objectives_data, literature_data), "congruencia_tematica")
     }
+    
+    # Run all analyses at once; each one gets its own deadline from the common start
+    results = {}
+    start = time.monotonic()
+    executor = ThreadPoolExecutor(max_workers=len(analyses))
+    try:
+        futures = {
+            name: submit(executor, function, *args, use_cache=use_cache)
+            for name, (function, args, _) in analyses.items()
+        }
+        for name, future in futures.items():
+            result_key = analyses[name][2]
+            timeout = timeouts.get(name, default_evaluator_timeout)
+            try:
+                results[name] = future.result(timeout=max(start + timeout - time.monotonic(), 0))
+            except FutureTimeoutError:
+                future.cancel()
+                results[name] = {result_key: [], "error": f"Tiempo de espera agotado tras {timeout:g} segundos"}
+            except Exception as e:
+                results[name] = {result_key: [], "error": f"Error durante el análisis: {str(e)}"}
+    finally:
+        # Do not wait for timed-out evaluators; their results are discarded
+        executor.shutdown(wait=False)
+    
+    return results
@@ -9,16 +9,29 @@ on Spanish language support and robust error handling.
 import os
 import sys
 import json
+import gzip
 import time
+import hashlib
 import streamlit as st
-import fitz  # PyMuPDF
+import pandas as pd
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from dotenv import load_dotenv
 
 # Import project modules
-from extraction_modules import ZonationExtractor, ObjectivesExtractor, LiteratureExtractor, extract_all
-from analytical_modules import analyze_all, MPAGuideEvaluator, SMARTCriteriaEvaluator, LiteratureCongruenceAnalyzer
+from extraction_modules import ZonationExtractor, ObjectivesExtractor, LiteratureExtractor, extract_all, extract_chunks, get_extractors, chunk_budget, default_model
+from analytical_modules import analyze_all, get_evaluators, MPAGuideEvaluator, SMARTCriteriaEvaluator, LiteratureCongruenceAnalyzer
+from llm_cache import get_default_cache
+from llm_scheduler import get_default_scheduler
+from llm_backends import default_backend
+from upload_storage import store_upload
+from results_store import get_default_results_store
+from result_merging import merge_extraction_results
+from pdf_processing import default_pdf_workers
+from pipeline import DocumentError
+from document_cache import get_default_document_cache
+from instrumentation import trace, Trace
+from job_queue import get_default_job_queue, start_workers, default_job_workers, background_analysis, QUEUED, RUNNING, FAILED
 
 # Configure page
 st.set_page_config(
@@ -36,6 +49,12 @@ if 'extracted_data' not in st.session_state:
     st.session_state.extracted_data = None
 if 'analysis_results' not in st.session_state:
     st.session_state.analysis_results = None
+if 'performance_trace' not in st.session_state:
+    st.session_state.performance_trace = None
+if 'report_hash' not in st.session_state:
+    st.session_state.report_hash = None
+if 'job_id' not in st.session_state:
+    st.session_state.job_id = None
 
 # Custom CSS for better styling
 st.markdown("""
@@ -49,79 +68,182 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-def extract_text_from_pdf(pdf_file) -> tuple[bool, str]:
-    """Extract text from PDF using PyMuPDF with progress tracking."""
+@st.cache_resource
+def load_extractors(model_name: str) -> Dict[str, Any]:
+    """Load the extractors for a model once and share them across reruns and sessions."""
+    return get_extractors(model_name)
+
+@st.cache_resource
+def load_evaluators(model_name: str) -> Dict[str, Any]:
+    """Load the evaluators for a model once and share them across reruns and sessions."""
+    return get_evaluators(model_name)
+
+@st.cache_resource
+def start_job_workers() -> list:
+    """Start the background analysis workers once per server process (none when JOB_WORKERS is 0)."""
+    return start_workers() if background_analysis and default_job_workers else []
+
+def extract_text_from_pdf(pdf_path: Path, document_hash: str, workers: int = 1, index_sections: bool = False) -> tuple[bool, str, list]:
+    """
+    Extract text from PDF using PyMuPDF with progress tracking, optionally across several processes.
+    
+    The document is opened once from the stored upload; when requested, the section
+    index is built from the same open document. Documents already read by this
+    process are served from the document cache without opening the PDF.
+    """
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    
+    def update_progress(done: int, total: int) -> None:
+        progress_bar.progress(done / total)
+        if done == total and index_sections:
+            status_text.text("Detectando secciones del documento...")
+        else:
+            status_text.text(f"Procesando página {done} de {total}...")
+    
     try:
-        # Read the file content first
-        file_bytes = pdf_file.getvalue()
-        
-        # Open the PDF from bytes
-        doc = fitz.open(stream=file_bytes, filetype="pdf")
-        full_text = ""
-        total_pages = len(doc)
-        
-        if total_pages == 0:
-            return False, "El archivo PDF está vacío."
-        
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        for i, page in enumerate(doc):
-            progress = (i + 1) / total_pages
-            progress_bar.progress(progress)
-            status_text.text(f"Procesando página {i+1} de {total_pages}...")
-            full_text += page.get_text("text") + "\n\n"
-        
-        doc.close()
+        full_text, sections, _ = get_default_document_cache().read_pdf(
+            document_hash, pdf_path, workers, index_sections, update_progress
+        )
+        return True, full_text, sections
+    except DocumentError as e:
+        return False, str(e), []
+    except Exception as e:
+        return False, f"Error al procesar el PDF: {str(e)}", []
+    finally:
         progress_bar.empty()
         status_text.empty()
-        
-        if not full_text.strip():
-            return False, "El PDF no contiene texto extraíble."
-        
-        return True, full_text.strip()
-    
-    except fitz.FileDataError as e:
-        if 'password' in str(e).lower():
-            return False, "El PDF está protegido con contraseña."
-        return False, "El archivo no es un PDF válido o está dañado."
-    except fitz.EmptyFileError:
-        return False, "El archivo PDF está vacío."
+
+def save_uploaded_file(uploaded_file) -> Optional[Tuple[Path, str, bool]]:
+    """Store uploaded file under its content hash, returning (path, hash, already stored)."""
+    try:
+        # getbuffer() exposes the upload without copying it
+        return store_upload(uploaded_file.getbuffer())
     except Exception as e:
-        return False, f"Error al procesar el PDF: {str(e)}"
+        st.error(f"Error al guardar el archivo: {str(e)}")
+        return None
+
+def open_saved_analysis(report: Dict[str, Any]) -> None:
+    """Show a stored analysis, loaded from the results store without calling the model."""
+    text = get_default_results_store().load_text(report["document_hash"]) or ""
+    st.session_state.document_hash = report["document_hash"]
+    st.session_state.extracted_data = {"text": text, **report["extracted_data"]}
+    st.session_state.analysis_results = report["analysis_results"]
+    st.session_state.performance_trace = None
+    st.session_state.report_hash = None
 
-def split_text_into_chunks(text, chunk_size=1000):
-    """Split text into chunks of approximately chunk_size tokens."""
-    words = text.split()
-    chunks = []
-    current_chunk = []
-    current_size = 0
+
+# Items per page in the result views; only the visible page gets expanders
+RESULTS_PAGE_SIZE = 20
+
+def searchable_text(item: Any) -> str:
+    """Flatten a result item (text, dictionary or list) into lowercase text for searching."""
+    if isinstance(item, dict):
+        return " ".join(searchable_text(value) for value in item.values())
+    if isinstance(item, list):
+        return " ".join(searchable_text(value) for value in item)
+    return str(item).lower()
+
+def search_items(items: List[Any], key: str, label: str) -> List[Tuple[int, Any]]:
+    """Show a search box for a result list and return the matching (number, item) pairs."""
+    query = st.text_input(f"Buscar {label}", key=f"{key}_search").strip().lower()
+    numbered = list(enumerate(items, 1))
+    if not query:
+        return numbered
+    return [(number, item) for number, item in numbered if query in searchable_text(item)]
+
+def page_of(matches: List[Tuple[int, Any]], key: str, total: int) -> List[Tuple[int, Any]]:
+    """Show page controls for the matching items and return the items of the selected page."""
+    if not matches:
+        st.info("Ningún resultado coincide con la búsqueda.")
+        return []
+    
+    pages = (len(matches) + RESULTS_PAGE_SIZE - 1) // RESULTS_PAGE_SIZE
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > pages:
+        # A narrower search can leave the selected page out of range
+        st.session_state[page_key] = 1
+    page = st.number_input("Página", min_value=1, max_value=pages, key=page_key) if pages > 1 else 1
     
-    for word in words:
-        if current_size + len(word) + 1 > chunk_size and current_chunk:
-            chunks.append(" ".join(current_chunk))
-            current_chunk = [word]
-            current_size = len(word)
+    st.caption(f"{len(matches)} de {total} resultados · página {page} de {pages}")
+    return matches[(page - 1) * RESULTS_PAGE_SIZE:page * RESULTS_PAGE_SIZE]
+
+def reference_fields(ref: Any) -> Dict[str, Any]:
+    """Return the table columns of a reference, which may be structured or a plain citation."""
+    if not isinstance(ref, dict):
+        return {"Autores": "", "Título": str(ref), "Fuente": "", "Año": ""}
+    return {
+        "Autores": ref.get("autores", ""),
+        "Título": ref.get("titulo", ""),
+        "Fuente": ref.get("revista_o_fuente", ""),
+        "Año": ref.get("ano_publicacion", "")
+    }
+
+def show_job_status(job_id: str) -> None:
+    """Show the progress of this session's background analysis and open its results when it finishes."""
+    queue = get_default_job_queue()
+    job = queue.get(job_id)
+    if job is None:
+        st.session_state.job_id = None
+        return
+    
+    if job["status"] in (QUEUED, RUNNING):
+        if job["status"] == QUEUED:
+            st.info(f"⏳ {job['source']}: en cola (posición {job['position']}).")
         else:
-            current_chunk.append(word)
-            current_size += len(word) + 1
+            stages = {"pdf": "Leyendo el PDF", "extraction": "Extrayendo información", "analysis": "Analizando datos"}
+            st.info(f"⚙️ {job['source']}: {stages.get(job['stage'], 'Iniciando análisis')}...")
+            st.progress(job["done"] / job["total"] if job["total"] else 0.0)
+            if job["total"]:
+                st.caption(f"{job['done']} de {job['total']}")
+        
+        # The analysis runs in a worker process; the page only polls its status
+        time.sleep(1)
+        st.experimental_rerun()
     
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
+    st.session_state.job_id = None
+    if job["status"] == FAILED:
+        st.error(job["error"])
+        return
     
-    return chunks
+    report = queue.result(job_id)
+    for error in report["errors"]:
+        st.warning(f"Advertencia: {error}")
+    st.session_state.document_hash = report["document_hash"]
+    st.session_state.extracted_data = {"text": report["text"], **report["extracted_data"]}
+    st.session_state.analysis_results = report["analysis_results"]
+    st.session_state.performance_trace = Trace.from_dict(report["trace"])
+    st.session_state.report_hash = None
+    st.success("✅ Análisis completado")
 
-def save_uploaded_file(uploaded_file) -> Optional[Path]:
-    """Save uploaded file to temporary location."""
-    try:
-        temp_dir = Path("./temp_uploads")
-        temp_dir.mkdir(exist_ok=True)
-        file_path = temp_dir / uploaded_file.name
-        file_path.write_bytes(uploaded_file.getbuffer())
-        return file_path
-    except Exception as e:
-        st.error(f"Error al guardar el archivo: {str(e)}")
-        return None
+def report_contents(include_text: bool) -> Dict[str, Any]:
+    """Assemble the report of the current analysis; without the text, the document is referenced by its hash."""
+    extracted_data = st.session_state.extracted_data
+    if not include_text:
+        extracted_data = {key: value for key, value in extracted_data.items() if key != "text"}
+    return {
+        "document_hash": st.session_state.get("document_hash"),
+        "extracted_data": extracted_data,
+        "analysis_results": st.session_state.analysis_results
+    }
+
+def current_report_hash() -> str:
+    """Hash the current results once per analysis; reruns reuse the stored hash."""
+    if st.session_state.report_hash is None:
+        payload = json.dumps(report_contents(include_text=False), ensure_ascii=False, sort_keys=True)
+        st.session_state.report_hash = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return st.session_state.report_hash
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def export_report(report_hash: str, include_text: bool, compress: bool, _report: Dict[str, Any]) -> bytes:
+    """
+    Serialise a report as compact JSON, optionally gzip-compressed.
+    
+    The result is cached by report hash and export options; the report itself is
+    not hashed on each rerun (Streamlit skips arguments starting with an underscore).
+    """
+    data = json.dumps(_report, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return gzip.compress(data, mtime=0) if compress else data
 
 def display_zonation_results(data: Dict[str, Any]) -> None:
     """Display zonation and regulations results."""
@@ -130,7 +252,25 @@ def display_zonation_results(data: Dict[str, Any]) -> None:
         return
     
     st.markdown("### 🗺️ Zonificación y Regulaciones")
-    for i, zona in enumerate(data["zonas"], 1):
+    matches = search_items(data["zonas"], "zonation", "zonas")
+    st.dataframe(
+        pd.DataFrame(
+            [
+                {
+                    "N.º": i,
+                    "Zona": zona.get("nombre_zona", "Sin nombre"),
+                    "Límites": zona.get("limites", "No especificado"),
+                    "Regulaciones": len(zona.get("regulaciones") or [])
+                }
+                for i, zona in matches
+            ],
+            columns=["N.º", "Zona", "Límites", "Regulaciones"]
+        ),
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    for i, zona in page_of(matches, "zonation", len(data["zonas"])):
         with st.expander(f"Zona {i}: {zona.get('nombre_zona', 'Sin nombre')}"):
             cols = st.columns(2)
             with cols[0]:
@@ -153,15 +293,34 @@ def display_objectives_results(objectives_data: Dict[str, Any], smart_results: D
     st.markdown("### 🎯 Objetivos de Conservación")
     smart_evaluations = {}
     if smart_results and "evaluacion_objetivos" in smart_results:
-        smart_evaluations = {obj["objetivo"]: obj for obj in smart_results["evaluacion_objetivos"]}
+        smart_evaluations = {obj.get("objetivo"): obj for obj in smart_results["evaluacion_objetivos"]}
     
-    for i, objetivo in enumerate(objectives_data["objetivos_conservacion"], 1):
+    objectives = objectives_data["objetivos_conservacion"]
+    matches = search_items(objectives, "objectives", "objetivos")
+    st.dataframe(
+        pd.DataFrame(
+            [
+                {
+                    "N.º": i,
+                    "Objetivo": objetivo,
+                    "Puntuación SMART": smart_evaluations.get(objetivo, {}).get("puntuacion_SMART")
+                }
+                for i, objetivo in matches
+            ],
+            columns=["N.º", "Objetivo", "Puntuación SMART"]
+        ),
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    for i, objetivo in page_of(matches, "objectives", len(objectives)):
         with st.expander(f"Objetivo {i}"):
             st.markdown(f"**{objetivo}**")
             
             if objetivo in smart_evaluations:
-                smart = smart_evaluations[objetivo]["SMART"]
-                score = smart_evaluations[objetivo]["puntuacion_SMART"]
+                # The model is asked for capitalised criteria; compare them case-insensitively
+                smart = {name.lower(): value for name, value in smart_evaluations[objetivo].get("SMART", {}).items()}
+                score = smart_evaluations[objetivo].get("puntuacion_SMART", 0)
                 
                 # Display SMART score with color coding
                 score_color = "green" if score >= 4 else "orange" if score >= 2 else "red"
@@ -169,37 +328,47 @@ def display_objectives_results(objectives_data: Dict[str, Any], smart_results: D
                 
                 # Display SMART criteria
                 cols = st.columns(5)
-                criteria = ["Específico", "Medible", "Alcanzable", "Relevante", "Con Plazo"]
-                for i, crit in enumerate(criteria):
-                    value = smart.get(crit.lower().replace(" ", "_"), False)
-                    cols[i].metric(crit, "✅" if value else "❌")
+                criteria = [("Específico", "especifico"), ("Medible", "medible"), ("Alcanzable", "alcanzable"),
+                            ("Relevante", "relevante"), ("Con Plazo", "con_plazo")]
+                for col, (crit, name) in zip(cols, criteria):
+                    col.metric(crit, "✅" if smart.get(name, False) else "❌")
                 
                 # Display viability assessment
                 st.markdown("**Evaluación de viabilidad:**")
-                st.info(smart_evaluations[objetivo]["viabilidad"])
+                st.info(smart_evaluations[objetivo].get("viabilidad", "No especificado"))
 
 def display_literature_results(literature_data: Dict[str, Any], congruence_results: Dict[str, Any]) -> None:
     """Display literature citations and congruence analysis."""
-    if not literature_data or "referencias" not in literature_data or not literature_data["referencias"]:
+    if not literature_data or not literature_data.get("referencias_bibliograficas"):
         st.warning("No se encontraron referencias bibliográficas en el documento.")
         return
     
     st.markdown("### 📚 Referencias Bibliográficas")
     
-    # Display literature references
-    with st.expander("Ver todas las referencias"):
-        for i, ref in enumerate(literature_data["referencias"], 1):
-            st.markdown(f"{i}. {ref}")
+    # Display literature references as one searchable table
+    references = literature_data["referencias_bibliograficas"]
+    matches = search_items(references, "literature", "referencias")
+    st.dataframe(
+        pd.DataFrame(
+            [{"N.º": i, **reference_fields(ref)} for i, ref in matches],
+            columns=["N.º", "Autores", "Título", "Fuente", "Año"]
+        ),
+        use_container_width=True,
+        hide_index=True
+    )
+    st.caption(f"{len(matches)} de {len(references)} referencias")
     
     # Display congruence analysis if available
-    if congruence_results and "congruencia_tematica" in congruence_results:
+    if congruence_results and congruence_results.get("congruencia_tematica"):
         st.markdown("#### 🔍 Análisis de Congruencia Temática")
-        for item in congruence_results["congruencia_tematica"]:
-            with st.expander(f"Análisis: {item['objetivo'][:50]}..."):
-                st.markdown(f"**Objetivo:** {item['objetivo']}")
-                st.markdown(f"**Respaldado por literatura:** {'✅ Sí' if item['respaldado_por_literatura'] else '❌ No'}")
+        congruence = congruence_results["congruencia_tematica"]
+        congruence_matches = search_items(congruence, "congruence", "en el análisis de congruencia")
+        for _, item in page_of(congruence_matches, "congruence", len(congruence)):
+            with st.expander(f"Análisis: {item.get('objetivo', '')[:50]}..."):
+                st.markdown(f"**Objetivo:** {item.get('objetivo', '')}")
+                st.markdown(f"**Respaldado por literatura:** {'✅ Sí' if item.get('respaldado_por_literatura') else '❌ No'}")
                 
-                if item["referencias_relacionadas"]:
+                if item.get("referencias_relacionadas"):
                     st.markdown("**Referencias relacionadas:**")
                     for ref in item["referencias_relacionadas"]:
                         st.write(f"- {ref}")
@@ -208,10 +377,10 @@ def display_literature_results(literature_data: Dict[str, Any], congruence_resul
                     st.markdown("**Comentarios:**")
                     st.info(item["comentarios"])
         
-        if "brechas_tematicas_generales" in congruence_results and congruence_results["brechas_tematicas_generales"]:
-            st.markdown("#### ⚠️ Brechas Temáticas Identificadas")
-            for brecha in congruence_results["brechas_tematicas_generales"]:
-                st.warning(f"- {brecha}")
+    if congruence_results and congruence_results.get("brechas_tematicas_generales"):
+        st.markdown("#### ⚠️ Brechas Temáticas Identificadas")
+        for brecha in congruence_results["brechas_tematicas_generales"]:
+            st.warning(f"- {brecha}")
 
 def display_mpa_guide_results(mpa_results: Dict[str, Any]) -> None:
     """Display MPA Guide evaluation results."""
@@ -222,13 +391,30 @@ def display_mpa_guide_results(mpa_results: Dict[str, Any]) -> None:
     st.markdown("### 📊 Evaluación MPA Guide")
     
     # Display overall assessment
-    zonas_evaluadas = len(mpa_results["evaluacion_zonas"])
-    categorias = [z["categoria_MPA_guide"] for z in mpa_results["evaluacion_zonas"] if "categoria_MPA_guide" in z]
+    evaluations = mpa_results["evaluacion_zonas"]
+    categorias = [z["categoria_MPA_guide"] for z in evaluations if "categoria_MPA_guide" in z]
     if categorias:
         st.metric("Categoría de protección predominante", max(set(categorias), key=categorias.count))
     
     # Display evaluation per zone
-    for zona in mpa_results["evaluacion_zonas"]:
+    matches = search_items(evaluations, "mpa_guide", "zonas evaluadas")
+    st.dataframe(
+        pd.DataFrame(
+            [
+                {
+                    "N.º": i,
+                    "Zona": zona.get("nombre_zona", "Zona sin nombre"),
+                    "Categoría MPA Guide": zona.get("categoria_MPA_guide", "No determinado")
+                }
+                for i, zona in matches
+            ],
+            columns=["N.º", "Zona", "Categoría MPA Guide"]
+        ),
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    for _, zona in page_of(matches, "mpa_guide", len(evaluations)):
         with st.expander(f"Evaluación: {zona.get('nombre_zona', 'Zona sin nombre')}"):
             st.markdown(f"**Categoría MPA Guide:** **{zona.get('categoria_MPA_guide', 'No determinado')}**")
             if "justificacion" in zona:
@@ -237,6 +423,8 @@ def display_mpa_guide_results(mpa_results: Dict[str, Any]) -> None:
 
 def main():
     """Main application function."""
+    start_job_workers()
+    
     # Sidebar with app info and controls
     with st.sidebar:
         st.image("https://via.placeholder.com/150x50?text=MPAgent", width=150)
@@ -260,24 +448,110 @@ def main():
         # Sidebar for configuration
         st.markdown("---")
         st.markdown("### ⚙️ Configuración")
+        # Local and fake backends only serve the model named in DEFAULT_MODEL
+        model_options = ["gpt-3.5-turbo", "gpt-4"] if default_backend == "openai" else [default_model]
         model_name = st.selectbox(
             "Modelo de IA",
-            ["gpt-3.5-turbo", "gpt-4"],
+            model_options,
             index=0,
             help="Selecciona el modelo de IA a utilizar. GPT-4 es más preciso pero más lento y costoso."
         )
+        auto_chunk_size = st.checkbox(
+            "Ajustar fragmentos al modelo",
+            value=True,
+            help="Usa el mayor tamaño de fragmento que admite el modelo, reservando espacio para las instrucciones y la respuesta"
+        )
+        # Larger chunks would not fit the model's context window with the prompt and answer
+        max_chunk_size = max(chunk_budget(model_name), 600)
         chunk_size = st.slider(
             "Tamaño de fragmentos de texto",
             min_value=500,
-            max_value=2000,
-            value=1000,
+            max_value=max_chunk_size,
+            value=min(1000, max_chunk_size),
             step=100,
+            disabled=auto_chunk_size,
             help="Tamaño de los fragmentos de texto para procesar (en tokens)"
         )
+        if auto_chunk_size:
+            chunk_size = None
+        max_workers = st.slider(
+            "Solicitudes simultáneas",
+            min_value=1,
+            max_value=16,
+            value=int(os.getenv("MAX_CONCURRENT_REQUESTS", "4")),
+            help="Número máximo de solicitudes al modelo de IA que se procesan en paralelo"
+        )
+        pdf_workers = st.slider(
+            "Procesos para lectura de PDF",
+            min_value=1,
+            max_value=max(os.cpu_count() or 1, 2),
+            value=min(default_pdf_workers, os.cpu_count() or 1),
+            help="Número de procesos que extraen el texto de las páginas en paralelo (útil en documentos muy extensos)"
+        )
+        route_by_section = st.checkbox(
+            "Enrutar por secciones",
+            value=True,
+            help="Envía a cada extractor solo las secciones relevantes del documento (zonificación, objetivos, bibliografía)"
+        )
+        use_cache = st.checkbox(
+            "Usar caché de respuestas",
+            value=True,
+            help="Reutiliza las respuestas del modelo para documentos ya analizados, sin volver a llamar a la API"
+        )
+        reuse_saved = st.checkbox(
+            "Reutilizar análisis guardados",
+            value=True,
+            help="Si el documento ya se analizó con este modelo, muestra el análisis guardado en lugar de repetirlo"
+        )
+        
+        cache_stats = get_default_cache().stats()
+        st.caption(
+            f"Caché: {cache_stats['entries']} respuestas "
+            f"({cache_stats['size_bytes'] / (1024 * 1024):.1f} MB) · "
+            f"{cache_stats['hits']} aciertos / {cache_stats['misses']} fallos"
+        )
+        document_cache_stats = get_default_document_cache().stats()
+        st.caption(
+            f"Documentos en memoria: {document_cache_stats['entries']} "
+            f"({document_cache_stats['size_bytes'] / (1024 * 1024):.1f} MB)"
+        )
+        if st.button("🗑️ Vaciar caché"):
+            get_default_cache().clear()
+            get_default_document_cache().clear()
+            st.experimental_rerun()
+        
+        scheduler_stats = get_default_scheduler().stats()
+        st.caption(
+            f"API: {scheduler_stats['calls']} solicitudes · "
+            f"{scheduler_stats['throttled']} en espera por límite "
+            f"({scheduler_stats['throttle_seconds']:.0f} s) · "
+            f"{scheduler_stats['retries']} reintentos"
+        )
+        
+        # Analyses stored by earlier sessions and batch runs
+        saved_analyses = get_default_results_store().list_analyses()
+        if saved_analyses:
+            st.markdown("---")
+            st.markdown("### 📂 Análisis guardados")
+            selected = st.selectbox(
+                "Documento",
+                saved_analyses,
+                format_func=lambda entry: (
+                    f"{entry['mpa_name'] or entry['document_hash'][:12]} · {entry['model_name']} · "
+                    f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['created_at']))}"
+                )
+            )
+            if st.button("📂 Abrir análisis"):
+                report = get_default_results_store().load(selected["document_hash"], selected["model_name"])
+                if report:
+                    open_saved_analysis(report)
+                    st.experimental_rerun()
         
         if st.button("🔄 Reiniciar Análisis"):
             st.session_state.extracted_data = None
             st.session_state.analysis_results = None
+            st.session_state.report_hash = None
+            st.session_state.job_id = None
             st.experimental_rerun()
             
         st.markdown("---")
@@ -300,26 +574,67 @@ def main():
     
     # Process uploaded file
     if uploaded_file and st.button("🔍 Iniciar Análisis", type="primary"):
-        with st.spinner("Procesando documento..."):
+        with st.spinner("Procesando documento..."), trace() as performance_trace:
+            st.session_state.performance_trace = performance_trace
+            
             # Save the uploaded file
-            file_path = save_uploaded_file(uploaded_file)
-            if not file_path:
+            stored = save_uploaded_file(uploaded_file)
+            if not stored:
                 st.error("Error al guardar el archivo.")
                 return
+            file_path, document_hash, already_stored = stored
+            st.session_state.document_hash = document_hash
+            if already_stored:
+                st.info("Este documento ya se había cargado anteriormente.")
+            
+            # A stored analysis of the same content and model is shown without calling the model
+            report = get_default_results_store().load(document_hash, model_name) if reuse_saved else None
+            if report:
+                open_saved_analysis(report)
+                st.experimental_rerun()
+            
+            # With background workers the analysis runs as a job that this page polls
+            if background_analysis:
+                st.session_state.job_id = get_default_job_queue().submit(
+                    file_path,
+                    document_hash,
+                    model_name,
+                    options={
+                        "chunk_size": chunk_size,
+                        "pdf_workers": pdf_workers,
+                        "route_by_section": route_by_section,
+                        "max_workers": max_workers,
+                        "use_cache": use_cache
+                    },
+                    source=uploaded_file.name
+                )
+                st.experimental_rerun()
             
             # Extract text from PDF
-            success, text = extract_text_from_pdf(uploaded_file)
+            success, text, sections = extract_text_from_pdf(
+                file_path,
+                document_hash,
+                workers=pdf_workers,
+                index_sections=route_by_section
+            )
             if not success:
                 st.error(f"Error al extraer texto: {text}")
                 return
             
-            # Split the text into chunks
-            text_chunks = split_text_into_chunks(text, chunk_size=chunk_size)
+            # Route each extractor to its sections and split them into chunks
+            text_chunks = get_default_document_cache().build_chunks(
+                document_hash, text, sections, chunk_size=chunk_size, model_name=model_name
+            )
             st.session_state.text_chunks = text_chunks
             st.session_state.current_chunk = 0
             st.session_state.extracted_text = ""
             st.session_state.processing_complete = False
-            st.success(f"Texto extraído exitosamente! Dividido en {len(text_chunks)} fragmentos.")
+            total_chunks = sum(len(chunks) for chunks in text_chunks.values())
+            found_sections = any(section["category"] for section in sections)
+            st.success(
+                f"Texto extraído exitosamente! {total_chunks} fragmentos para procesar"
+                + (f" ({len(sections)} secciones detectadas)." if found_sections else ".")
+            )
             
             # Process text chunks one by one
             progress_bar = st.progress(0)
@@ -328,48 +643,37 @@ def main():
             try:
                 # Initialize extracted data
                 st.session_state.extracted_data = {"text": text}
+                # Results and export of the previous analysis no longer apply, even if this one fails
+                st.session_state.analysis_results = None
+                st.session_state.report_hash = None
                 
-                # Initialize extraction results
-                extraction_results = {
-                    "zonation": {"zonas": []},
-                    "objectives": {"objetivos_conservacion": []},
-                    "literature": {"referencias_bibliograficas": []}
-                }
+                # Process all chunks concurrently, reporting progress as requests finish
+                def update_progress(done: int, total: int) -> None:
+                    st.session_state.current_chunk = done
+                    progress_bar.progress(done / total)
+                    status_text.text(f"Procesando solicitud {done} de {total}...")
                 
-                # Process each chunk
-                for i, chunk in enumerate(text_chunks):
-                    status_text.text(f"Procesando fragmento {i+1} de {len(text_chunks)}...")
-                    
-                    try:
-                        # Process the current chunk
-                        chunk_results = extract_all(chunk, model_name=model_name)
-                        
-                        # Merge results, avoiding duplicates
-                        if "zonation" in chunk_results and "zonas" in chunk_results["zonation"]:
-                            extraction_results["zonation"]["zonas"].extend(
-                                zone for zone in chunk_results["zonation"]["zonas"] 
-                                if zone not in extraction_results["zonation"]["zonas"]
-                            )
-                            
-                        if "objectives" in chunk_results and "objetivos_conservacion" in chunk_results["objectives"]:
-                            extraction_results["objectives"]["objetivos_conservacion"].extend(
-                                obj for obj in chunk_results["objectives"]["objetivos_conservacion"]
-                                if obj not in extraction_results["objectives"]["objetivos_conservacion"]
-                            )
-                            
-                        if "literature" in chunk_results and "referencias_bibliograficas" in chunk_results["literature"]:
-                            extraction_results["literature"]["referencias_bibliograficas"].extend(
-                                ref for ref in chunk_results["literature"]["referencias_bibliograficas"]
-                                if ref not in extraction_results["literature"]["referencias_bibliograficas"]
-                            )
-                            
-                    except Exception as e:
-                        st.warning(f"Advertencia en el fragmento {i+1}: {str(e)}")
-                        continue
-                    
-                    # Update progress
-                    progress = (i + 1) / len(text_chunks)
-                    progress_bar.progress(progress)
+                chunk_results = extract_chunks(
+                    text_chunks,
+                    model_name=model_name,
+                    max_workers=max_workers,
+                    progress_callback=update_progress,
+                    use_cache=use_cache,
+                    extractors=load_extractors(model_name),
+                    document_id=document_hash
+                )
+                
+                extraction_errors = False
+                for key, results in chunk_results.items():
+                    for i, result in enumerate(results):
+                        if "error" in result:
+                            extraction_errors = True
+                            st.warning(f"Advertencia en el fragmento {i+1}: {result['error']}")
+                
+                # Merge results in chunk order, deduplicating items and merging zones by name
+                extraction_results = merge_extraction_results(chunk_results)
+                
+                status_text.empty()
                 
                 # Store the combined results
                 st.session_state.extracted_data.update(extraction_results)
@@ -387,9 +691,27 @@ def main():
                         extraction_results.get("zonation", {}),
                         extraction_results.get("objectives", {}),
                         extraction_results.get("literature", {}),
-                        model_name=model_name
+                        model_name=model_name,
+                        use_cache=use_cache,
+                        evaluators=load_evaluators(model_name)
                     )
                     st.session_state.analysis_results = analysis_results
+                    st.session_state.report_hash = None
+                    for name, result in analysis_results.items():
+                        if "error" in result:
+                            st.warning(f"Advertencia en el análisis {name}: {result['error']}")
+                    
+                    # Only complete analyses are stored; incomplete ones are repeated next time
+                    if not extraction_errors and not any("error" in result for result in analysis_results.values()):
+                        get_default_results_store().save(
+                            document_hash,
+                            model_name,
+                            extraction_results,
+                            analysis_results,
+                            mpa_name=Path(uploaded_file.name).stem,
+                            source=uploaded_file.name,
+                            text=text
+                        )
                     st.success("✅ Análisis completado")
                 except Exception as e:
                     st.error(f"Error durante el análisis: {str(e)}")
@@ -398,6 +720,10 @@ def main():
             st.balloons()
             st.experimental_rerun()
     
+    # Follow the background analysis submitted by this session
+    if st.session_state.job_id:
+        show_job_status(st.session_state.job_id)
+    
     # Display results if available
     if st.session_state.extracted_data:
         st.markdown("## 📋 Resultados del Análisis")
@@ -405,7 +731,7 @@ def main():
         # Display extracted text preview
         with st.expander("📄 Ver texto extraído"):
             st.text_area("Texto extraído (vista previa)", 
-                        value=st.session_state.extracted_data["text"][:2000] + "...", 
+                        value=st.session_state.extracted_data.get("text", "")[:2000] + "...", 
                         height=300)
         
         # Display analysis results
@@ -423,13 +749,13 @@ def main():
             with tab2:
                 display_objectives_results(
                     st.session_state.extracted_data.get("objectives", {}),
-                    st.session_state.analysis_results.get("smart_analysis", {})
+                    st.session_state.analysis_results.get("smart_criteria_evaluation", {})
                 )
                 
             with tab3:
                 display_literature_results(
                     st.session_state.extracted_data.get("literature", {}),
-                    st.session_state.analysis_results.get("congruence_analysis", {})
+                    st.session_state.analysis_results.get("literature_congruence_analysis", {})
                 )
                 
             with tab4:
@@ -437,16 +763,46 @@ def main():
                     st.session_state.analysis_results.get("mpa_guide_evaluation", {})
                 )
             
-            # Add download button for full report
+            # Add download button for full report, serialised once per analysis and options
+            cols = st.columns(2)
+            include_text = cols[0].checkbox(
+                "Incluir texto extraído",
+                value=False,
+                help="Sin el texto, el informe identifica el documento por su hash"
+            )
+            compress = cols[1].checkbox("Comprimir (gzip)", value=False)
+            report_hash = current_report_hash()
             st.download_button(
                 label="📥 Descargar Informe Completo",
-                data=json.dumps({
-                    "extracted_data": st.session_state.extracted_data,
-                    "analysis_results": st.session_state.analysis_results
-                }, indent=2, ensure_ascii=False),
-                file_name="informe_analisis_mpa.json",
-                mime="application/json"
+                data=export_report(report_hash, include_text, compress, report_contents(include_text)),
+                file_name="informe_analisis_mpa.json" + (".gz" if compress else ""),
+                mime="application/gzip" if compress else "application/json"
             )
+        
+        # Time, tokens, cache hits and retries per stage of the last analysis
+        performance_trace = st.session_state.performance_trace
+        if performance_trace and performance_trace.spans:
+            with st.expander("⏱️ Rendimiento"):
+                st.dataframe(
+                    pd.DataFrame(performance_trace.summary()).rename(columns={
+                        "name": "Etapa",
+                        "count": "Llamadas",
+                        "total_seconds": "Tiempo total (s)",
+                        "mean_seconds": "Tiempo medio (s)",
+                        "errors": "Errores",
+                        "prompt_tokens": "Tokens de entrada",
+                        "completion_tokens": "Tokens de salida",
+                        "cache_hit": "Aciertos de caché",
+                        "retries": "Reintentos"
+                    }),
+                    use_container_width=True
+                )
+                st.download_button(
+                    label="📥 Descargar trazas (JSON)",
+                    data=performance_trace.to_json(),
+                    file_name="trazas_rendimiento.json",
+                    mime="application/json"
+                )
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,191 @@
+"""
+MPAgent Batch Analysis
+
+Command-line entry point that analyses a folder (or glob) of management plans
+without the Streamlit interface. Documents are processed by a pool of workers
+while a single limit caps the LLM requests in flight across all of them, and
+batch calls run at a lower priority than interactive analyses.
+
+Each plan gets a JSON report named after its content hash and the model, and an
+index of the run is written next to them. Error-free analyses are also added to
+the results store, so the Streamlit app can open them without calling the
+model. Plans whose report already exists without errors are skipped, so an
+interrupted run can simply be started again; plans that failed or finished with
+errors are analysed again and resume from their per-chunk checkpoints.
+
+Usage:
+    python batch_analysis.py planes/ --output informes/ --workers 4 --max-requests 8
+    python batch_analysis.py "planes/**/*.pdf" --model gpt-3.5-turbo
+"""
+
+import os
+import re
+import sys
+import glob
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List
+
+from extraction_modules import default_model, default_max_workers
+from llm_scheduler import LLMScheduler, set_default_scheduler, submit, priority, PRIORITY_BATCH
+from pipeline import analyze_document, DocumentError
+from results_store import get_default_results_store
+from upload_storage import content_hash
+
+# Name of the run summary written to the output directory
+INDEX_FILE = "index.json"
+
+
+def find_plans(inputs: List[str]) -> List[Path]:
+    """
+    Expand directories and glob patterns into the PDF files they contain.
+
+    Args:
+        inputs: Directories (searched recursively), files or glob patterns
+
+    Returns:
+        Unique PDF paths in sorted order
+    """
+    paths = set()
+    for entry in inputs:
+        path = Path(entry)
+        if path.is_dir():
+            paths.update(path.rglob("*.pdf"))
+        elif path.is_file():
+            paths.add(path)
+        else:
+            paths.update(Path(match) for match in glob.glob(entry, recursive=True))
+    return sorted(path for path in paths if path.suffix.lower() == ".pdf")
+
+
+def write_json(path: Path, data: Any) -> None:
+    """Write JSON atomically, so an interrupted run never leaves a truncated report."""
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    temp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(temp_path, path)
+
+
+def summarize_report(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the index fields of a plan report."""
+    extracted = report.get("extracted_data", {})
+    return {
+        "pages": report.get("pages"),
+        "zones": len(extracted.get("zonation", {}).get("zonas", [])),
+        "objectives": len(extracted.get("objectives", {}).get("objetivos_conservacion", [])),
+        "references": len(extracted.get("literature", {}).get("referencias_bibliograficas", [])),
+        "errors": len(report.get("errors", [])),
+    }
+
+
+def analyze_plan(path: Path, output_dir: Path, args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Analyse one plan and write its report, unless it already has an error-free report with this model.
+
+    Returns:
+        Index entry of the plan
+    """
+    document_hash = content_hash(path.read_bytes())
+    # Each model gets its own report, so switching models neither skips nor overwrites another model's reports
+    model_slug = re.sub(r"[^\w.-]+", "_", args.model)
+    report_path = output_dir / f"{document_hash}.{model_slug}.json"
+    entry = {"source": str(path), "document_hash": document_hash, "report": report_path.name}
+
+    if report_path.exists() and not args.force:
+        report = json.loads(report_path.read_text(encoding="utf-8"))
+        if not report.get("errors"):
+            return {**entry, "status": "skipped", **summarize_report(report)}
+
+    start = time.perf_counter()
+    try:
+        report = analyze_document(
+            path,
+            model_name=args.model,
+            chunk_size=args.chunk_size,
+            pdf_workers=args.pdf_workers,
+            route_by_section=not args.no_sections,
+            max_workers=args.max_requests,
+            use_cache=not args.no_cache,
+            document_id=document_hash
+        )
+    except DocumentError as e:
+        return {**entry, "report": None, "status": "failed", "error": str(e)}
+    except Exception as e:
+        return {**entry, "report": None, "status": "failed", "error": f"Error durante el análisis: {str(e)}"}
+
+    report["source"] = str(path)
+    report["analyzed_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    text = report["text"] if args.include_text else report.pop("text")
+    write_json(report_path, report)
+
+    if not report["errors"]:
+        get_default_results_store().save(
+            document_hash,
+            report["model_name"],
+            report["extracted_data"],
+            report["analysis_results"],
+            mpa_name=path.stem,
+            source=str(path),
+            pages=report["pages"],
+            text=text
+        )
+
+    status = "partial" if report["errors"] else "done"
+    return {**entry, "status": status, "seconds": round(time.perf_counter() - start, 2), **summarize_report(report)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="Directories, PDF files or glob patterns")
+    parser.add_argument("--output", type=Path, default=Path("informes"), help="Directory for the reports and the index")
+    parser.add_argument("--model", default=default_model, help="Model to use")
+    parser.add_argument("--workers", type=int, default=2, help="Plans analysed at the same time")
+    parser.add_argument("--max-requests", type=int, default=default_max_workers,
+                        help="LLM requests in flight, shared by all plans")
+    parser.add_argument("--chunk-size", type=int, help="Maximum chunk size in tokens (defaults to the model's budget)")
+    parser.add_argument("--pdf-workers", type=int, default=1, help="Processes for PDF text extraction per plan")
+    parser.add_argument("--no-sections", action="store_true", help="Send the full text to every extractor")
+    parser.add_argument("--no-cache", action="store_true", help="Do not reuse cached LLM responses or extraction checkpoints")
+    parser.add_argument("--include-text", action="store_true", help="Keep the extracted document text in the reports")
+    parser.add_argument("--force", action="store_true", help="Re-analyse plans that already have a report")
+    args = parser.parse_args()
+
+    plans = find_plans(args.inputs)
+    if not plans:
+        print("No se encontraron archivos PDF.", file=sys.stderr)
+        return 1
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    set_default_scheduler(LLMScheduler(max_concurrent=args.max_requests))
+
+    print(f"Analizando {len(plans)} planes ({args.workers} a la vez, {args.max_requests} solicitudes simultáneas al modelo)")
+    entries = []
+    start = time.perf_counter()
+    with priority(PRIORITY_BATCH), ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {submit(executor, analyze_plan, path, args.output, args): path for path in plans}
+        for done, future in enumerate(as_completed(futures), 1):
+            entry = future.result()
+            entries.append(entry)
+            detail = entry.get("error") or f"{entry.get('objectives', 0)} objetivos, {entry.get('errors', 0)} advertencias"
+            print(f"[{done}/{len(plans)}] {entry['status']:<8} {entry['source']} ({detail})")
+
+    entries.sort(key=lambda entry: entry["source"])
+    counts = {status: sum(entry["status"] == status for entry in entries) for status in ("done", "partial", "skipped", "failed")}
+    write_json(args.output / INDEX_FILE, {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "model_name": args.model,
+        "seconds": round(time.perf_counter() - start, 2),
+        "counts": counts,
+        "plans": entries,
+    })
+
+    print(f"Completados: {counts['done']} · Con errores: {counts['partial']} · Omitidos: {counts['skipped']} · Fallidos: {counts['failed']}")
+    print(f"Índice guardado en {args.output / INDEX_FILE}")
+    return 1 if counts["failed"] or counts["partial"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
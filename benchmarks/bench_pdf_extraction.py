@@ -0,0 +1,83 @@
+"""
+Benchmark PDF text extraction: serial page loop vs. process pool.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_pdf_extraction --pages 500 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import fitz  # PyMuPDF
+
+from pdf_processing import extract_pdf_text, extract_pdf_text_parallel
+from benchmarks.synthetic_plans import make_plan_pdf
+
+
+def baseline_extract(data: bytes) -> str:
+    """The original extraction loop, with string concatenation per page."""
+    doc = fitz.open(stream=data, filetype="pdf")
+    full_text = ""
+    for page in doc:
+        full_text += page.get_text("text") + "\n\n"
+    doc.close()
+    return full_text.strip()
+
+
+def streamed_extract(data: bytes) -> str:
+    """Serial extraction through the page generator."""
+    doc = fitz.open(stream=data, filetype="pdf")
+    try:
+        return extract_pdf_text(doc)
+    finally:
+        doc.close()
+
+
+def time_call(function, *args, repeat: int = 3, **kwargs) -> float:
+    """Return the best wall time of several runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=500, help="Approximate number of pages of the synthetic plan")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4], help="Worker counts to benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per configuration (best time is reported)")
+    args = parser.parse_args()
+
+    data = make_plan_pdf(args.pages)
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        pages = len(doc)
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as handle:
+        handle.write(data)
+        path = handle.name
+
+    try:
+        expected = baseline_extract(data)
+        print(f"Documento sintético: {pages} páginas, {len(data) / 1024:.0f} KB, {os.cpu_count()} CPU")
+        print(f"{'configuración':<28}{'tiempo (s)':>12}{'páginas/s':>12}")
+
+        rows = [
+            ("serie (original)", time_call(baseline_extract, data, repeat=args.repeat)),
+            ("serie (generador)", time_call(streamed_extract, data, repeat=args.repeat)),
+        ]
+        for workers in args.workers:
+            assert extract_pdf_text_parallel(path, workers=workers) == expected
+            rows.append((f"{workers} procesos (archivo)", time_call(extract_pdf_text_parallel, path, workers=workers, repeat=args.repeat)))
+            rows.append((f"{workers} procesos (bytes)", time_call(extract_pdf_text_parallel, data, workers=workers, repeat=args.repeat)))
+
+        for label, seconds in rows:
+            print(f"{label:<28}{seconds:>12.3f}{pages / seconds:>12.1f}")
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+End-to-end benchmark of the extraction and analysis pipeline.
+
+Each synthetic plan runs in a fresh process through text extraction, chunking,
+extraction, merging and analysis. A fake LLM backend stands in for the model: it
+answers from the plan's content after a configurable latency. The benchmark
+reports pages/s, chunks/s, LLM calls and tokens per document, peak RSS and wall
+time, and saves the results as JSON for later comparison.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_pipeline --pages 10 100 1000 --latency 0.2
+    python -m benchmarks.bench_pipeline --compare benchmarks/results/previous.json
+"""
+
+import os
+
+# Benchmarks run offline and measure the pipeline, not the API limits or the response cache
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["LLM_REQUESTS_PER_MINUTE"] = "0"
+os.environ["LLM_TOKENS_PER_MINUTE"] = "0"
+os.environ["LLM_CACHE_ENABLED"] = "False"
+
+import argparse
+import json
+import multiprocessing
+import resource
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict
+
+from llm_backends import FakeBackend, Completion
+from extraction_modules import EXTRACTORS, extract_chunks, default_max_workers
+from analytical_modules import MPAGuideEvaluator, SMARTCriteriaEvaluator, LiteratureCongruenceAnalyzer, analyze_all
+from result_merging import merge_extraction_results
+from pipeline import read_pdf, build_chunks
+from benchmarks.synthetic_plans import make_plan_pdf
+from benchmarks.synthetic_responses import RESPONDERS
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+class MeteredBackend(FakeBackend):
+    """Fake backend that counts the calls and tokens it serves."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def complete(self, prompt: str) -> Completion:
+        completion = super().complete(prompt)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += completion.prompt_tokens
+            self.completion_tokens += completion.completion_tokens
+        return completion
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process and its finished children, in MB."""
+    # ru_maxrss is reported in kilobytes on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+
+def run_document(pages: int, model_name: str, latency: float, tokens_per_second: float,
+                 max_workers: int, pdf_workers: int, seed: int) -> Dict:
+    """Run the whole pipeline over one synthetic plan and measure it."""
+    def backend(key: str) -> MeteredBackend:
+        return MeteredBackend(model_name, latency=latency, tokens_per_second=tokens_per_second, responder=RESPONDERS[key])
+
+    extractors = {key: extractor_class(model_name, backend=backend(key)) for key, extractor_class in EXTRACTORS.items()}
+    evaluators = {
+        "mpa_guide": MPAGuideEvaluator(model_name, backend=backend("mpa_guide")),
+        "smart": SMARTCriteriaEvaluator(model_name, backend=backend("smart")),
+        "congruence": LiteratureCongruenceAnalyzer(model_name, backend=backend("congruence")),
+    }
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as handle:
+        handle.write(make_plan_pdf(pages, seed))
+        path = handle.name
+
+    timings = {}
+    try:
+        start = time.perf_counter()
+        text, sections, page_count = read_pdf(path, workers=pdf_workers, index_sections=True)
+        timings["pdf"] = time.perf_counter() - start
+
+        stage = time.perf_counter()
+        chunks = build_chunks(text, sections, model_name=model_name)
+        timings["chunking"] = time.perf_counter() - stage
+
+        stage = time.perf_counter()
+        chunk_results = extract_chunks(chunks, model_name=model_name, max_workers=max_workers,
+                                       use_cache=False, extractors=extractors)
+        timings["extraction"] = time.perf_counter() - stage
+
+        stage = time.perf_counter()
+        extracted = merge_extraction_results(chunk_results)
+        timings["merging"] = time.perf_counter() - stage
+
+        stage = time.perf_counter()
+        analysis = analyze_all(extracted["zonation"], extracted["objectives"], extracted["literature"],
+                               model_name=model_name, use_cache=False, evaluators=evaluators)
+        timings["analysis"] = time.perf_counter() - stage
+        wall = time.perf_counter() - start
+    finally:
+        os.unlink(path)
+
+    backends = [extractor.backend for extractor in extractors.values()] + [evaluator.backend for evaluator in evaluators.values()]
+    chunk_count = sum(len(key_chunks) for key_chunks in chunks.values())
+    return {
+        "pages": page_count,
+        "chunks": chunk_count,
+        "zones": len(extracted["zonation"]["zonas"]),
+        "objectives": len(extracted["objectives"]["objetivos_conservacion"]),
+        "references": len(extracted["literature"]["referencias_bibliograficas"]),
+        "errors": sum("error" in result for results in chunk_results.values() for result in results)
+                  + sum("error" in result for result in analysis.values()),
+        "llm_calls": sum(backend.calls for backend in backends),
+        "prompt_tokens": sum(backend.prompt_tokens for backend in backends),
+        "completion_tokens": sum(backend.completion_tokens for backend in backends),
+        "wall_seconds": round(wall, 3),
+        "stage_seconds": {name: round(seconds, 3) for name, seconds in timings.items()},
+        "pages_per_second": round(page_count / wall, 2),
+        "chunks_per_second": round(chunk_count / timings["extraction"], 2) if timings["extraction"] else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def compare(current: Dict, previous_path: Path) -> None:
+    """Print the wall-time change of each plan size against a previous results file."""
+    previous = {run["requested_pages"]: run for run in json.loads(previous_path.read_text())["runs"]}
+    print(f"\nComparación con {previous_path}:")
+    for run in current["runs"]:
+        before = previous.get(run["requested_pages"])
+        if before:
+            change = (run["wall_seconds"] - before["wall_seconds"]) / before["wall_seconds"] * 100
+            print(f"  {run['requested_pages']:>5} páginas: {before['wall_seconds']:.2f}s -> {run['wall_seconds']:.2f}s ({change:+.1f}%)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 500, 1000], help="Approximate sizes of the synthetic plans")
+    parser.add_argument("--model", default="gpt-4", help="Model name used for token counting and chunk budgets")
+    parser.add_argument("--latency", type=float, default=0.1, help="Fixed seconds per fake LLM call")
+    parser.add_argument("--tokens-per-second", type=float, default=0, help="Simulated generation speed (0 = instantaneous)")
+    parser.add_argument("--max-workers", type=int, default=default_max_workers, help="Concurrent LLM requests")
+    parser.add_argument("--pdf-workers", type=int, default=1, help="Processes for PDF text extraction")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic plans")
+    parser.add_argument("--output", type=Path, help="Results file (defaults to benchmarks/results/pipeline-<timestamp>.json)")
+    parser.add_argument("--compare", type=Path, help="Previous results file to compare wall times against")
+    args = parser.parse_args()
+
+    results = {"settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")}, "runs": []}
+    results["settings"]["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    print(f"{'páginas':>8} {'fragm.':>7} {'llamadas':>9} {'tokens':>9} {'tiempo':>8} {'pág/s':>7} {'fragm/s':>8} {'RSS MB':>7}")
+    for pages in args.pages:
+        # A fresh process per plan keeps peak RSS and caches independent between sizes
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            run = executor.submit(run_document, pages, args.model, args.latency, args.tokens_per_second,
+                                  args.max_workers, args.pdf_workers, args.seed).result()
+        run["requested_pages"] = pages
+        results["runs"].append(run)
+        print(f"{run['pages']:>8} {run['chunks']:>7} {run['llm_calls']:>9} "
+              f"{run['prompt_tokens'] + run['completion_tokens']:>9} {run['wall_seconds']:>7.2f}s "
+              f"{run['pages_per_second']:>7.1f} {run['chunks_per_second'] or 0:>8.1f} {run['peak_rss_mb']:>7.1f}")
+
+    output = args.output or RESULTS_DIR / f"pipeline-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, ensure_ascii=False, indent=2))
+    print(f"\nResultados guardados en {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark the prompt size of each analytical evaluator per input encoding.
+
+A synthetic plan is "extracted" with the deterministic responders, and each
+evaluator's prompt is built from the results with the original indented JSON
+and with every compact encoding. The benchmark reports prompt tokens and the
+reduction per evaluator, and checks that the fake model still finds every zone
+and objective in the compact prompts.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_prompt_encoding --pages 100 200 --model gpt-4
+"""
+
+import argparse
+import json
+
+from analytical_modules import MPAGuideEvaluator, SMARTCriteriaEvaluator, LiteratureCongruenceAnalyzer
+from llm_backends import FakeBackend
+from prompt_encoding import INPUT_FORMATS, encode_zones, encode_objectives, encode_congruence
+from text_chunking import get_token_counter
+from benchmarks.synthetic_plans import plan_sections
+from benchmarks.synthetic_responses import RESPONDERS
+
+
+# Section of the synthetic plan read by each extractor
+SECTIONS = {"zonation": "ZONIFICACIÓN", "objectives": "OBJETIVOS", "literature": "BIBLIOGRAFÍA"}
+
+
+def extract_plan(pages: int, seed: int) -> dict:
+    """Extraction results of a synthetic plan, as the fake model would return them."""
+    sections = {title: "\n\n".join(paragraphs) for title, paragraphs in plan_sections(pages, seed)}
+    # Each responder reads only its section, as section routing would send it
+    return {key: json.loads(RESPONDERS[key](sections[title])) for key, title in SECTIONS.items()}
+
+
+def evaluator_prompts(extracted: dict, model_name: str) -> dict:
+    """Prompt of each evaluator per encoding, including the original indented JSON."""
+    backend = FakeBackend(model_name)
+    templates = {
+        "mpa_guide": MPAGuideEvaluator(model_name, backend=backend).template,
+        "smart": SMARTCriteriaEvaluator(model_name, backend=backend).template,
+        "congruence": LiteratureCongruenceAnalyzer(model_name, backend=backend).template,
+    }
+    zonation, objectives, literature = extracted["zonation"], extracted["objectives"], extracted["literature"]
+
+    def indented(value) -> str:
+        return json.dumps(value, ensure_ascii=False, indent=2)
+
+    inputs = {
+        "mpa_guide": {"indented": indented(zonation),
+                      **{fmt: encode_zones(zonation, fmt) for fmt in INPUT_FORMATS}},
+        "smart": {"indented": indented(objectives),
+                  **{fmt: encode_objectives(objectives, fmt) for fmt in INPUT_FORMATS}},
+        "congruence": {"indented": indented({"objetivos": objectives, "literatura": literature}),
+                       **{fmt: encode_congruence(objectives, literature, fmt) for fmt in INPUT_FORMATS}},
+    }
+    variables = {"mpa_guide": "zonation_data", "smart": "objectives_data", "congruence": "combined_data"}
+    return {
+        name: {fmt: templates[name].format(**{variables[name]: value}) for fmt, value in encoded.items()}
+        for name, encoded in inputs.items()
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200], help="Approximate sizes of the synthetic plans")
+    parser.add_argument("--model", default="gpt-4", help="Model name used for token counting")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic plans")
+    args = parser.parse_args()
+
+    count_tokens = get_token_counter(args.model)
+    formats = ("indented",) + INPUT_FORMATS
+    expected_items = {"mpa_guide": ("zonation", "zonas", "evaluacion_zonas"),
+                      "smart": ("objectives", "objetivos_conservacion", "evaluacion_objetivos"),
+                      "congruence": ("objectives", "objetivos_conservacion", "congruencia_tematica")}
+
+    for pages in args.pages:
+        extracted = extract_plan(pages, args.seed)
+        print(f"\nPlan sintético de ~{pages} páginas: "
+              f"{len(extracted['zonation']['zonas'])} zonas, "
+              f"{len(extracted['objectives']['objetivos_conservacion'])} objetivos, "
+              f"{len(extracted['literature']['referencias_bibliograficas'])} referencias")
+        print(f"{'evaluador':<12}" + "".join(f"{fmt:>12}" for fmt in formats) + f"{'reducción':>12}")
+
+        for name, prompts in evaluator_prompts(extracted, args.model).items():
+            tokens = {fmt: count_tokens(prompt) for fmt, prompt in prompts.items()}
+            best = min(tokens[fmt] for fmt in INPUT_FORMATS)
+            print(f"{name:<12}" + "".join(f"{tokens[fmt]:>12}" for fmt in formats)
+                  + f"{1 - best / tokens['indented']:>12.1%}")
+
+            # The compact prompts must still carry every zone and objective
+            source, items, answer = expected_items[name]
+            expected = len(extracted[source][items])
+            for fmt in INPUT_FORMATS:
+                found = len(json.loads(RESPONDERS[name](prompts[fmt]))[answer])
+                assert found == expected, f"{name} ({fmt}): {found} de {expected} elementos"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Synthetic MPA management plans for benchmarking.
+
+Generates deterministic Spanish-language management plan PDFs of any length, with
+the sections the pipeline looks for (objectives, zonation and bibliography) set as
+bold headings between pages of descriptive text.
+"""
+
+import random
+from typing import List, Tuple
+import fitz  # PyMuPDF
+
+PAGE_RECT = fitz.Rect(56, 56, 556, 786)
+BODY_FONT_SIZE = 10
+HEADING_FONT_SIZE = 14
+
+_SUBJECTS = ["El arrecife coralino", "La pesca artesanal", "El manglar", "La población de tiburones",
+             "El turismo de buceo", "La calidad del agua", "La comunidad pesquera", "El pasto marino"]
+_VERBS = ["presenta", "requiere", "sostiene", "depende de", "se ve afectado por", "contribuye a"]
+_OBJECTS = ["la conectividad ecológica", "el monitoreo participativo", "la vigilancia comunitaria",
+            "la recuperación de especies", "el manejo adaptativo", "los servicios ecosistémicos",
+            "la reducción de la presión pesquera", "la restauración del hábitat"]
+_AUTHORS = ["García, M.", "López, A.", "Hernández, J.", "Martínez, L.", "Pérez, R.", "Sánchez, C."]
+_JOURNALS = ["Ciencias Marinas", "Revista de Biología Tropical", "Hidrobiológica", "Marine Policy"]
+
+
+def _sentence(rng: random.Random) -> str:
+    return f"{rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)} en la zona {rng.randint(1, 12)}."
+
+
+def _paragraph(rng: random.Random, sentences: int = 6) -> str:
+    return " ".join(_sentence(rng) for _ in range(sentences))
+
+
+def plan_sections(pages: int, seed: int = 0) -> List[Tuple[str, List[str]]]:
+    """
+    Build the sections of a synthetic plan.
+
+    Args:
+        pages: Approximate number of pages of the final PDF
+        seed: Random seed, so the same arguments always give the same plan
+
+    Returns:
+        List of (heading, paragraphs) tuples
+    """
+    rng = random.Random(seed)
+    paragraphs_per_page = 10
+    n_objectives = max(3, pages // 10)
+    n_zones = max(2, pages // 25)
+    n_references = max(5, pages // 2)
+
+    objectives = [
+        f"Objetivo {i + 1}. Conservar {rng.choice(_OBJECTS)} mediante {rng.choice(_OBJECTS)} antes de {2025 + i % 10}."
+        for i in range(n_objectives)
+    ]
+    zones = [
+        f"Zona {i + 1} ({rng.choice(['núcleo', 'de amortiguamiento', 'de uso restringido'])}). "
+        f"Límites: polígono con vértices en {rng.uniform(18, 19):.4f} N, {rng.uniform(110, 112):.4f} O. "
+        f"Regulaciones: se prohíbe {rng.choice(['la pesca comercial', 'el anclaje', 'la extracción de especies'])}; "
+        f"se permite {rng.choice(['el buceo recreativo', 'la investigación científica', 'la navegación'])}."
+        for i in range(n_zones)
+    ]
+    references = [
+        f"{rng.choice(_AUTHORS)} y {rng.choice(_AUTHORS)} ({rng.randint(1990, 2023)}). "
+        f"{rng.choice(_SUBJECTS)} y {rng.choice(_OBJECTS)}. {rng.choice(_JOURNALS)} {rng.randint(10, 60)}: {rng.randint(1, 300)}-{rng.randint(301, 600)}."
+        for _ in range(n_references)
+    ]
+
+    structured_pages = (n_objectives + n_zones + n_references) // 12 + 3
+    filler_pages = max(pages - structured_pages, 1)
+    filler = [_paragraph(rng) for _ in range(filler_pages * paragraphs_per_page)]
+    half = len(filler) // 2
+
+    return [
+        ("INTRODUCCIÓN", filler[:half]),
+        ("OBJETIVOS", objectives),
+        ("DIAGNÓSTICO AMBIENTAL", filler[half:]),
+        ("ZONIFICACIÓN", zones),
+        ("BIBLIOGRAFÍA", references),
+    ]
+
+
+def make_plan_pdf(pages: int, seed: int = 0) -> bytes:
+    """
+    Render a synthetic plan as a PDF.
+
+    Args:
+        pages: Approximate number of pages
+        seed: Random seed
+
+    Returns:
+        PDF file contents
+    """
+    doc = fitz.open()
+    page = doc.new_page()
+    y = PAGE_RECT.y0
+
+    def write(text: str, fontsize: float, fontname: str) -> None:
+        nonlocal page, y
+        while True:
+            rect = fitz.Rect(PAGE_RECT.x0, y, PAGE_RECT.x1, PAGE_RECT.y1)
+            # insert_textbox returns the unused height, or a negative value if the text did not fit
+            remaining = page.insert_textbox(rect, text, fontsize=fontsize, fontname=fontname) if rect.height > fontsize * 2 else -1
+            if remaining >= 0:
+                y = PAGE_RECT.y1 - remaining + fontsize * 0.6
+                return
+            page = doc.new_page()
+            y = PAGE_RECT.y0
+
+    for heading, paragraphs in plan_sections(pages, seed):
+        write(heading, HEADING_FONT_SIZE, "hebo")
+        for paragraph in paragraphs:
+            write(paragraph, BODY_FONT_SIZE, "helv")
+
+    data = doc.tobytes()
+    doc.close()
+    return data
@@ -0,0 +1,102 @@
+"""
+Deterministic model answers for synthetic MPA management plans.
+
+Each responder reads the prompt the way the real model would read a plan made by
+``synthetic_plans`` and returns a JSON answer in the format its extractor or
+evaluator asks for. Combined with ``llm_backends.FakeBackend`` this runs the
+whole pipeline offline, with realistic numbers of zones, objectives and
+references flowing from extraction into analysis.
+"""
+
+import json
+import re
+from typing import Callable, Dict
+
+_OBJECTIVE = re.compile(r"Objetivo \d+\. Conservar .+? antes de \d{4}\.")
+_ZONE = re.compile(r"(Zona \d+ \([^)]+\))\. Límites: (.+?)\. Regulaciones: (.+?)\.(?= |$)")
+_REFERENCE = re.compile(r"([A-ZÁÉÍÓÚ][^()]+? y [A-ZÁÉÍÓÚ][^()]+?) \((\d{4})\)\. (.+?)\. ([^\d.]+?) (\d+: \d+-\d+)\.")
+_ZONE_NAME = re.compile(r"Zona \d+ \([^)]+\)")
+
+
+def _flatten(prompt: str) -> str:
+    """Join the lines of a prompt, undoing the line breaks of PDF text."""
+    return " ".join(prompt.split())
+
+
+def _answer(result: Dict) -> str:
+    return json.dumps(result, ensure_ascii=False)
+
+
+def _unique(items):
+    return list(dict.fromkeys(items))
+
+
+def zonation(prompt: str) -> str:
+    zones = [
+        {"nombre_zona": name, "limites": limits, "regulaciones": [rule.strip() for rule in rules.split(";")]}
+        for name, limits, rules in _ZONE.findall(_flatten(prompt))
+    ]
+    return _answer({"zonas": zones})
+
+
+def objectives(prompt: str) -> str:
+    return _answer({"objetivos_conservacion": _unique(_OBJECTIVE.findall(_flatten(prompt)))})
+
+
+def literature(prompt: str) -> str:
+    references = [
+        {"autores": authors, "titulo": title, "revista_o_fuente": f"{journal} {pages}", "ano_publicacion": year}
+        for authors, year, title, journal, pages in _REFERENCE.findall(_flatten(prompt))
+    ]
+    return _answer({"referencias_bibliograficas": references})
+
+
+def mpa_guide(prompt: str) -> str:
+    evaluations = [
+        {
+            "nombre_zona": name,
+            "categoria_MPA_guide": "Totalmente Protegida" if "núcleo" in name else "Altamente Protegida",
+            "justificacion": "Las regulaciones prohíben las actividades extractivas de mayor impacto."
+        }
+        for name in _unique(_ZONE_NAME.findall(_flatten(prompt)))
+    ]
+    return _answer({"evaluacion_zonas": evaluations})
+
+
+def smart(prompt: str) -> str:
+    evaluations = [
+        {
+            "objetivo": objective,
+            "SMART": {"Especifico": True, "Medible": False, "Alcanzable": True, "Relevante": True, "Con_plazo": True},
+            "puntuacion_SMART": 4,
+            "viabilidad": "Viable si se asignan recursos de monitoreo."
+        }
+        for objective in _unique(_OBJECTIVE.findall(_flatten(prompt)))
+    ]
+    return _answer({"evaluacion_objetivos": evaluations})
+
+
+def congruence(prompt: str) -> str:
+    text = _flatten(prompt)
+    analyses = [
+        {
+            "objetivo": objective,
+            "respaldado_por_literatura": True,
+            "temas_relacionados_literatura": ["conservación marina"],
+            "referencias_relacionadas": [],
+            "comentarios": "La literatura citada aborda el tema del objetivo."
+        }
+        for objective in _unique(_OBJECTIVE.findall(text))
+    ]
+    return _answer({"congruencia_tematica": analyses, "brechas_tematicas_generales": ["cambio climático"]})
+
+
+# Responder for each extractor and evaluator key
+RESPONDERS: Dict[str, Callable[[str], str]] = {
+    "zonation": zonation,
+    "objectives": objectives,
+    "literature": literature,
+    "mpa_guide": mpa_guide,
+    "smart": smart,
+    "congruence": congruence,
+}
@@ -0,0 +1,139 @@
+"""
+MPAgent Extraction Checkpoints
+
+This module persists per-chunk extraction results in a local SQLite database,
+keyed by document hash, backend and model, extractor and chunk index. If extraction is
+interrupted (a failed chunk, a Streamlit session reload) the next run restores
+the finished chunks and only sends the missing or failed ones to the model.
+
+Each checkpoint also records a hash of the chunk text, so changing the chunk size
+or the section routing invalidates the affected checkpoints automatically.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Checkpoint configuration from environment
+default_checkpoint_path = os.getenv("CHECKPOINT_PATH", "./.cache/checkpoints.sqlite3")
+default_retention_days = float(os.getenv("CHECKPOINT_RETENTION_DAYS", "7"))
+
+
+def chunk_hash(chunk: str) -> str:
+    """Return the SHA-256 hex digest of a chunk's text."""
+    return hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+
+
+class CheckpointStore:
+    """
+    SQLite-backed store of per-chunk extraction results.
+
+    The store is safe to share between threads; all access goes through a single
+    connection guarded by a lock.
+    """
+
+    def __init__(self, path: str = None, retention_days: float = None):
+        """
+        Initialize the checkpoint store.
+
+        Args:
+            path: SQLite database file (defaults to CHECKPOINT_PATH)
+            retention_days: Checkpoints older than this are pruned on start-up
+                (defaults to CHECKPOINT_RETENTION_DAYS)
+        """
+        self.path = Path(path or default_checkpoint_path)
+        self.retention_days = default_retention_days if retention_days is None else retention_days
+
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # model_name holds the backend's cache namespace, which is the plain model name for OpenAI
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunk_results (
+                document_hash TEXT NOT NULL,
+                model_name TEXT NOT NULL,
+                extractor TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                chunk_hash TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (document_hash, model_name, extractor, chunk_index)
+            )
+        """)
+        self._conn.execute(
+            "DELETE FROM chunk_results WHERE created_at < ?",
+            (time.time() - self.retention_days * 86400,)
+        )
+        self._conn.commit()
+
+    def load(self, document_hash: str, namespace: str) -> Dict[Tuple[str, int], Tuple[str, Dict]]:
+        """
+        Load every checkpoint of a document.
+
+        Args:
+            document_hash: Content hash of the document
+            namespace: Cache namespace of the backend the results were extracted with
+                (LLMBackend.cache_namespace)
+
+        Returns:
+            Dictionary mapping (extractor, chunk index) to (chunk hash, result)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT extractor, chunk_index, chunk_hash, result FROM chunk_results "
+                "WHERE document_hash = ? AND model_name = ?",
+                (document_hash, namespace)
+            ).fetchall()
+
+        return {(extractor, index): (digest, json.loads(result)) for extractor, index, digest, result in rows}
+
+    def save(self, document_hash: str, namespace: str, extractor: str, chunk_index: int, chunk: str, result: Dict) -> None:
+        """
+        Checkpoint the result of one chunk.
+
+        Args:
+            document_hash: Content hash of the document
+            namespace: Cache namespace of the backend the result was extracted with
+            extractor: Extractor key ("zonation", "objectives" or "literature")
+            chunk_index: Position of the chunk in the extractor's chunk list
+            chunk: Chunk text, hashed to detect changed chunking
+            result: Extraction result for the chunk
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunk_results "
+                "(document_hash, model_name, extractor, chunk_index, chunk_hash, result, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (document_hash, namespace, extractor, chunk_index, chunk_hash(chunk),
+                 json.dumps(result, ensure_ascii=False), time.time())
+            )
+            self._conn.commit()
+
+    def delete_document(self, document_hash: str) -> None:
+        """Remove every checkpoint of a document."""
+        with self._lock:
+            self._conn.execute("DELETE FROM chunk_results WHERE document_hash = ?", (document_hash,))
+            self._conn.commit()
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_store() -> CheckpointStore:
+    """Return the process-wide checkpoint store, creating it on first use."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = CheckpointStore()
+        return _default_store
@@ -0,0 +1,200 @@
+"""
+MPAgent Document Cache
+
+This module keeps the text and chunk lists of recently read documents in memory
+so Streamlit reruns and repeated analyses do not parse the same PDF again.
+
+Extracted text (with its section index) is memoised by the document's content
+hash, and chunk lists by content hash, chunk size, model and routing mode, since
+only those determine the chunks. Entries are evicted least recently used first
+once their estimated size exceeds the configured memory budget. The cache is
+shared by every session of the process, which is safe because entries are keyed
+by document content rather than by upload.
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, Union
+from dotenv import load_dotenv
+
+from pipeline import read_pdf, build_chunks
+
+# Load environment variables
+load_dotenv()
+
+# Memory budget of the cached texts and chunk lists
+default_max_size_mb = float(os.getenv("DOCUMENT_CACHE_MAX_MB", "256"))
+
+
+def estimate_size(value: Any) -> int:
+    """Estimate the memory held by strings, numbers and the lists, tuples and dictionaries containing them."""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(key) + estimate_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class DocumentCache:
+    """
+    In-memory LRU cache of document texts and chunk lists, bounded by size.
+
+    The cache is safe to share between threads. Two sessions reading the same
+    uncached document at the same time may both parse it; the second result
+    simply replaces the first.
+    """
+
+    def __init__(self, max_size_mb: float = None):
+        """
+        Initialize the document cache.
+
+        Args:
+            max_size_mb: Memory budget in MB (defaults to DOCUMENT_CACHE_MAX_MB; 0 disables caching)
+        """
+        self.max_size_bytes = int((default_max_size_mb if max_size_mb is None else max_size_mb) * 1024 * 1024)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size_bytes = 0
+
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a cached value and mark it as recently used, or None if absent."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entries beyond the memory budget."""
+        size = estimate_size(value)
+        if size > self.max_size_bytes:
+            # Larger than the whole budget: caching it would only flush everything else
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size_bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self.size_bytes += size
+
+            while self.size_bytes > self.max_size_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted_size
+                self.evictions += 1
+
+    def read_pdf(
+        self,
+        document_hash: str,
+        pdf_path: Union[str, Path],
+        workers: int = 1,
+        index_sections: bool = False,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> Tuple[str, list, int]:
+        """
+        Return the text, sections and page count of a PDF, reading it only if it is not cached.
+
+        A cached reading with a section index also serves requests without one.
+
+        Args:
+            document_hash: Content hash of the PDF
+            pdf_path: PDF file, read on a cache miss
+            workers: Processes used for text extraction on a cache miss
+            index_sections: Whether the section index is needed
+            progress_callback: Optional page progress callback, only called on a cache miss
+
+        Returns:
+            Tuple of (full text, sections, page count), as returned by pipeline.read_pdf
+
+        Raises:
+            DocumentError: If the PDF cannot be read
+        """
+        cached = self.get(("text", document_hash, True))
+        if cached is not None:
+            text, sections, pages = cached
+            return text, sections if index_sections else [], pages
+
+        if not index_sections:
+            cached = self.get(("text", document_hash, False))
+            if cached is not None:
+                return cached
+
+        result = read_pdf(pdf_path, workers, index_sections, progress_callback)
+        self.set(("text", document_hash, index_sections), result)
+        return result
+
+    def build_chunks(
+        self,
+        document_hash: str,
+        text: str,
+        sections: list,
+        chunk_size: int = None,
+        model_name: str = None
+    ) -> Dict[str, List[str]]:
+        """
+        Return the chunks of each extractor, building them only if they are not cached.
+
+        Args:
+            document_hash: Content hash of the document the text was read from
+            text: Full document text
+            sections: Section index (empty to send the full text to every extractor)
+            chunk_size: Maximum chunk size in tokens (defaults to the model's budget)
+            model_name: Model name used for token counting
+
+        Returns:
+            Dictionary mapping each extractor key to its chunks, as returned by pipeline.build_chunks
+        """
+        key = ("chunks", document_hash, chunk_size, model_name, bool(sections))
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        chunks = build_chunks(text, sections, chunk_size=chunk_size, model_name=model_name)
+        self.set(key, chunks)
+        return chunks
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with entry count, size in bytes, hits, misses and evictions
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self.size_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_document_cache() -> DocumentCache:
+    """Return the process-wide document cache, creating it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = DocumentCache()
+        return _default_cache
@@ -0,0 +1,164 @@
+"""
+MPAgent Document Sections
+
+This module builds a section index for MPA management plans so that each extractor
+only reads the parts of the document that are relevant to it. Headings are detected
+from the PyMuPDF layout (font size and bold spans from ``page.get_text("dict")``)
+and classified with Spanish keywords such as "ZONIFICACIÓN", "OBJETIVOS",
+"BIBLIOGRAFÍA" or "REFERENCIAS".
+
+This is part of Phase 1 (Document Processing) of the MPAgent project.
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Any, Optional
+
+# Keywords (uppercase, without accents) that identify the sections each extractor needs
+SECTION_KEYWORDS = {
+    "zonation": ["ZONIFICACION", "SUBZONIFICACION", "SUBZONAS", "ZONAS", "REGLAS ADMINISTRATIVAS"],
+    "objectives": ["OBJETIVOS", "OBJETIVO GENERAL", "OBJETIVOS ESPECIFICOS"],
+    "literature": ["BIBLIOGRAFIA", "REFERENCIAS", "LITERATURA CITADA", "FUENTES CONSULTADAS"],
+}
+
+# A line is a heading candidate if its font is this much larger than the body text
+HEADING_SIZE_RATIO = 1.15
+
+# Longer lines are treated as body text even when bold or large
+MAX_HEADING_LENGTH = 120
+
+# PyMuPDF span flag for bold text
+BOLD_FLAG = 16
+
+# Table-of-contents entries: dot leaders or a trailing page number
+_TOC_PATTERN = re.compile(r"(\.{4,}|…{2,}|\s\d{1,4}\s*$)")
+
+
+def normalize_heading(text: str) -> str:
+    """Uppercase a heading and strip accents and surrounding numbering."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"^(CAPITULO\s+)?(\d+(\.\d+)*\.?|[IVXLC]+[\.\)\-])?\s*", "", text.strip().upper())
+    return re.sub(r"\s+", " ", text)
+
+
+def classify_heading(text: str) -> Optional[str]:
+    """
+    Map a heading to the extractor that needs its section.
+
+    Args:
+        text: Heading text as it appears in the document
+
+    Returns:
+        "zonation", "objectives" or "literature", or None if the heading is unrelated
+    """
+    normalized = normalize_heading(text)
+    for category, keywords in SECTION_KEYWORDS.items():
+        for keyword in keywords:
+            if normalized.startswith(keyword):
+                return category
+    return None
+
+
+def _iter_lines(page_dict: Dict) -> List[Dict[str, Any]]:
+    """Flatten a page's text dictionary into lines with their size and bold flag."""
+    lines = []
+    for block in page_dict.get("blocks", []):
+        for line in block.get("lines", []):
+            spans = [span for span in line.get("spans", []) if span.get("text", "").strip()]
+            if not spans:
+                continue
+            lines.append({
+                "text": "".join(span["text"] for span in line["spans"]).strip(),
+                "size": max(span["size"] for span in spans),
+                "bold": all(span["flags"] & BOLD_FLAG for span in spans),
+                "chars": sum(len(span["text"]) for span in spans)
+            })
+    return lines
+
+
+def find_sections(doc) -> List[Dict[str, Any]]:
+    """
+    Split a PDF into sections at its headings.
+
+    A heading is a short line that is either set in a larger font than the body
+    text or entirely bold, or an uppercase line matching one of the section
+    keywords. Sub-headings set in a smaller font than the heading that opened a
+    classified section inherit that section's category.
+
+    Args:
+        doc: Open PyMuPDF document
+
+    Returns:
+        List of sections, each a dictionary with "title", "category", "page"
+        (1-based) and "text"
+    """
+    pages = [_iter_lines(page.get_text("dict")) for page in doc]
+
+    # The body font size is the size carrying the most characters
+    size_counts = Counter()
+    for lines in pages:
+        for line in lines:
+            size_counts[round(line["size"], 1)] += line["chars"]
+    if not size_counts:
+        return []
+    body_size = size_counts.most_common(1)[0][0]
+
+    sections = []
+    current = {"title": "", "category": None, "page": 1, "size": float("inf"), "lines": []}
+
+    for page_number, lines in enumerate(pages, 1):
+        for line in lines:
+            text = line["text"]
+            category = None
+            is_heading = False
+
+            if len(text) <= MAX_HEADING_LENGTH and not _TOC_PATTERN.search(text) and re.search(r"[A-Za-zÁÉÍÓÚÑáéíóúñ]", text):
+                category = classify_heading(text)
+                styled = line["size"] >= body_size * HEADING_SIZE_RATIO or line["bold"]
+                is_heading = styled or (category is not None and text.upper() == text)
+
+            if not is_heading:
+                current["lines"].append(text)
+                continue
+
+            # Smaller unclassified headings are sub-headings of the current section
+            if category is None and current["category"] and line["size"] < current["size"]:
+                current["lines"].append(text)
+                continue
+
+            sections.append(current)
+            current = {"title": text, "category": category, "page": page_number, "size": line["size"], "lines": [text]}
+
+    sections.append(current)
+
+    return [
+        {
+            "title": section["title"],
+            "category": section["category"],
+            "page": section["page"],
+            "text": "\n".join(section["lines"])
+        }
+        for section in sections
+        if section["lines"]
+    ]
+
+
+def route_sections(sections: List[Dict[str, Any]], full_text: str) -> Dict[str, str]:
+    """
+    Select the text each extractor should read.
+
+    Args:
+        sections: Section index from find_sections
+        full_text: Full document text, used when no section matches an extractor
+
+    Returns:
+        Dictionary mapping "zonation", "objectives" and "literature" to the text
+        of their sections, or to the full text when none were found
+    """
+    routed = {}
+    for category in SECTION_KEYWORDS:
+        texts = [section["text"] for section in sections if section["category"] == category]
+        routed[category] = "\n\n".join(texts) if texts else full_text
+    return routed
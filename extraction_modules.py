@@ -11,35 +11,42 @@ This is part of Phase 2 (AI Extraction Modules) of the MPAgent project.
 """
 
 import os
-import json
-import openai
-from typing import Dict, List, Any, Optional, Union
-from langchain.chat_models import ChatOpenAI
-from langchain.prompts import PromptTemplate, ChatPromptTemplate
-from langchain.schema.output_parser import StrOutputParser
-from langchain.schema import PromptValue
-from langchain.chains import LLMChain
+from functools import lru_cache, partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Any, Optional, Union, Callable
 from dotenv import load_dotenv
+from llm_client import run_prompt
+from llm_backends import LLMBackend, create_backend
+from llm_scheduler import submit
+from instrumentation import traced, set_attributes
+from output_parsing import parse_json_output, report_truncation, OutputParsingError
+from text_chunking import chunk_text, chunk_token_budget
+from checkpoint_store import get_default_store, chunk_hash
 
-# Load environment variables (OpenAI API key)
+# Load environment variables (API keys, backend and model settings)
 load_dotenv()
 
-# Initialize OpenAI API key
-openai.api_key = os.getenv("OPENAI_API_KEY")
 default_model = os.getenv("DEFAULT_MODEL", "gpt-4")
 
+# Maximum number of LLM requests in flight at once during chunk extraction
+default_max_workers = int(os.getenv("MAX_CONCURRENT_REQUESTS", "4"))
+
 class ZonationExtractor:
     """Extracts zonation details and regulations from MPA management plan text."""
     
-    def __init__(self, model_name: str = None):
+    # Required keys of the JSON answer and the accepted types of their list items
+    output_schema = {"zonas": dict}
+    
+    def __init__(self, model_name: str = None, backend: LLMBackend = None):
         """
         Initialize the zonation extractor.
         
         Args:
-            model_name: OpenAI model name to use (defaults to environment setting or gpt-4)
+            model_name: Model name to use (defaults to environment setting or gpt-4)
+            backend: LLM backend to query (defaults to the LLM_BACKEND environment setting)
         """
         self.model_name = model_name or default_model
-        self.llm = ChatOpenAI(model_name=self.model_name, temperature=0)
+        self.backend = backend or create_backend(self.model_name)
         
         # Define the prompt template for zonation extraction
         self.zonation_template = """
@@ -76,30 +83,28 @@ class ZonationExtractor:
         JSON:
         """
         
-        self.prompt = PromptTemplate(
-            template=self.zonation_template,
-            input_variables=["text"]
-        )
-        self.chain = LLMChain(llm=self.llm, prompt=self.prompt, output_key="json_result")
+        self.template = self.zonation_template
     
-    def extract(self, text: str) -> Dict:
+    @traced("extractor.zonation")
+    def extract(self, text: str, use_cache: bool = True) -> Dict:
         """
         Extract zonation and regulations from text.
         
         Args:
             text: Spanish text from MPA management plan
+            use_cache: Whether to reuse a cached response for identical input
             
         Returns:
             Dictionary containing the extracted zones and regulations
         """
         try:
-            json_str = self.chain.run(text=text)
+            json_str = run_prompt(self.backend, self.template, validate=partial(parse_json_output, schema=self.output_schema), use_cache=use_cache, text=text)
             # Parse JSON and handle potential errors
-            result = json.loads(json_str)
+            result = report_truncation(parse_json_output(json_str, self.output_schema))
             return result
-        except json.JSONDecodeError:
+        except OutputParsingError as e:
             # Handle error if output isn't valid JSON
-            return {"zonas": [], "error": "Error al procesar la respuesta JSON"}
+            return {"zonas": [], "error": f"Error al procesar la respuesta JSON: {str(e)}"}
         except Exception as e:
             return {"zonas": [], "error": f"Error durante la extracción: {str(e)}"}
 
@@ -107,15 +112,19 @@ class ZonationExtractor:
 class ObjectivesExtractor:
     """Extracts conservation objectives from MPA management plan text."""
     
-    def __init__(self, model_name: str = None):
+    # Required keys of the JSON answer and the accepted types of their list items
+    output_schema = {"objetivos_conservacion": str}
+    
+    def __init__(self, model_name: str = None, backend: LLMBackend = None):
         """
         Initialize the objectives extractor.
         
         Args:
-            model_name: OpenAI model name to use (defaults to environment setting or gpt-4)
+            model_name: Model name to use (defaults to environment setting or gpt-4)
+            backend: LLM backend to query (defaults to the LLM_BACKEND environment setting)
         """
         self.model_name = model_name or default_model
-        self.llm = ChatOpenAI(model_name=self.model_name, temperature=0)
+        self.backend = backend or create_backend(self.model_name)
         
         # Define the prompt template for conservation objectives extraction
         self.objectives_template = """
@@ -150,30 +159,28 @@ class ObjectivesExtractor:
         JSON:
         """
         
-        self.prompt = PromptTemplate(
-            template=self.objectives_template,
-            input_variables=["text"]
-        )
-        self.chain = LLMChain(llm=self.llm, prompt=self.prompt, output_key="json_result")
+        self.template = self.objectives_template
     
-    def extract(self, text: str) -> Dict:
+    @traced("extractor.objectives")
+    def extract(self, text: str, use_cache: bool = True) -> Dict:
         """
         Extract conservation objectives from text.
         
         Args:
             text: Spanish text from MPA management plan
+            use_cache: Whether to reuse a cached response for identical input
             
         Returns:
             Dictionary containing the extracted conservation objectives
         """
         try:
-            json_str = self.chain.run(text=text)
+            json_str = run_prompt(self.backend, self.template, validate=partial(parse_json_output, schema=self.output_schema), use_cache=use_cache, text=text)
             # Parse JSON and handle potential errors
-            result = json.loads(json_str)
+            result = report_truncation(parse_json_output(json_str, self.output_schema))
             return result
-        except json.JSONDecodeError:
+        except OutputParsingError as e:
             # Handle error if output isn't valid JSON
-            return {"objetivos_conservacion": [], "error": "Error al procesar la respuesta JSON"}
+            return {"objetivos_conservacion": [], "error": f"Error al procesar la respuesta JSON: {str(e)}"}
         except Exception as e:
             return {"objetivos_conservacion": [], "error": f"Error durante la extracción: {str(e)}"}
 
@@ -181,15 +188,19 @@ class ObjectivesExtractor:
 class LiteratureExtractor:
     """Extracts cited literature from MPA management plan text."""
     
-    def __init__(self, model_name: str = None):
+    # Required keys of the JSON answer and the accepted types of their list items
+    output_schema = {"referencias_bibliograficas": (dict, str)}
+    
+    def __init__(self, model_name: str = None, backend: LLMBackend = None):
         """
         Initialize the literature extractor.
         
         Args:
-            model_name: OpenAI model name to use (defaults to environment setting or gpt-4)
+            model_name: Model name to use (defaults to environment setting or gpt-4)
+            backend: LLM backend to query (defaults to the LLM_BACKEND environment setting)
         """
         self.model_name = model_name or default_model
-        self.llm = ChatOpenAI(model_name=self.model_name, temperature=0)
+        self.backend = backend or create_backend(self.model_name)
         
         # Define the prompt template for literature extraction
         self.literature_template = """
@@ -227,76 +238,227 @@ class LiteratureExtractor:
         JSON:
         """
         
-        self.prompt = PromptTemplate(
-            template=self.literature_template,
-            input_variables=["text"]
-        )
-        self.chain = LLMChain(llm=self.llm, prompt=self.prompt, output_key="json_result")
+        self.template = self.literature_template
     
-    def extract(self, text: str) -> Dict:
+    @traced("extractor.literature")
+    def extract(self, text: str, use_cache: bool = True) -> Dict:
         """
         Extract cited literature from text.
         
         Args:
             text: Spanish text from MPA management plan
+            use_cache: Whether to reuse a cached response for identical input
             
         Returns:
             Dictionary containing the extracted literature references
         """
         try:
-            json_str = self.chain.run(text=text)
+            json_str = run_prompt(self.backend, self.template, validate=partial(parse_json_output, schema=self.output_schema), use_cache=use_cache, text=text)
             # Parse JSON and handle potential errors
-            result = json.loads(json_str)
+            result = report_truncation(parse_json_output(json_str, self.output_schema))
             return result
-        except json.JSONDecodeError:
+        except OutputParsingError as e:
             # Handle error if output isn't valid JSON
-            return {"referencias_bibliograficas": [], "error": "Error al procesar la respuesta JSON"}
+            return {"referencias_bibliograficas": [], "error": f"Error al procesar la respuesta JSON: {str(e)}"}
         except Exception as e:
             return {"referencias_bibliograficas": [], "error": f"Error durante la extracción: {str(e)}"}
 
 
-def process_large_text(text: str, max_chunk_size: int = 8000) -> List[str]:
+def process_large_text(text: str, max_chunk_size: int = None, model_name: str = None, overlap_tokens: int = 0) -> List[str]:
     """
     Split large texts into manageable chunks for API processing.
     
     Args:
         text: Full text to process
-        max_chunk_size: Maximum characters per chunk (default 8000)
+        max_chunk_size: Maximum tokens per chunk (defaults to the model's chunk budget)
+        model_name: Model name used for token counting and the default budget
+        overlap_tokens: Tokens of context repeated between consecutive chunks
+        
+    Returns:
+        List of text chunks split at paragraph and heading boundaries
+    """
+    model_name = model_name or default_model
+    return chunk_text(
+        text,
+        model_name=model_name,
+        max_tokens=max_chunk_size or chunk_budget(model_name),
+        overlap_tokens=overlap_tokens
+    )
+
+
+# Extractor classes keyed by the result section they populate
+EXTRACTORS = {
+    "zonation": ZonationExtractor,
+    "objectives": ObjectivesExtractor,
+    "literature": LiteratureExtractor,
+}
+
+# Result key holding the extracted items for each extractor
+RESULT_KEYS = {
+    "zonation": "zonas",
+    "objectives": "objetivos_conservacion",
+    "literature": "referencias_bibliograficas",
+}
+
+
+@lru_cache(maxsize=None)
+def _build_extractors(model_name: str) -> Dict[str, Any]:
+    """Create one instance of each extractor for the given model."""
+    return {key: extractor_class(model_name) for key, extractor_class in EXTRACTORS.items()}
+
+
+def get_extractors(model_name: str = None) -> Dict[str, Any]:
+    """
+    Get the shared extractor instances for a model.
+    
+    Extractors are created once per model name and reused for every chunk and
+    every call, so their LLM clients and parsed prompt templates are shared.
+    
+    Args:
+        model_name: Model name to use (defaults to environment setting or gpt-4)
+        
+    Returns:
+        Dictionary mapping each extractor key to its extractor instance
+    """
+    return _build_extractors(model_name or default_model)
+
+
+def chunk_budget(model_name: str = None) -> int:
+    """
+    Get the largest chunk, in tokens, that every extractor can accept.
+    
+    Args:
+        model_name: Model name to use (defaults to environment setting or gpt-4)
         
     Returns:
-        List of text chunks
+        Token budget left after the longest extractor prompt and the reserved output
     """
-    # Simple chunking by character count
-    chunks = []
-    for i in range(0, len(text), max_chunk_size):
-        chunks.append(text[i:i + max_chunk_size])
-    return chunks
+    model_name = model_name or default_model
+    return min(
+        chunk_token_budget(model_name, extractor.template)
+        for extractor in get_extractors(model_name).values()
+    )
 
 
-def extract_all(text: str, model_name: str = None) -> Dict:
+@traced("extract_chunks")
+def extract_chunks(
+    chunks: Union[List[str], Dict[str, List[str]]],
+    model_name: str = None,
+    max_workers: int = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    use_cache: bool = True,
+    extractors: Optional[Dict[str, Any]] = None,
+    document_id: str = None
+) -> Dict[str, List[Dict]]:
+    """
+    Run the extractors over many text chunks concurrently.
+    
+    Every (chunk, extractor) pair is submitted to a bounded thread pool, so at
+    most ``max_workers`` LLM requests are in flight at any time.
+    
+    When a ``document_id`` is given, each successful chunk result is
+    checkpointed as soon as it arrives, and chunks already checkpointed for the
+    same document, backend, model and chunk text are restored instead of being
+    sent again (unless ``use_cache`` is False). Failed chunks are never
+    checkpointed, so a re-run retries only them.
+    
+    Args:
+        chunks: List of text chunks sent to every extractor, or a dictionary
+            mapping an extractor key ("zonation", "objectives", "literature")
+            to the chunks that extractor should read
+        model_name: Model name to use
+        max_workers: Maximum number of concurrent requests (defaults to the
+            MAX_CONCURRENT_REQUESTS environment setting or 4)
+        progress_callback: Optional function called as ``callback(done, total)``
+            from the calling thread each time a request finishes
+        use_cache: Whether to reuse cached responses and checkpoints for identical chunks
+        extractors: Extractor instances keyed like EXTRACTORS (defaults to the
+            shared instances from get_extractors)
+        document_id: Content hash of the document, used to checkpoint and
+            resume per-chunk results
+        
+    Returns:
+        Dictionary mapping each extractor key to its per-chunk results, in the
+        same order as the input chunks
+    """
+    if not isinstance(chunks, dict):
+        chunks = {key: chunks for key in EXTRACTORS}
+    
+    model_name = model_name or default_model
+    extractors = extractors or get_extractors(model_name)
+    results = {key: [None] * len(key_chunks) for key, key_chunks in chunks.items()}
+    total = sum(len(key_chunks) for key_chunks in chunks.values())
+    
+    # Checkpoints are kept apart per backend and model, like cached responses
+    namespaces = {key: extractors[key].backend.cache_namespace for key in chunks}
+    
+    # Restore chunks finished by a previous run of the same document
+    store = get_default_store() if document_id else None
+    if store and use_cache:
+        loaded = {namespace: store.load(document_id, namespace) for namespace in set(namespaces.values())}
+        for key, key_chunks in chunks.items():
+            checkpoints = loaded[namespaces[key]]
+            for index, chunk in enumerate(key_chunks):
+                checkpoint = checkpoints.get((key, index))
+                if checkpoint and checkpoint[0] == chunk_hash(chunk):
+                    results[key][index] = checkpoint[1]
+    
+    done = sum(result is not None for key_results in results.values() for result in key_results)
+    set_attributes(chunks=total, restored=done)
+    if done and progress_callback:
+        progress_callback(done, total)
+    
+    with ThreadPoolExecutor(max_workers=max_workers or default_max_workers) as executor:
+        futures = {
+            submit(executor, extractors[key].extract, chunk, use_cache): (key, index)
+            for key, key_chunks in chunks.items()
+            for index, chunk in enumerate(key_chunks)
+            if results[key][index] is None
+        }
+        for future in as_completed(futures):
+            key, index = futures[future]
+            try:
+                results[key][index] = future.result()
+            except Exception as e:
+                results[key][index] = {RESULT_KEYS[key]: [], "error": f"Error durante la extracción: {str(e)}"}
+            
+            if store and "error" not in results[key][index]:
+                store.save(document_id, namespaces[key], key, index, chunks[key][index], results[key][index])
+            
+            done += 1
+            if progress_callback:
+                progress_callback(done, total)
+    
+    return results
+
+
+def extract_all(
+    text: str,
+    model_name: str = None,
+    max_workers: int = None,
+    use_cache: bool = True,
+    extractors: Optional[Dict[str, Any]] = None
+) -> Dict:
     """
     Extract all information types from the text.
     
+    The three extractors run concurrently on the same text.
+    
     Args:
         text: Spanish text from MPA management plan
-        model_name: OpenAI model name to use
+        model_name: Model name to use
+        max_workers: Maximum number of concurrent requests
         
     Returns:
         Dictionary containing all extracted information
     """
-    zonation_extractor = ZonationExtractor(model_name)
-    objectives_extractor = ObjectivesExtractor(model_name)
-    literature_extractor = LiteratureExtractor(model_name)
-    
-    # For large documents, we might need to process different sections
-    # For now, process the whole text for each extractor
-    zonation_result = zonation_extractor.extract(text)
-    objectives_result = objectives_extractor.extract(text)
-    literature_result = literature_extractor.extract(text)
+    results = extract_chunks(
+        [text],
+        model_name=model_name,
+        max_workers=max_workers,
+        use_cache=use_cache,
+        extractors=extractors
+    )
     
     # Combine results
-    return {
-        "zonation": zonation_result,
-        "objectives": objectives_result,
-        "literature": literature_result
-    }
+    return {key: key_results[0] for key, key_results in results.items()}
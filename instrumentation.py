@@ -0,0 +1,195 @@
+"""
+MPAgent Instrumentation
+
+This module records where the time of an analysis goes. Hot paths (PDF reading,
+chunking, every extractor and evaluator call, every LLM request) are wrapped in
+spans that capture their duration and attributes such as prompt and completion
+tokens, cache hits and retries.
+
+Spans follow the OpenTelemetry data model (trace and span ids, parent span,
+start and end times in nanoseconds, attributes, status). They are collected per
+analysis with ``trace()`` and can be summarised per stage, and every finished
+span can also be appended as a JSON line to the file named by TRACE_EXPORT_PATH.
+
+Work submitted to thread pools through ``llm_scheduler.submit`` keeps its parent
+span, since the span context travels with the context variables.
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# JSON-lines file every finished span is appended to (empty disables the export)
+trace_export_path = os.getenv("TRACE_EXPORT_PATH", "")
+
+# Span attributes added up in the per-stage summary
+SUMMED_ATTRIBUTES = ("prompt_tokens", "completion_tokens", "cache_hit", "retries")
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+_current_span = contextvars.ContextVar("span", default=None)
+_export_lock = threading.Lock()
+
+
+class Trace:
+    """Thread-safe collection of the spans recorded during one analysis."""
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Dict[str, Any]) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """
+        Aggregate the spans by name.
+
+        Returns:
+            One row per span name, slowest first, with the call count, total and
+            mean duration in seconds, errors and the summed token, cache-hit and
+            retry attributes
+        """
+        with self._lock:
+            spans = list(self.spans)
+
+        rows = {}
+        for span in spans:
+            row = rows.setdefault(span["name"], {
+                "name": span["name"], "count": 0, "total_seconds": 0.0, "errors": 0,
+                **{attribute: 0 for attribute in SUMMED_ATTRIBUTES}
+            })
+            row["count"] += 1
+            row["total_seconds"] += span["duration_ms"] / 1000
+            row["errors"] += span["status"]["code"] == "ERROR"
+            for attribute in SUMMED_ATTRIBUTES:
+                row[attribute] += int(span["attributes"].get(attribute) or 0)
+
+        for row in rows.values():
+            row["mean_seconds"] = round(row["total_seconds"] / row["count"], 4)
+            row["total_seconds"] = round(row["total_seconds"], 4)
+        return sorted(rows.values(), key=lambda row: row["total_seconds"], reverse=True)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Trace":
+        """Rebuild a trace serialised with ``to_json``, e.g. one recorded in a worker process."""
+        restored = cls()
+        restored.trace_id = data["traceId"]
+        restored.spans = list(data["spans"])
+        return restored
+
+    def to_json(self) -> str:
+        """Serialise the spans as a JSON document in start order."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["startTimeUnixNano"])
+        return json.dumps({"traceId": self.trace_id, "spans": spans}, ensure_ascii=False)
+
+
+@contextmanager
+def trace():
+    """Collect every span recorded in the enclosed block (and the work it submits) into a Trace."""
+    collected = Trace()
+    token = _current_trace.set(collected)
+    try:
+        yield collected
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Record the duration of the enclosed block as a span.
+
+    Args:
+        name: Span name, e.g. "pdf.read" or "llm.call"
+        **attributes: Initial span attributes
+
+    Yields:
+        The span record; attributes can also be added with ``set_attributes``
+    """
+    parent = _current_span.get()
+    collected = _current_trace.get()
+    record = {
+        "name": name,
+        "traceId": collected.trace_id if collected else (parent["traceId"] if parent else uuid.uuid4().hex),
+        "spanId": uuid.uuid4().hex[:16],
+        "parentSpanId": parent["spanId"] if parent else None,
+        "startTimeUnixNano": time.time_ns(),
+        "attributes": dict(attributes),
+        "status": {"code": "OK"},
+    }
+    token = _current_span.set(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record["status"] = {"code": "ERROR", "message": str(e)}
+        raise
+    finally:
+        record["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        record["endTimeUnixNano"] = record["startTimeUnixNano"] + int(record["duration_ms"] * 1e6)
+        _current_span.reset(token)
+        if collected:
+            collected.add(record)
+        if trace_export_path:
+            export_span(record, trace_export_path)
+
+
+def traced(name: str):
+    """
+    Decorate a function so each call is recorded as a span.
+
+    A returned dictionary with an "error" key (the pipeline's way of reporting a
+    handled failure) marks the span as failed.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name) as record:
+                result = function(*args, **kwargs)
+                if isinstance(result, dict) and "error" in result:
+                    record["status"] = {"code": "ERROR", "message": str(result["error"])}
+                return result
+        return wrapper
+    return decorator
+
+
+def set_attributes(**attributes) -> None:
+    """Add attributes to the current span (ignored outside a span)."""
+    record = _current_span.get()
+    if record is not None:
+        record["attributes"].update(attributes)
+
+
+def increment(attribute: str, amount: int = 1) -> None:
+    """Add ``amount`` to a numeric attribute of the current span (ignored outside a span)."""
+    record = _current_span.get()
+    if record is not None:
+        record["attributes"][attribute] = record["attributes"].get(attribute, 0) + amount
+
+
+def export_span(record: Dict[str, Any], path: str) -> None:
+    """Append a finished span as one JSON line to a file."""
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _export_lock:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as handle:
+            handle.write(line + "\n")
+
+
+def current_trace() -> Optional[Trace]:
+    """Return the trace collecting spans in this context, if any."""
+    return _current_trace.get()
@@ -0,0 +1,584 @@
+"""
+MPAgent Job Queue
+
+This module runs analyses in the background so they do not block the Streamlit
+script thread and survive the browser tab being closed. Documents are submitted
+to a queue kept in a local SQLite database, and a pool of worker processes takes
+jobs from it by priority and submission order, runs the pipeline and records
+each job's status, progress and result. The app only submits jobs and polls their status,
+so many sessions can queue plans at the same time and share the workers.
+
+Workers divide the configured API rate limits between them, since each process
+has its own scheduler. The pool is supervised: a worker that dies is replaced
+and its job queued again, resuming from its extraction checkpoints, up to
+MAX_ATTEMPTS times. Jobs left running when the whole pool stopped are queued
+again when a new pool starts.
+
+Each job keeps its own hard link (or copy) of the PDF until it finishes, so the
+upload cleanup cannot remove a file the job still needs. Finished jobs and their
+results are pruned after JOB_RETENTION_DAYS.
+
+The pool is started by the app (JOB_WORKERS processes), or separately with:
+    python job_queue.py --workers 4
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import zlib
+import uuid
+import shutil
+import sqlite3
+import traceback
+import argparse
+import threading
+import multiprocessing
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+from llm_scheduler import PRIORITY_INTERACTIVE
+
+# Load environment variables
+load_dotenv()
+
+# Job queue configuration from environment
+default_queue_path = os.getenv("JOB_QUEUE_PATH", "./.cache/jobs.sqlite3")
+default_job_workers = int(os.getenv("JOB_WORKERS", "2"))
+background_analysis = os.getenv("BACKGROUND_ANALYSIS", "True").lower() in ("1", "true", "yes")
+poll_interval = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "0.5"))
+default_retention_days = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Minimum seconds between progress writes of a job
+PROGRESS_INTERVAL = 0.5
+
+# Times a job is started before a job whose workers keep dying is marked as failed
+MAX_ATTEMPTS = 3
+
+# Seconds between checks of the worker processes, and between prunes of finished jobs
+SUPERVISE_INTERVAL = 5.0
+PRUNE_INTERVAL = 3600.0
+
+_COLUMNS = (
+    "id", "document_hash", "model_name", "source", "pdf_path", "options", "status",
+    "stage", "done", "total", "error", "worker_pid", "created_at", "started_at", "finished_at",
+    "attempts", "priority"
+)
+
+# Columns added after the first release of the queue, with their definitions
+_ADDED_COLUMNS = {
+    "attempts": "INTEGER NOT NULL DEFAULT 0",
+    "priority": f"INTEGER NOT NULL DEFAULT {PRIORITY_INTERACTIVE}",
+}
+
+
+class JobQueue:
+    """
+    SQLite-backed queue of analysis jobs, shared by the app and the worker processes.
+
+    Each process opens its own queue; within a process the queue is safe to share
+    between threads, with all access going through a single connection guarded by
+    a lock.
+    """
+
+    def __init__(self, path: str = None, retention_days: float = None):
+        """
+        Initialize the job queue.
+
+        Args:
+            path: SQLite database file (defaults to JOB_QUEUE_PATH)
+            retention_days: Finished jobs older than this are pruned on start-up
+                (defaults to JOB_RETENTION_DAYS)
+        """
+        self.path = Path(path or default_queue_path)
+        self.retention_days = default_retention_days if retention_days is None else retention_days
+        # PDFs owned by queued and running jobs, next to the database
+        self.files_dir = self.path.parent / f"{self.path.stem}_files"
+
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Several processes write to the queue; wait for their transactions instead of failing
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                document_hash TEXT NOT NULL,
+                model_name TEXT NOT NULL,
+                source TEXT,
+                pdf_path TEXT NOT NULL,
+                options TEXT NOT NULL,
+                status TEXT NOT NULL,
+                stage TEXT,
+                done INTEGER NOT NULL DEFAULT 0,
+                total INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                worker_pid INTEGER,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                result BLOB
+            );
+            CREATE INDEX IF NOT EXISTS jobs_document ON jobs (document_hash, model_name);
+        """)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        for column, definition in _ADDED_COLUMNS.items():
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority, created_at)")
+        self.prune()
+
+    def submit(
+        self,
+        pdf_path: str,
+        document_hash: str,
+        model_name: str,
+        options: Dict[str, Any] = None,
+        source: str = None,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> str:
+        """
+        Queue the analysis of a document.
+
+        A document already queued or running with the same model and options is
+        not queued twice; its existing job is returned instead. A new job links (or copies)
+        the PDF into the queue's files directory, so it stays readable until the
+        job finishes even if the upload is cleaned up.
+
+        Args:
+            pdf_path: Stored PDF file, on the same machine as the workers
+            document_hash: Content hash of the document
+            model_name: Model to analyse it with
+            options: Keyword arguments for pipeline.analyze_document (chunk_size, pdf_workers,
+                route_by_section, max_workers, use_cache)
+            source: Original file name, shown with the job
+            priority: Call priority of the job (llm_scheduler.PRIORITY_INTERACTIVE for uploads
+                from the app, PRIORITY_BATCH for bulk submissions); lower values are claimed first
+
+        Returns:
+            Job id
+        """
+        options = json.dumps(options or {}, sort_keys=True)
+        job_id, row = None, None
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE document_hash = ? AND model_name = ? AND options = ? "
+                    "AND status IN (?, ?)",
+                    (document_hash, model_name, options, QUEUED, RUNNING)
+                ).fetchone()
+                if row:
+                    job_id = row[0]
+                else:
+                    job_id = uuid.uuid4().hex
+                    job_file = self._store_file(job_id, pdf_path)
+                    self._conn.execute(
+                        "INSERT INTO jobs (id, document_hash, model_name, source, pdf_path, options, status, "
+                        "created_at, priority) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (job_id, document_hash, model_name, source, str(job_file),
+                         options, QUEUED, time.time(), priority)
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                if job_id and not row:
+                    self._remove_file(job_id)
+                raise
+        return job_id
+
+    def _job_file(self, job_id: str) -> Path:
+        return self.files_dir / f"{job_id}.pdf"
+
+    def _store_file(self, job_id: str, pdf_path: str) -> Path:
+        """Give a job its own link to the PDF, copying it when a hard link is not possible."""
+        self.files_dir.mkdir(parents=True, exist_ok=True)
+        job_file = self._job_file(job_id)
+        try:
+            os.link(pdf_path, job_file)
+        except OSError:
+            shutil.copyfile(pdf_path, job_file)
+        return job_file
+
+    def _remove_file(self, job_id: str) -> None:
+        try:
+            self._job_file(job_id).unlink()
+        except FileNotFoundError:
+            pass
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Mark the next queued job as running in this process and return it, or None if the queue is empty.
+
+        Jobs are claimed by priority, then in submission order.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE status = ? ORDER BY priority, created_at LIMIT 1",
+                    (QUEUED,)
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, worker_pid = ?, started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                        (RUNNING, os.getpid(), time.time(), row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        if not row:
+            return None
+        job = dict(zip(_COLUMNS, row))
+        job["options"] = json.loads(job["options"])
+        job["attempts"] += 1
+        return job
+
+    def update_progress(self, job_id: str, stage: str, done: int, total: int) -> None:
+        """Record the current stage and progress of a running job."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET stage = ?, done = ?, total = ? WHERE id = ?", (stage, done, total, job_id)
+            )
+
+    def finish(self, job_id: str, result: Dict[str, Any]) -> None:
+        """Store the result of a job, mark it as done and release its PDF."""
+        data = zlib.compress(json.dumps(result, ensure_ascii=False).encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ? WHERE id = ?",
+                (DONE, time.time(), data, job_id)
+            )
+        self._remove_file(job_id)
+
+    def fail(self, job_id: str, error: str) -> None:
+        """Mark an unfinished job as failed with a message meant for the user and release its PDF."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE id = ? AND status IN (?, ?)",
+                (FAILED, time.time(), error, job_id, QUEUED, RUNNING)
+            )
+        self._remove_file(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the status of a job.
+
+        Returns:
+            Job fields (status, stage, done, total, error, timestamps...) plus its
+            position in the queue while queued, or None if the job does not exist
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if not row:
+                return None
+            job = dict(zip(_COLUMNS, row))
+            job["options"] = json.loads(job["options"])
+            if job["status"] == QUEUED:
+                job["position"] = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? "
+                    "AND (priority < ? OR (priority = ? AND created_at <= ?))",
+                    (QUEUED, job["priority"], job["priority"], job["created_at"])
+                ).fetchone()[0]
+        return job
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the result of a finished job, or None if it has none."""
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row or row[0] is None:
+            return None
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def list_jobs(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """List the most recent jobs, newest first, without their results."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(zip(_COLUMNS, row), options=json.loads(row[5])) for row in rows]
+
+    def requeue_orphaned(self) -> int:
+        """
+        Queue again the running jobs whose worker process no longer exists.
+
+        Jobs already started MAX_ATTEMPTS times are marked as failed instead, so
+        a document that crashes its worker is not retried forever.
+
+        Returns:
+            Number of jobs queued again
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, worker_pid, attempts FROM jobs WHERE status = ?", (RUNNING,)
+            ).fetchall()
+            orphaned = [(job_id, attempts) for job_id, pid, attempts in rows if not _process_alive(pid)]
+            exhausted = [job_id for job_id, attempts in orphaned if attempts >= MAX_ATTEMPTS]
+            for job_id, attempts in orphaned:
+                if attempts >= MAX_ATTEMPTS:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE id = ? AND status = ?",
+                        (FAILED, time.time(),
+                         f"El análisis se interrumpió {attempts} veces y no se volverá a intentar.", job_id, RUNNING)
+                    )
+                else:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, worker_pid = NULL, started_at = NULL WHERE id = ? AND status = ?",
+                        (QUEUED, job_id, RUNNING)
+                    )
+        for job_id in exhausted:
+            self._remove_file(job_id)
+        return len(orphaned) - len(exhausted)
+
+    def prune(self) -> int:
+        """
+        Delete finished jobs, with their results, older than the retention period.
+
+        Returns:
+            Number of jobs deleted
+        """
+        cutoff = time.time() - self.retention_days * 86400
+        with self._lock:
+            job_ids = [row[0] for row in self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) AND finished_at < ?", (DONE, FAILED, cutoff)
+            )]
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?", (DONE, FAILED, cutoff)
+            )
+        # Normally released when the job finished; removed here if that was interrupted
+        for job_id in job_ids:
+            self._remove_file(job_id)
+        return len(job_ids)
+
+
+def _process_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def run_job(queue: JobQueue, job: Dict[str, Any]) -> None:
+    """
+    Run the analysis of a claimed job and record its result.
+
+    The report is stored in the queue, together with the job's spans, and
+    error-free analyses are also added to the results store.
+    """
+    # Imported here so the app can submit and poll jobs without loading the pipeline
+    from pipeline import analyze_document, DocumentError
+    from document_cache import get_default_document_cache
+    from results_store import get_default_results_store
+    from instrumentation import trace
+    from llm_scheduler import priority
+
+    last_write = 0.0
+
+    def report_progress(stage: str, done: int, total: int) -> None:
+        nonlocal last_write
+        now = time.monotonic()
+        if done == total or now - last_write >= PROGRESS_INTERVAL:
+            last_write = now
+            queue.update_progress(job["id"], stage, done, total)
+
+    try:
+        with trace() as job_trace, priority(job["priority"]):
+            report = analyze_document(
+                job["pdf_path"],
+                model_name=job["model_name"],
+                document_id=job["document_hash"],
+                progress_callback=report_progress,
+                document_cache=get_default_document_cache(),
+                **job["options"]
+            )
+    except DocumentError as e:
+        queue.fail(job["id"], str(e))
+        return
+    except Exception as e:
+        queue.fail(job["id"], f"Error durante el análisis: {str(e)}")
+        return
+
+    report["trace"] = json.loads(job_trace.to_json())
+    queue.finish(job["id"], report)
+
+    if not report["errors"]:
+        # The job is already done; failing to keep a copy must not turn it into a failure
+        try:
+            get_default_results_store().save(
+                job["document_hash"],
+                job["model_name"],
+                report["extracted_data"],
+                report["analysis_results"],
+                mpa_name=Path(job["source"] or job["pdf_path"]).stem,
+                source=job["source"],
+                pages=report["pages"],
+                text=report["text"]
+            )
+        except Exception:
+            print(f"No se pudo guardar el análisis del trabajo {job['id']} en el almacén de resultados:",
+                  file=sys.stderr)
+            traceback.print_exc()
+
+
+def run_worker(queue_path: str = None, workers: int = 1) -> None:
+    """
+    Take jobs from the queue and run them until the process is stopped.
+
+    Args:
+        queue_path: SQLite database of the queue (defaults to JOB_QUEUE_PATH)
+        workers: Size of the pool this worker belongs to; the API rate limits are divided by it
+    """
+    from llm_scheduler import (
+        LLMScheduler, set_default_scheduler, default_requests_per_minute, default_tokens_per_minute
+    )
+
+    set_default_scheduler(LLMScheduler(
+        requests_per_minute=default_requests_per_minute / workers,
+        tokens_per_minute=default_tokens_per_minute / workers
+    ))
+
+    queue = JobQueue(queue_path)
+    while True:
+        job = None
+        try:
+            job = queue.claim()
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+            run_job(queue, job)
+        except Exception as e:
+            # Errors outside the analysis (e.g. a locked queue database) must not stop the worker
+            print(f"Error en el proceso de análisis {os.getpid()}:", file=sys.stderr)
+            traceback.print_exc()
+            if job is not None:
+                try:
+                    queue.fail(job["id"], f"Error durante el análisis: {str(e)}")
+                except Exception:
+                    traceback.print_exc()
+            time.sleep(poll_interval)
+
+
+# Set when the pools of this process are stopped; the lock keeps supervisors from replacing workers meanwhile
+_stopping = threading.Event()
+_supervisor_lock = threading.Lock()
+
+
+def start_workers(workers: int = None, queue_path: str = None) -> List[multiprocessing.Process]:
+    """
+    Start a supervised pool of worker processes after queueing again any jobs orphaned by an earlier pool.
+
+    A supervisor thread replaces workers that die, queues their jobs again and
+    prunes finished jobs periodically.
+
+    Args:
+        workers: Number of worker processes (defaults to JOB_WORKERS)
+        queue_path: SQLite database of the queue (defaults to JOB_QUEUE_PATH)
+
+    Returns:
+        The worker processes, kept up to date by the supervisor and stopped when
+        the calling process exits
+    """
+    workers = default_job_workers if workers is None else workers
+    queue = JobQueue(queue_path)
+    queue.requeue_orphaned()
+
+    # Spawned workers start clean instead of inheriting the caller's threads and connections.
+    # They are not daemons, since daemons may not start the PDF extraction processes.
+    context = multiprocessing.get_context("spawn")
+
+    def start_process() -> multiprocessing.Process:
+        process = context.Process(target=run_worker, args=(queue_path, workers))
+        process.start()
+        return process
+
+    processes = [start_process() for _ in range(workers)]
+
+    def supervise() -> None:
+        last_prune = time.monotonic()
+        while not _stopping.wait(SUPERVISE_INTERVAL):
+            try:
+                with _supervisor_lock:
+                    if _stopping.is_set():
+                        return
+                    for i, process in enumerate(processes):
+                        if not process.is_alive():
+                            print(f"El proceso de análisis {process.pid} terminó (código {process.exitcode}); "
+                                  f"se inicia otro", file=sys.stderr)
+                            queue.requeue_orphaned()
+                            processes[i] = start_process()
+                if time.monotonic() - last_prune >= PRUNE_INTERVAL:
+                    last_prune = time.monotonic()
+                    queue.prune()
+            except Exception:
+                traceback.print_exc()
+
+    if processes:
+        threading.Thread(target=supervise, name="job-supervisor", daemon=True).start()
+
+    # Runs before multiprocessing's own exit handler, which would wait for the workers forever
+    atexit.register(stop_workers, processes)
+    return processes
+
+
+def stop_workers(processes: List[multiprocessing.Process]) -> None:
+    """Terminate worker processes; their unfinished jobs are queued again by the next pool."""
+    _stopping.set()
+    with _supervisor_lock:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+
+
+_default_queue = None
+_default_queue_lock = threading.Lock()
+
+
+def get_default_job_queue() -> JobQueue:
+    """Return the process-wide job queue, creating it on first use."""
+    global _default_queue
+    with _default_queue_lock:
+        if _default_queue is None:
+            _default_queue = JobQueue()
+        return _default_queue
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run MPAgent analysis workers")
+    parser.add_argument("--workers", type=int, default=default_job_workers, help="Worker processes")
+    parser.add_argument("--queue", help="SQLite database of the queue (defaults to JOB_QUEUE_PATH)")
+    args = parser.parse_args()
+
+    processes = start_workers(args.workers, args.queue)
+    print(f"{len(processes)} procesos de análisis esperando trabajos en {args.queue or default_queue_path}")
+    if not processes:
+        return 0
+    # The supervisor replaces dead workers, so wait for an interruption rather than for the processes
+    try:
+        while True:
+            time.sleep(SUPERVISE_INTERVAL)
+    except KeyboardInterrupt:
+        stop_workers(processes)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+MPAgent Literature Retrieval
+
+This module pre-selects, for each conservation objective, the bibliographic
+references most likely to support it, so the congruence analysis only sends a
+handful of candidates to the language model instead of the whole bibliography.
+
+Objectives and references are embedded locally as TF-IDF vectors (Spanish
+stopwords removed, accents folded) and compared with a NumPy cosine-similarity
+matrix. Matrices are cached by the content of their inputs, so re-analysing the
+same document reuses them.
+"""
+
+import json
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List
+import numpy as np
+
+from result_merging import normalize_text
+
+# Common Spanish words that carry no topic information
+SPANISH_STOPWORDS = frozenset("""
+a al algo algunas algunos ante antes como con contra cual cuando de del desde donde durante e el ella ellas
+ellos en entre era es esa esas ese eso esos esta estas este esto estos fue fueron ha han hasta hay la las le
+les lo los mas me mediante mi muy no nos o otra otras otro otros para pero por que se sea segun ser si sin
+sobre son su sus tambien tanto te tiene tienen todo todos tras un una unas uno unos y ya area areas marina
+marino marinas marinos protegida protegidas objetivo objetivos
+""".split())
+
+# Number of cached similarity matrices kept in memory
+MATRIX_CACHE_SIZE = 32
+
+_matrix_cache = OrderedDict()
+_matrix_cache_lock = threading.Lock()
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase, accent-free content words."""
+    return [
+        token for token in normalize_text(text).split()
+        if len(token) > 2 and token not in SPANISH_STOPWORDS and not token.isdigit()
+    ]
+
+
+def reference_text(reference: Any) -> str:
+    """Flatten a structured or plain reference into searchable text."""
+    if isinstance(reference, dict):
+        return " ".join(str(reference.get(field, "")) for field in ("titulo", "revista_o_fuente", "autores"))
+    return str(reference)
+
+
+def tfidf_matrix(documents: List[List[str]], vocabulary: Dict[str, int], idf: np.ndarray) -> np.ndarray:
+    """
+    Build the L2-normalised TF-IDF matrix of tokenised documents.
+
+    Args:
+        documents: Token lists
+        vocabulary: Mapping from token to column index
+        idf: Inverse document frequency per column
+
+    Returns:
+        Matrix of shape (len(documents), len(vocabulary))
+    """
+    matrix = np.zeros((len(documents), len(vocabulary)), dtype=np.float32)
+    for row, tokens in enumerate(documents):
+        for token, count in Counter(tokens).items():
+            column = vocabulary.get(token)
+            if column is not None:
+                matrix[row, column] = 1 + np.log(count)
+    matrix *= idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def compute_similarity_matrix(objectives: List[str], references: List[Any]) -> np.ndarray:
+    """
+    Compute cosine similarities between objectives and references.
+
+    Inverse document frequencies are fitted on objectives and references
+    together, so terms shared by every reference carry little weight.
+
+    Args:
+        objectives: Objective texts
+        references: Structured or plain references
+
+    Returns:
+        Matrix of shape (len(objectives), len(references))
+    """
+    objective_tokens = [tokenize(objective) for objective in objectives]
+    reference_tokens = [tokenize(reference_text(reference)) for reference in references]
+    corpus = objective_tokens + reference_tokens
+
+    document_frequency = Counter(token for tokens in corpus for token in set(tokens))
+    vocabulary = {token: column for column, token in enumerate(sorted(document_frequency))}
+    if not vocabulary:
+        return np.zeros((len(objectives), len(references)), dtype=np.float32)
+
+    frequencies = np.array([document_frequency[token] for token in sorted(document_frequency)], dtype=np.float32)
+    idf = np.log((1 + len(corpus)) / (1 + frequencies)) + 1
+
+    return tfidf_matrix(objective_tokens, vocabulary, idf) @ tfidf_matrix(reference_tokens, vocabulary, idf).T
+
+
+def similarity_matrix(objectives: List[str], references: List[Any]) -> np.ndarray:
+    """
+    Get the objective-reference similarity matrix, cached by input content.
+
+    Args:
+        objectives: Objective texts
+        references: Structured or plain references
+
+    Returns:
+        Matrix of shape (len(objectives), len(references))
+    """
+    key = hashlib.sha256(
+        json.dumps([objectives, references], ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+    with _matrix_cache_lock:
+        if key in _matrix_cache:
+            _matrix_cache.move_to_end(key)
+            return _matrix_cache[key]
+
+    matrix = compute_similarity_matrix(objectives, references)
+
+    with _matrix_cache_lock:
+        _matrix_cache[key] = matrix
+        while len(_matrix_cache) > MATRIX_CACHE_SIZE:
+            _matrix_cache.popitem(last=False)
+    return matrix
+
+
+def top_k_references(objectives: List[str], references: List[Any], k: int = 5, min_similarity: float = 0.05) -> List[List[int]]:
+    """
+    Select the most similar references for each objective.
+
+    Args:
+        objectives: Objective texts
+        references: Structured or plain references
+        k: Maximum candidates per objective
+        min_similarity: Candidates below this cosine similarity are dropped
+
+    Returns:
+        For each objective, reference indices ordered by decreasing similarity
+    """
+    if not objectives or not references:
+        return [[] for _ in objectives]
+
+    matrix = similarity_matrix(objectives, references)
+    k = min(k, len(references))
+    candidates = []
+    for row in matrix:
+        top = np.argpartition(-row, k - 1)[:k]
+        top = top[np.argsort(-row[top], kind="stable")]
+        candidates.append([int(index) for index in top if row[index] >= min_similarity])
+    return candidates
@@ -0,0 +1,310 @@
+"""
+MPAgent LLM Backends
+
+This module defines the interface the extractors and evaluators use to reach a
+language model, and its implementations:
+
+1. OpenAIBackend - OpenAI chat completions (the default)
+2. OllamaBackend - a local model served by Ollama over HTTP
+3. FakeBackend - an offline stand-in that replays recorded responses (or asks a
+   responder function) after a configurable latency, for tests and benchmarks
+4. RecordingBackend - wraps another backend and records its responses so a
+   FakeBackend can replay them later
+
+The backend is chosen with the LLM_BACKEND environment setting.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Callable, Dict, NamedTuple, Optional
+from dotenv import load_dotenv
+
+from text_chunking import get_token_counter
+
+# Load environment variables
+load_dotenv()
+
+# Backend configuration from environment
+default_backend = os.getenv("LLM_BACKEND", "openai").lower()
+ollama_base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+request_timeout = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "600"))
+record_path = os.getenv("LLM_RECORD_PATH", "")
+fake_recording_path = os.getenv("FAKE_LLM_RECORDING", "")
+fake_latency = float(os.getenv("FAKE_LLM_LATENCY_SECONDS", "0"))
+fake_tokens_per_second = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "0"))
+
+
+class Completion(NamedTuple):
+    """Text of a model answer and the tokens it consumed."""
+    text: str
+    prompt_tokens: int
+    completion_tokens: int
+
+
+class BackendError(RuntimeError):
+    """Raised when a backend request fails; carries the HTTP status code if any."""
+
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def prompt_hash(prompt: str) -> str:
+    """Return the SHA-256 hex digest identifying a prompt in recordings."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class LLMBackend:
+    """
+    Interface of a language model backend.
+
+    Implementations must be safe to call from several threads at once.
+    """
+
+    name = "base"
+
+    def __init__(self, model_name: str, temperature: float = 0, max_tokens: int = None):
+        """
+        Initialize the backend.
+
+        Args:
+            model_name: Model to query
+            temperature: Sampling temperature
+            max_tokens: Maximum completion tokens (None lets the model decide)
+        """
+        self.model_name = model_name
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+
+    @property
+    def cache_namespace(self) -> str:
+        """Identifier separating this backend's cached responses from other backends'."""
+        return f"{self.name}:{self.model_name}"
+
+    def complete(self, prompt: str) -> Completion:
+        """
+        Send a prompt to the model.
+
+        Args:
+            prompt: Fully formatted prompt
+
+        Returns:
+            The model's answer
+        """
+        raise NotImplementedError
+
+
+class OpenAIBackend(LLMBackend):
+    """OpenAI chat completions backend."""
+
+    name = "openai"
+
+    def __init__(self, model_name: str, temperature: float = 0, max_tokens: int = None):
+        super().__init__(model_name, temperature, max_tokens)
+        import openai
+        self._openai = openai
+        self._openai.api_key = self._openai.api_key or os.getenv("OPENAI_API_KEY")
+
+    @property
+    def cache_namespace(self) -> str:
+        # Plain model name, so responses cached before backends existed stay valid
+        return self.model_name
+
+    def complete(self, prompt: str) -> Completion:
+        options = {"max_tokens": self.max_tokens} if self.max_tokens else {}
+        response = self._openai.ChatCompletion.create(
+            model=self.model_name,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=self.temperature,
+            request_timeout=request_timeout,
+            **options
+        )
+        usage = response.get("usage") or {}
+        return Completion(
+            response["choices"][0]["message"]["content"],
+            usage.get("prompt_tokens", 0),
+            usage.get("completion_tokens", 0)
+        )
+
+
+class OllamaBackend(LLMBackend):
+    """Local model served by Ollama, called through its HTTP generate endpoint."""
+
+    name = "ollama"
+
+    def __init__(self, model_name: str, temperature: float = 0, max_tokens: int = None, base_url: str = None):
+        """
+        Initialize the Ollama backend.
+
+        Args:
+            model_name: Ollama model tag (e.g. "llama3")
+            temperature: Sampling temperature
+            max_tokens: Maximum completion tokens (None lets the model decide)
+            base_url: Ollama server URL (defaults to OLLAMA_BASE_URL)
+        """
+        super().__init__(model_name, temperature, max_tokens)
+        self.base_url = (base_url or ollama_base_url).rstrip("/")
+
+    def complete(self, prompt: str) -> Completion:
+        options = {"temperature": self.temperature}
+        if self.max_tokens:
+            options["num_predict"] = self.max_tokens
+        payload = json.dumps({
+            "model": self.model_name,
+            "prompt": prompt,
+            "stream": False,
+            "format": "json",
+            "options": options
+        }).encode("utf-8")
+        request = urllib.request.Request(
+            f"{self.base_url}/api/generate",
+            data=payload,
+            headers={"Content-Type": "application/json"}
+        )
+
+        try:
+            with urllib.request.urlopen(request, timeout=request_timeout) as response:
+                body = json.loads(response.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            raise BackendError(f"Ollama respondió con el estado {e.code}: {e.reason}", status_code=e.code) from e
+        except urllib.error.URLError as e:
+            raise ConnectionError(f"No se pudo conectar con Ollama en {self.base_url}: {e.reason}") from e
+
+        return Completion(body.get("response", ""), body.get("prompt_eval_count", 0), body.get("eval_count", 0))
+
+
+class FakeBackend(LLMBackend):
+    """
+    Offline backend returning recorded or generated responses.
+
+    Responses are looked up by prompt in a recording made with RecordingBackend;
+    prompts missing from it are passed to ``responder``. Each call sleeps for
+    ``latency`` seconds plus the time needed to "generate" the answer at
+    ``tokens_per_second``, so throughput can be measured without an API.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        model_name: str = "fake",
+        latency: float = None,
+        tokens_per_second: float = None,
+        recording_path: str = None,
+        responder: Callable[[str], str] = None
+    ):
+        """
+        Initialize the fake backend.
+
+        Args:
+            model_name: Model name reported to callers (selects the token counter)
+            latency: Fixed seconds per call (defaults to FAKE_LLM_LATENCY_SECONDS)
+            tokens_per_second: Simulated generation speed; 0 adds no generation
+                time (defaults to FAKE_LLM_TOKENS_PER_SECOND)
+            recording_path: JSONL recording to replay (defaults to FAKE_LLM_RECORDING)
+            responder: Function producing the answer to prompts missing from the recording
+        """
+        super().__init__(model_name)
+        self.latency = fake_latency if latency is None else latency
+        self.tokens_per_second = fake_tokens_per_second if tokens_per_second is None else tokens_per_second
+        self.responder = responder
+        self.responses = load_recording(recording_path or fake_recording_path)
+        self._count_tokens = get_token_counter(model_name)
+
+    def complete(self, prompt: str) -> Completion:
+        text = self.responses.get(prompt_hash(prompt))
+        if text is None:
+            if self.responder is None:
+                raise LookupError("No hay una respuesta grabada para esta solicitud")
+            text = self.responder(prompt)
+
+        completion_tokens = self._count_tokens(text)
+        delay = self.latency
+        if self.tokens_per_second:
+            delay += completion_tokens / self.tokens_per_second
+        if delay:
+            time.sleep(delay)
+
+        return Completion(text, self._count_tokens(prompt), completion_tokens)
+
+
+class RecordingBackend(LLMBackend):
+    """Backend wrapper that appends every answer of another backend to a JSONL recording."""
+
+    def __init__(self, backend: LLMBackend, path: str):
+        """
+        Initialize the recording wrapper.
+
+        Args:
+            backend: Backend answering the prompts
+            path: JSONL file the responses are appended to
+        """
+        super().__init__(backend.model_name, backend.temperature, backend.max_tokens)
+        self.backend = backend
+        self.name = backend.name
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    @property
+    def cache_namespace(self) -> str:
+        return self.backend.cache_namespace
+
+    def complete(self, prompt: str) -> Completion:
+        completion = self.backend.complete(prompt)
+        line = json.dumps({"prompt": prompt_hash(prompt), "response": completion.text}, ensure_ascii=False)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as handle:
+                handle.write(line + "\n")
+        return completion
+
+
+def load_recording(path: str) -> Dict[str, str]:
+    """
+    Load a JSONL recording made with RecordingBackend.
+
+    Args:
+        path: Recording file; an empty path or missing file gives no responses
+
+    Returns:
+        Dictionary mapping prompt hashes to responses (the latest one wins)
+    """
+    if not path or not Path(path).exists():
+        return {}
+    with open(path, encoding="utf-8") as handle:
+        entries = (json.loads(line) for line in handle if line.strip())
+        return {entry["prompt"]: entry["response"] for entry in entries}
+
+
+BACKENDS = {
+    "openai": OpenAIBackend,
+    "ollama": OllamaBackend,
+    "fake": FakeBackend,
+}
+
+
+def create_backend(model_name: str, backend: str = None) -> LLMBackend:
+    """
+    Create the configured backend for a model.
+
+    Args:
+        model_name: Model to query
+        backend: Backend key from BACKENDS (defaults to LLM_BACKEND)
+
+    Returns:
+        Backend instance, wrapped in a RecordingBackend when LLM_RECORD_PATH is set
+    """
+    backend = (backend or default_backend).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de LLM desconocido: '{backend}' (opciones: {', '.join(BACKENDS)})")
+
+    instance = BACKENDS[backend](model_name)
+    if record_path and backend != "fake":
+        instance = RecordingBackend(instance, record_path)
+    return instance
@@ -0,0 +1,219 @@
+"""
+MPAgent LLM Response Cache
+
+This module provides a persistent, content-addressed cache for LLM responses.
+Responses are stored in a local SQLite database keyed by a hash of the model name,
+the prompt template and the prompt inputs, so re-analysing a document that was
+already processed does not call the API again.
+
+Eviction is both time-based (entries older than the TTL are discarded) and
+size-based (least recently used entries are removed once the cache exceeds its
+maximum size).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Cache configuration from environment
+default_cache_path = os.getenv("LLM_CACHE_PATH", "./.cache/llm_cache.sqlite3")
+default_ttl = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+default_max_size_mb = float(os.getenv("LLM_CACHE_MAX_SIZE_MB", "256"))
+cache_enabled = os.getenv("LLM_CACHE_ENABLED", "True").lower() in ("1", "true", "yes")
+
+
+def make_cache_key(model_name: str, template: str, inputs: Dict[str, Any]) -> str:
+    """
+    Build the content-addressed key for an LLM call.
+
+    Args:
+        model_name: Name of the model answering the prompt
+        template: Prompt template text
+        inputs: Values substituted into the template
+
+    Returns:
+        Hex SHA-256 digest identifying the call
+    """
+    payload = json.dumps(
+        {"model": model_name, "template": template, "inputs": inputs},
+        ensure_ascii=False,
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    SQLite-backed cache of raw LLM responses with TTL and size-based eviction.
+
+    The cache is safe to share between threads; all access goes through a single
+    connection guarded by a lock.
+    """
+
+    def __init__(self, path: str = None, ttl_seconds: float = None, max_size_mb: float = None, enabled: bool = None):
+        """
+        Initialize the response cache.
+
+        Args:
+            path: SQLite database file (defaults to LLM_CACHE_PATH)
+            ttl_seconds: Maximum age of an entry in seconds (defaults to LLM_CACHE_TTL_SECONDS)
+            max_size_mb: Maximum total size of cached responses in MB (defaults to LLM_CACHE_MAX_SIZE_MB)
+            enabled: Whether lookups and writes are performed (defaults to LLM_CACHE_ENABLED)
+        """
+        self.path = Path(path or default_cache_path)
+        self.ttl_seconds = default_ttl if ttl_seconds is None else ttl_seconds
+        self.max_size_bytes = int((default_max_size_mb if max_size_mb is None else max_size_mb) * 1024 * 1024)
+        self.enabled = cache_enabled if enabled is None else enabled
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model_name TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Cache key from make_cache_key
+
+        Returns:
+            The cached response, or None on a miss or when the cache is disabled
+        """
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            response, created_at = row
+            if now - created_at > self.ttl_seconds:
+                # Expired entries count as misses and are dropped immediately
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return response
+
+    def set(self, key: str, model_name: str, response: str) -> None:
+        """
+        Store a response and evict old entries if the cache is over its limits.
+
+        Args:
+            key: Cache key from make_cache_key
+            model_name: Name of the model that produced the response
+            response: Raw response text
+        """
+        if not self.enabled:
+            return
+
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model_name, response, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_name, response, size, now, now)
+            )
+            self.writes += 1
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Remove expired entries, then least recently used ones until under the size limit."""
+        cursor = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        self.evictions += cursor.rowcount
+
+        total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total_size <= self.max_size_bytes:
+            return
+
+        excess = total_size - self.max_size_bytes
+        removed = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC"):
+            if excess <= 0:
+                break
+            removed.append((key,))
+            excess -= size
+
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", removed)
+        self.evictions += len(removed)
+
+    def clear(self) -> None:
+        """Remove every cached response."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report cache counters and current size.
+
+        Returns:
+            Dictionary with hits, misses, writes, evictions, entries and size in bytes
+        """
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_bytes": size
+        }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> LLMResponseCache:
+    """Return the process-wide response cache, creating it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMResponseCache()
+        return _default_cache
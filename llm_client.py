@@ -0,0 +1,70 @@
+"""
+MPAgent LLM Client
+
+This module is the single path through which extractors and evaluators call the
+language model. It consults the persistent response cache before sending a
+request, sends it through the rate-limiting scheduler to the configured
+backend, and stores successful responses afterwards.
+"""
+
+from typing import Any, Callable, Optional
+from llm_backends import LLMBackend
+from llm_cache import get_default_cache, make_cache_key
+from llm_scheduler import get_default_scheduler
+from output_parsing import is_truncated
+from instrumentation import span, set_attributes
+from text_chunking import get_token_counter
+
+
+def run_prompt(
+    backend: LLMBackend,
+    template: str,
+    validate: Optional[Callable[[str], Any]] = None,
+    use_cache: bool = True,
+    **inputs
+) -> str:
+    """
+    Format a prompt template and send it to a backend, serving the response from the cache when possible.
+
+    Uncached calls are rate-limited and retried by the default scheduler at the
+    priority set with ``llm_scheduler.priority``.
+
+    Args:
+        backend: Backend answering the prompt
+        template: Prompt template in ``str.format`` syntax
+        validate: Optional function applied to a fresh response; if it raises
+            or returns a result repaired from a truncated answer, the response
+            is returned but not cached
+        use_cache: Set to False to bypass the cache for this call
+        **inputs: Values for the template's variables
+
+    Returns:
+        Raw response text from the model or the cache
+    """
+    cache = get_default_cache()
+    key = make_cache_key(backend.cache_namespace, template, inputs)
+
+    with span("llm.call", backend=backend.name, model=backend.model_name):
+        if use_cache:
+            cached = cache.get(key)
+            if cached is not None:
+                set_attributes(cache_hit=1)
+                return cached
+
+        prompt = template.format(**inputs)
+
+        # Rate limits count the prompt plus the completion the model may produce
+        tokens = get_token_counter(backend.model_name)(prompt) + (backend.max_tokens or 0)
+        completion = get_default_scheduler().call(lambda: backend.complete(prompt), tokens=tokens)
+        set_attributes(cache_hit=0, prompt_tokens=completion.prompt_tokens, completion_tokens=completion.completion_tokens)
+        response = completion.text
+
+    if use_cache:
+        try:
+            if validate and is_truncated(validate(response)):
+                return response
+        except Exception:
+            return response
+        cache.set(key, backend.cache_namespace, response)
+
+    return response
@@ -0,0 +1,342 @@
+"""
+MPAgent LLM Call Scheduler
+
+This module paces every call to the language model. Calls wait in a priority
+queue until both token buckets (requests per minute and tokens per minute) can
+pay for them, so interactive analyses are served ahead of batch jobs and the API
+limits are respected before the provider has to reject anything.
+
+An optional cap on requests in flight is shared by every caller in the
+process, e.g. all documents of a batch run. Rate-limit (429) and transient
+errors are retried with jittered exponential backoff. A rate-limit response
+also pauses the whole scheduler for the backoff delay, so concurrent workers
+slow down together instead of hammering the API.
+Counters for throttling and retries are exposed through ``stats()``.
+"""
+
+import os
+import time
+import heapq
+import random
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+from dotenv import load_dotenv
+
+from instrumentation import increment
+
+# Load environment variables
+load_dotenv()
+
+# Scheduler configuration from environment (0 disables a limit)
+default_requests_per_minute = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+default_tokens_per_minute = float(os.getenv("LLM_TOKENS_PER_MINUTE", "150000"))
+default_max_retries = int(os.getenv("LLM_MAX_RETRIES", "5"))
+default_backoff_base = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1"))
+default_backoff_max = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "60"))
+default_max_concurrent = int(os.getenv("LLM_MAX_CONCURRENT", "0"))
+
+# Call priorities; lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+# HTTP status codes worth retrying
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# Provider exception names worth retrying, matched by name so no SDK import is needed
+RETRYABLE_ERROR_NAMES = {
+    "RateLimitError", "APIError", "APIConnectionError", "APITimeoutError",
+    "ServiceUnavailableError", "InternalServerError", "Timeout"
+}
+
+_current_priority = contextvars.ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def priority(level: int):
+    """
+    Run the enclosed LLM calls at the given priority.
+
+    Work submitted to thread pools keeps the priority only when submitted
+    through ``submit``.
+    """
+    token = _current_priority.set(level)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def submit(executor, function: Callable, *args, **kwargs):
+    """Submit work to an executor, carrying over the caller's call priority and instrumentation span."""
+    return executor.submit(contextvars.copy_context().run, function, *args, **kwargs)
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    """Return the HTTP status code attached to a provider error, if any."""
+    for attribute in ("http_status", "status_code"):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Check whether an error is a rate-limit (429) rejection."""
+    return _status_code(error) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Check whether an error is a rate limit or a transient failure."""
+    return (
+        is_rate_limit_error(error)
+        or _status_code(error) in RETRYABLE_STATUS_CODES
+        or type(error).__name__ in RETRYABLE_ERROR_NAMES
+        or isinstance(error, (TimeoutError, ConnectionError))
+    )
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Return the delay requested by a Retry-After header, if any."""
+    headers = getattr(error, "headers", None) or getattr(getattr(error, "response", None), "headers", None)
+    try:
+        return float(headers.get("retry-after")) if headers else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at a per-minute rate.
+
+    A rate of 0 disables the bucket. The bucket is not thread-safe on its own;
+    the scheduler guards it with its lock.
+    """
+
+    def __init__(self, per_minute: float):
+        """
+        Initialize the bucket full.
+
+        Args:
+            per_minute: Refill rate, which is also the capacity
+        """
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Return the seconds until ``amount`` can be consumed (0 if it can now)."""
+        if not self.capacity:
+            return 0.0
+        self._refill()
+        # A request larger than the capacity waits for a full bucket
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def consume(self, amount: float) -> None:
+        """Consume ``amount``; the level may go negative for oversized requests."""
+        if self.capacity:
+            self._refill()
+            self.level -= amount
+
+
+class LLMScheduler:
+    """
+    Priority scheduler that rate-limits and retries LLM calls.
+
+    The scheduler is safe to share between threads. Only the highest-priority
+    waiting call may consume from the buckets, so a stream of batch calls
+    cannot starve an interactive one.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = None,
+        tokens_per_minute: float = None,
+        max_retries: int = None,
+        backoff_base: float = None,
+        backoff_max: float = None,
+        max_concurrent: int = None
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            requests_per_minute: Request limit (defaults to LLM_REQUESTS_PER_MINUTE; 0 disables it)
+            tokens_per_minute: Token limit (defaults to LLM_TOKENS_PER_MINUTE; 0 disables it)
+            max_retries: Retries of a failed call (defaults to LLM_MAX_RETRIES)
+            backoff_base: First backoff delay in seconds (defaults to LLM_BACKOFF_BASE_SECONDS)
+            backoff_max: Maximum backoff delay in seconds (defaults to LLM_BACKOFF_MAX_SECONDS)
+            max_concurrent: Maximum requests in flight (defaults to LLM_MAX_CONCURRENT; 0 disables it)
+        """
+        self.requests = TokenBucket(default_requests_per_minute if requests_per_minute is None else requests_per_minute)
+        self.tokens = TokenBucket(default_tokens_per_minute if tokens_per_minute is None else tokens_per_minute)
+        self.max_retries = default_max_retries if max_retries is None else max_retries
+        self.backoff_base = default_backoff_base if backoff_base is None else backoff_base
+        self.backoff_max = default_backoff_max if backoff_max is None else backoff_max
+        self.max_concurrent = default_max_concurrent if max_concurrent is None else max_concurrent
+
+        self._condition = threading.Condition()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self._in_flight = 0
+
+        self.calls = 0
+        self.throttled = 0
+        self.throttle_seconds = 0.0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+
+    def _acquire(self, tokens: float, level: int) -> None:
+        """Block until the call is first in line, a request slot is free and both buckets can pay for it."""
+        ticket = (level, next(self._sequence))
+        started = time.monotonic()
+        waited = False
+
+        with self._condition:
+            heapq.heappush(self._queue, ticket)
+            while True:
+                if self.max_concurrent and self._in_flight >= self.max_concurrent:
+                    # Woken by _release when a request finishes
+                    delay = None
+                elif self._queue[0] == ticket:
+                    delay = max(
+                        self._paused_until - time.monotonic(),
+                        self.requests.wait_time(1),
+                        self.tokens.wait_time(tokens)
+                    )
+                    if delay <= 0:
+                        break
+                else:
+                    delay = None
+                waited = True
+                self._condition.wait(delay)
+
+            heapq.heappop(self._queue)
+            self.requests.consume(1)
+            self.tokens.consume(tokens)
+            self.calls += 1
+            self._in_flight += 1
+            if waited:
+                self.throttled += 1
+                self.throttle_seconds += time.monotonic() - started
+                increment("throttled")
+            self._condition.notify_all()
+
+    def _release(self) -> None:
+        """Free the request slot of a finished call."""
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def backoff_delay(self, attempt: int, error: Exception = None) -> float:
+        """
+        Compute the jittered exponential delay before a retry.
+
+        Args:
+            attempt: Zero-based number of the failed attempt
+            error: The error being retried; a Retry-After header is honoured
+
+        Returns:
+            Delay in seconds
+        """
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        delay = random.uniform(delay / 2, delay)
+        retry_after = _retry_after(error) if error is not None else None
+        return max(delay, retry_after or 0.0)
+
+    def call(self, function: Callable[[], Any], tokens: float = 0, level: int = None) -> Any:
+        """
+        Run an LLM call once the rate limits allow it, retrying transient failures.
+
+        Args:
+            function: Zero-argument function performing the call
+            tokens: Estimated tokens the call consumes
+            level: Call priority (defaults to the priority set with ``priority``)
+
+        Returns:
+            The function's return value
+
+        Raises:
+            Exception: The last error once retries are exhausted, or any
+                non-retryable error immediately
+        """
+        level = _current_priority.get() if level is None else level
+
+        for attempt in range(self.max_retries + 1):
+            self._acquire(tokens, level)
+            try:
+                return function()
+            except Exception as e:
+                error = e
+            finally:
+                # The slot is freed before any backoff sleep
+                self._release()
+
+            if not is_retryable_error(error) or attempt >= self.max_retries:
+                with self._condition:
+                    self.failures += 1
+                raise error
+
+            delay = self.backoff_delay(attempt, error)
+            increment("retries")
+            with self._condition:
+                self.retries += 1
+                if is_rate_limit_error(error):
+                    # Pause every caller, not just this one
+                    self.rate_limited += 1
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                    self._condition.notify_all()
+            time.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return scheduler statistics.
+
+        Returns:
+            Dictionary with calls, throttled calls and seconds spent throttled,
+            retries, rate-limit rejections, failed calls, and queued and in-flight calls
+        """
+        with self._condition:
+            return {
+                "calls": self.calls,
+                "throttled": self.throttled,
+                "throttle_seconds": round(self.throttle_seconds, 3),
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "failures": self.failures,
+                "queued": len(self._queue),
+                "in_flight": self._in_flight
+            }
+
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+def set_default_scheduler(scheduler: LLMScheduler) -> None:
+    """Replace the process-wide scheduler, e.g. to apply limits chosen on the command line."""
+    global _default_scheduler
+    with _default_scheduler_lock:
+        _default_scheduler = scheduler
+
+
+def get_default_scheduler() -> LLMScheduler:
+    """Return the process-wide scheduler, creating it on first use."""
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = LLMScheduler()
+        return _default_scheduler
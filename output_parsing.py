@@ -0,0 +1,222 @@
+"""
+MPAgent Output Parsing
+
+This module turns raw model completions into the JSON results the extractors and
+evaluators return. It tolerates the usual ways a completion deviates from pure
+JSON, so a usable answer is not thrown away and paid for again:
+
+1. Markdown code fences (```json ... ```) are stripped
+2. Prose before or after the answer is ignored by locating the outermost object
+3. Truncated answers are repaired by cutting back to the last complete element
+   and closing the open arrays and objects
+4. The result is validated against a small per-extractor schema
+
+Repaired answers are flagged as truncated: they are not cached, and callers
+report them as errors so the missing elements are requested again.
+"""
+
+import re
+import json
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+# Schema: required top-level key -> accepted item type(s) of its list
+Schema = Dict[str, Union[type, Tuple[type, ...]]]
+
+_FENCE_PATTERN = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.DOTALL)
+
+# Maximum cut points tried, newest first, when repairing a truncated answer
+MAX_REPAIR_ATTEMPTS = 50
+
+# Truncated answers are only cut inside the root object or its lists (depth 2),
+# so every list element kept is complete
+REPAIR_DEPTH = 2
+
+# Key set on results repaired from a truncated answer
+TRUNCATED_KEY = "truncated"
+
+TRUNCATION_ERROR = "La respuesta del modelo se cortó antes de terminar; solo se conservaron los elementos completos"
+
+
+class OutputParsingError(ValueError):
+    """Raised when a completion cannot be turned into a valid result."""
+
+
+def strip_code_fences(text: str) -> str:
+    """Return the contents of the first Markdown code fence, or the text unchanged."""
+    match = _FENCE_PATTERN.search(text)
+    return match.group(1) if match else text
+
+
+def _scan(text: str) -> Tuple[Optional[int], List[Tuple[int, str]]]:
+    """
+    Scan a JSON fragment starting at an opening brace.
+
+    Returns:
+        Tuple of (end index of the outermost object, or None if it never
+        closes; cut points as (index, closing brackets needed) after each
+        complete element of the root object or its lists)
+    """
+    stack = []
+    cut_points = []
+    in_string = False
+    escaped = False
+
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+            if len(stack) <= REPAIR_DEPTH:
+                cut_points.append((index + 1, "".join(reversed(stack))))
+        elif char in "}]":
+            if not stack:
+                return index, cut_points
+            stack.pop()
+            if not stack:
+                return index, cut_points
+            if len(stack) <= REPAIR_DEPTH:
+                cut_points.append((index + 1, "".join(reversed(stack))))
+        elif char == "," and len(stack) <= REPAIR_DEPTH:
+            cut_points.append((index, "".join(reversed(stack))))
+
+    return None, cut_points
+
+
+def repair_truncated_json(fragment: str) -> Any:
+    """
+    Parse a truncated JSON object, keeping only its complete elements.
+
+    Args:
+        fragment: JSON text starting at the opening brace and cut off early
+
+    Returns:
+        The parsed object, flagged with TRUNCATED_KEY
+
+    Raises:
+        OutputParsingError: If no prefix of the fragment can be repaired
+    """
+    _, cut_points = _scan(fragment)
+    for index, closers in reversed(cut_points[-MAX_REPAIR_ATTEMPTS:]):
+        candidate = fragment[:index].rstrip().rstrip(",")
+        try:
+            result = json.loads(candidate + closers)
+        except json.JSONDecodeError:
+            # A dangling key ("key": or "key") cannot be closed; try an earlier cut
+            continue
+        if isinstance(result, dict):
+            result[TRUNCATED_KEY] = True
+        return result
+    raise OutputParsingError("La respuesta JSON está incompleta y no se pudo reparar")
+
+
+def extract_json(text: str) -> Any:
+    """
+    Extract the outermost JSON object from a completion.
+
+    Args:
+        text: Raw completion text
+
+    Returns:
+        The parsed object
+
+    Raises:
+        OutputParsingError: If the completion contains no usable JSON object
+    """
+    text = strip_code_fences(text).strip()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    start = text.find("{")
+    if start < 0:
+        raise OutputParsingError("La respuesta no contiene un objeto JSON")
+
+    fragment = text[start:]
+    end, _ = _scan(fragment)
+    if end is not None:
+        try:
+            return json.loads(fragment[:end + 1])
+        except json.JSONDecodeError as e:
+            raise OutputParsingError(f"La respuesta JSON no es válida: {e}") from e
+
+    return repair_truncated_json(fragment)
+
+
+def validate(result: Any, schema: Optional[Schema]) -> Dict:
+    """
+    Check a parsed result against a schema.
+
+    Every schema key must be present and hold a list. List items of the wrong
+    type are dropped rather than failing the whole result.
+
+    Args:
+        result: Parsed JSON value
+        schema: Required keys and the accepted types of their items
+
+    Returns:
+        The validated result
+
+    Raises:
+        OutputParsingError: If the result is not an object or a required key is missing
+    """
+    if not isinstance(result, dict):
+        raise OutputParsingError("La respuesta JSON no es un objeto")
+
+    for key, item_type in (schema or {}).items():
+        if key not in result:
+            raise OutputParsingError(f"La respuesta JSON no contiene la clave '{key}'")
+        if not isinstance(result[key], list):
+            raise OutputParsingError(f"La clave '{key}' de la respuesta JSON no es una lista")
+        result[key] = [item for item in result[key] if isinstance(item, item_type)]
+
+    return result
+
+
+def parse_json_output(text: str, schema: Optional[Schema] = None) -> Dict:
+    """
+    Parse and validate a model completion.
+
+    Args:
+        text: Raw completion text
+        schema: Required keys and the accepted types of their list items
+
+    Returns:
+        The parsed result
+
+    Raises:
+        OutputParsingError: If the completion cannot be parsed or fails validation
+    """
+    return validate(extract_json(text), schema)
+
+
+def is_truncated(result: Any) -> bool:
+    """Check whether a parsed result was repaired from a truncated answer."""
+    return isinstance(result, dict) and bool(result.get(TRUNCATED_KEY))
+
+
+def report_truncation(result: Dict) -> Dict:
+    """
+    Turn the truncation flag of a parsed result into an "error" entry.
+
+    The complete elements are kept, and the error keeps the result out of the
+    extraction checkpoints so the chunk is requested again on the next run.
+
+    Args:
+        result: Parsed result
+
+    Returns:
+        The result without the flag, with an "error" if it was truncated
+    """
+    if result.pop(TRUNCATED_KEY, False):
+        result.setdefault("error", TRUNCATION_ERROR)
+    return result
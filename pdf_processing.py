@@ -0,0 +1,171 @@
+"""
+MPAgent PDF Processing
+
+This module extracts text from MPA management plan PDFs with PyMuPDF. Pages are
+produced by a generator and the full document text is joined once at the end
+instead of being grown page by page. Progress callbacks are throttled so that UI updates do not dominate the
+extraction time of very long documents.
+
+This is part of Phase 1 (Document Processing) of the MPAgent project.
+"""
+
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple, Union
+import fitz  # PyMuPDF
+
+# Minimum seconds between two progress updates
+PROGRESS_INTERVAL = 0.25
+
+# Number of processes used for page extraction (1 keeps extraction in-process)
+default_pdf_workers = int(os.getenv("PDF_WORKERS", "1"))
+
+# Documents with fewer pages per worker than this are extracted serially, since
+# starting the worker processes would cost more than it saves
+MIN_PAGES_PER_WORKER = 20
+
+# Page ranges handed out per worker, for load balancing between dense and sparse pages
+BATCHES_PER_WORKER = 4
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def throttle_progress(callback: Optional[ProgressCallback], min_interval: float = PROGRESS_INTERVAL) -> ProgressCallback:
+    """
+    Wrap a progress callback so it fires at most once per interval.
+
+    The final update (done == total) is always delivered.
+
+    Args:
+        callback: Function called as ``callback(done, total)``, or None
+        min_interval: Minimum seconds between two calls
+
+    Returns:
+        Throttled progress function
+    """
+    last_update = [float("-inf")]
+
+    def update(done: int, total: int) -> None:
+        if callback is None:
+            return
+        now = time.monotonic()
+        if done >= total or now - last_update[0] >= min_interval:
+            last_update[0] = now
+            callback(done, total)
+
+    return update
+
+
+def iter_pdf_pages(doc, progress_callback: Optional[ProgressCallback] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Yield the text of each page of an open PDF.
+
+    Args:
+        doc: Open PyMuPDF document
+        progress_callback: Optional function called as ``callback(done, total)``,
+            throttled to PROGRESS_INTERVAL
+
+    Yields:
+        Tuples of (1-based page number, page text)
+    """
+    total_pages = len(doc)
+    update = throttle_progress(progress_callback)
+
+    for page_number in range(total_pages):
+        text = doc.load_page(page_number).get_text("text")
+        update(page_number + 1, total_pages)
+        yield page_number + 1, text
+
+
+def extract_pdf_text(doc, progress_callback: Optional[ProgressCallback] = None) -> str:
+    """
+    Extract the full text of an open PDF.
+
+    Args:
+        doc: Open PyMuPDF document
+        progress_callback: Optional function called as ``callback(done, total)``
+
+    Returns:
+        Page texts separated by blank lines, stripped of surrounding whitespace
+    """
+    return "\n\n".join(text for _, text in iter_pdf_pages(doc, progress_callback)).strip()
+
+
+# Document opened once per worker process by _init_worker
+_worker_doc = None
+
+
+def _init_worker(source: Union[str, bytes]) -> None:
+    """Open the shared PDF once in a worker process."""
+    global _worker_doc
+    if isinstance(source, bytes):
+        _worker_doc = fitz.open(stream=source, filetype="pdf")
+    else:
+        _worker_doc = fitz.open(source)
+
+
+def _extract_page_range(start: int, stop: int) -> List[str]:
+    """Extract the text of pages [start, stop) in a worker process."""
+    return [_worker_doc.load_page(page_number).get_text("text") for page_number in range(start, stop)]
+
+
+def extract_pdf_text_parallel(
+    source: Union[str, Path, bytes],
+    workers: int = None,
+    progress_callback: Optional[ProgressCallback] = None
+) -> str:
+    """
+    Extract the full text of a PDF using a pool of worker processes.
+
+    Each worker opens the document once (from the file path, or from the bytes
+    sent when the worker starts) and extracts contiguous page ranges. Page texts
+    are merged back in page order. Small documents and ``workers=1`` fall back
+    to serial extraction in the calling process.
+
+    Args:
+        source: Path to the PDF file or its raw bytes
+        workers: Number of worker processes (defaults to the PDF_WORKERS setting)
+        progress_callback: Optional function called as ``callback(done, total)``
+            from the calling thread as page ranges finish
+
+    Returns:
+        Page texts separated by blank lines, stripped of surrounding whitespace
+    """
+    workers = workers or default_pdf_workers
+    if not isinstance(source, bytes):
+        source = str(source)
+
+    if isinstance(source, bytes):
+        doc = fitz.open(stream=source, filetype="pdf")
+    else:
+        doc = fitz.open(source)
+
+    total_pages = len(doc)
+    workers = min(workers, os.cpu_count() or 1, max(total_pages // MIN_PAGES_PER_WORKER, 1))
+    if workers <= 1:
+        try:
+            return extract_pdf_text(doc, progress_callback)
+        finally:
+            doc.close()
+    doc.close()
+
+    batch_size = max(total_pages // (workers * BATCHES_PER_WORKER), 1)
+    ranges = [(start, min(start + batch_size, total_pages)) for start in range(0, total_pages, batch_size)]
+    page_texts = [None] * len(ranges)
+    update = throttle_progress(progress_callback)
+    done = 0
+
+    # Spawned workers are safe to start from threaded hosts such as Streamlit
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(source,)) as executor:
+        futures = {executor.submit(_extract_page_range, start, stop): index for index, (start, stop) in enumerate(ranges)}
+        for future in as_completed(futures):
+            index = futures[future]
+            page_texts[index] = future.result()
+            done += len(page_texts[index])
+            update(done, total_pages)
+
+    return "\n\n".join(text for batch in page_texts for text in batch).strip()
@@ -0,0 +1,243 @@
+"""
+MPAgent Pipeline
+
+This module runs the analysis of a management plan end to end without the
+Streamlit interface:
+
+1. Text extraction from the PDF (and, optionally, its section index)
+2. Section routing and token-budgeted chunking per extractor
+3. Concurrent extraction over the chunks and merging of the results
+4. Concurrent analytical evaluation of the merged results
+
+The Streamlit app, the benchmarks and batch tools share these functions.
+"""
+
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import fitz  # PyMuPDF
+from dotenv import load_dotenv
+
+from extraction_modules import extract_chunks, chunk_budget, default_model
+from analytical_modules import analyze_all
+from document_sections import find_sections, route_sections
+from text_chunking import chunk_text
+from result_merging import merge_extraction_results
+from pdf_processing import extract_pdf_text, extract_pdf_text_parallel
+from instrumentation import traced, set_attributes
+
+# Load environment variables
+load_dotenv()
+
+# Tokens of context repeated between consecutive chunks
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "100"))
+
+# Progress callback of the whole pipeline: callback(stage, done, total)
+PipelineProgress = Callable[[str, int, int], None]
+
+
+class DocumentError(Exception):
+    """Raised when a PDF cannot be read; the message is meant for the user."""
+
+
+def index_document_sections(doc) -> list:
+    """Build the section index of an open PDF from its headings."""
+    try:
+        return find_sections(doc)
+    except Exception:
+        # Without an index every extractor simply reads the full text
+        return []
+
+
+@traced("pdf.read")
+def read_pdf(
+    pdf_path: Union[str, Path],
+    workers: int = 1,
+    index_sections: bool = False,
+    progress_callback: Optional[Callable[[int, int], None]] = None
+) -> Tuple[str, list, int]:
+    """
+    Extract the text of a PDF, optionally across several processes.
+
+    The document is opened once; when requested, the section index is built from
+    the same open document.
+
+    Args:
+        pdf_path: PDF file
+        workers: Processes used for text extraction (1 extracts in this process)
+        index_sections: Whether to detect the document's sections
+        progress_callback: Optional function called as ``callback(done, total)`` per page
+
+    Returns:
+        Tuple of (full text, sections, page count)
+
+    Raises:
+        DocumentError: If the PDF is empty, encrypted, damaged or has no text
+    """
+    try:
+        doc = fitz.open(pdf_path)
+    except fitz.FileDataError as e:
+        if "password" in str(e).lower():
+            raise DocumentError("El PDF está protegido con contraseña.") from e
+        raise DocumentError("El archivo no es un PDF válido o está dañado.") from e
+    except fitz.EmptyFileError as e:
+        raise DocumentError("El archivo PDF está vacío.") from e
+
+    try:
+        if doc.needs_pass:
+            raise DocumentError("El PDF está protegido con contraseña.")
+        total_pages = len(doc)
+        set_attributes(pages=total_pages, workers=workers)
+        if total_pages == 0:
+            raise DocumentError("El archivo PDF está vacío.")
+
+        # Pages are streamed and joined once; progress updates are throttled
+        if workers > 1:
+            full_text = extract_pdf_text_parallel(pdf_path, workers=workers, progress_callback=progress_callback)
+        else:
+            full_text = extract_pdf_text(doc, progress_callback=progress_callback)
+
+        sections = index_document_sections(doc) if index_sections else []
+    finally:
+        doc.close()
+
+    if not full_text:
+        raise DocumentError("El PDF no contiene texto extraíble.")
+
+    return full_text, sections, total_pages
+
+
+@traced("chunking")
+def split_text_into_chunks(text, chunk_size=None, model_name=None):
+    """
+    Split text into chunks of at most chunk_size model tokens at paragraph and heading boundaries.
+
+    The chunk size is capped at the model's budget, so a manual setting cannot
+    overflow the context window.
+    """
+    budget = chunk_budget(model_name)
+    chunks = chunk_text(
+        text,
+        model_name=model_name,
+        max_tokens=min(chunk_size, budget) if chunk_size else budget,
+        overlap_tokens=CHUNK_OVERLAP_TOKENS
+    )
+    set_attributes(characters=len(text), chunks=len(chunks))
+    return chunks
+
+
+def build_chunks(text: str, sections: list, chunk_size: int = None, model_name: str = None) -> Dict[str, List[str]]:
+    """
+    Route each extractor to its sections and split them into chunks.
+
+    Args:
+        text: Full document text, used by extractors whose sections were not found
+        sections: Section index from read_pdf (empty to send the full text everywhere)
+        chunk_size: Maximum chunk size in tokens (defaults to the model's budget)
+        model_name: Model name used for token counting
+
+    Returns:
+        Dictionary mapping each extractor key to its chunks
+    """
+    return {
+        key: split_text_into_chunks(section_text, chunk_size=chunk_size, model_name=model_name)
+        for key, section_text in route_sections(sections, text).items()
+    }
+
+
+@traced("analyze_document")
+def analyze_document(
+    pdf_path: Union[str, Path],
+    model_name: str = None,
+    chunk_size: int = None,
+    pdf_workers: int = 1,
+    route_by_section: bool = True,
+    max_workers: int = None,
+    use_cache: bool = True,
+    extractors: Optional[Dict[str, Any]] = None,
+    evaluators: Optional[Dict[str, Any]] = None,
+    document_id: str = None,
+    progress_callback: Optional[PipelineProgress] = None,
+    document_cache: Any = None
+) -> Dict[str, Any]:
+    """
+    Run the whole analysis of a management plan.
+
+    Args:
+        pdf_path: PDF file
+        model_name: Model name to use (defaults to environment setting or gpt-4)
+        chunk_size: Maximum chunk size in tokens (defaults to the model's budget)
+        pdf_workers: Processes used for text extraction
+        route_by_section: Whether to send each extractor only its relevant sections
+        max_workers: Maximum concurrent LLM requests (defaults to MAX_CONCURRENT_REQUESTS)
+        use_cache: Whether to reuse cached responses
+        extractors: Extractor instances (defaults to the shared instances for the model)
+        evaluators: Evaluator instances (defaults to the shared instances for the model)
+        document_id: Content hash of the document, used to checkpoint and resume extraction
+        progress_callback: Optional function called as ``callback(stage, done, total)``
+            with stage "pdf", "extraction" or "analysis"
+        document_cache: Optional document_cache.DocumentCache serving the text and
+            chunks of documents already read (used only with a ``document_id``)
+
+    Returns:
+        Report with the document text, page and chunk counts, merged
+        extraction results, analysis results and any per-chunk or
+        per-analysis errors
+    """
+    model_name = model_name or default_model
+
+    def report_progress(stage: str) -> Optional[Callable[[int, int], None]]:
+        if not progress_callback:
+            return None
+        return lambda done, total: progress_callback(stage, done, total)
+
+    if document_cache is not None and document_id:
+        text, sections, pages = document_cache.read_pdf(
+            document_id, pdf_path, pdf_workers, route_by_section, report_progress("pdf")
+        )
+        chunks = document_cache.build_chunks(document_id, text, sections, chunk_size=chunk_size, model_name=model_name)
+    else:
+        text, sections, pages = read_pdf(pdf_path, pdf_workers, route_by_section, report_progress("pdf"))
+        chunks = build_chunks(text, sections, chunk_size=chunk_size, model_name=model_name)
+
+    chunk_results = extract_chunks(
+        chunks,
+        model_name=model_name,
+        max_workers=max_workers,
+        progress_callback=report_progress("extraction"),
+        use_cache=use_cache,
+        extractors=extractors,
+        document_id=document_id
+    )
+    errors = [
+        f"{key}, fragmento {index + 1}: {result['error']}"
+        for key, results in chunk_results.items()
+        for index, result in enumerate(results)
+        if "error" in result
+    ]
+    extracted_data = merge_extraction_results(chunk_results)
+
+    if progress_callback:
+        progress_callback("analysis", 0, 1)
+    analysis_results = analyze_all(
+        extracted_data["zonation"],
+        extracted_data["objectives"],
+        extracted_data["literature"],
+        model_name=model_name,
+        use_cache=use_cache,
+        evaluators=evaluators
+    )
+    errors.extend(f"{name}: {result['error']}" for name, result in analysis_results.items() if "error" in result)
+    if progress_callback:
+        progress_callback("analysis", 1, 1)
+
+    return {
+        "document_hash": document_id,
+        "model_name": model_name,
+        "pages": pages,
+        "chunks": {key: len(key_chunks) for key, key_chunks in chunks.items()},
+        "text": text,
+        "extracted_data": extracted_data,
+        "analysis_results": analysis_results,
+        "errors": errors
+    }
@@ -0,0 +1,124 @@
+"""
+MPAgent Prompt Encoding
+
+This module turns extraction results into the compact text the analytical
+evaluators send to the model. Indented JSON spends a large share of the prompt
+on whitespace, braces and repeated keys, so inputs are encoded either as
+numbered lines (the default) or as minified JSON, and fields an evaluator does
+not read are dropped:
+
+- MPA Guide: zone names and regulations (boundaries do not affect the category)
+- SMART: objective texts
+- Congruence: objective texts and the authors, year and title of each reference
+
+The encoding is selected with PROMPT_INPUT_FORMAT ("lines" or "json").
+"""
+
+import os
+import json
+from typing import Any, Dict, List
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Encoding of evaluator inputs: "lines" (numbered lines) or "json" (minified JSON)
+default_input_format = os.getenv("PROMPT_INPUT_FORMAT", "lines")
+
+INPUT_FORMATS = ("lines", "json")
+
+# Reference fields the congruence analysis reads
+REFERENCE_FIELDS = ("autores", "ano_publicacion", "titulo")
+
+
+def _minified(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _check_format(input_format: str) -> str:
+    input_format = input_format or default_input_format
+    if input_format not in INPUT_FORMATS:
+        raise ValueError(f"Formato de entrada desconocido: {input_format}")
+    return input_format
+
+
+def _reference_fields(reference: Any) -> Any:
+    """Keep the fields of a reference used to relate it to objectives (plain citations are kept whole)."""
+    if not isinstance(reference, dict):
+        return str(reference)
+    return {field: reference[field] for field in REFERENCE_FIELDS if reference.get(field)}
+
+
+def _reference_line(reference: Any) -> str:
+    fields = _reference_fields(reference)
+    if isinstance(fields, str):
+        return fields
+    year = f" ({fields['ano_publicacion']})" if "ano_publicacion" in fields else ""
+    return f"{fields.get('autores', 'Sin autor')}{year}. {fields.get('titulo', 'Sin título')}"
+
+
+def _numbered(lines: List[str], prefix: str = "") -> str:
+    return "\n".join(f"{prefix}{number}. {line}" for number, line in enumerate(lines, 1))
+
+
+def encode_zones(zonation_data: Dict, input_format: str = None) -> str:
+    """
+    Encode zones and their regulations for the MPA Guide evaluation.
+
+    Args:
+        zonation_data: Zonation results with a "zonas" list
+        input_format: "lines" or "json" (defaults to PROMPT_INPUT_FORMAT)
+
+    Returns:
+        Encoded zones
+    """
+    zones = [
+        {"nombre_zona": zone.get("nombre_zona", "Sin nombre"), "regulaciones": zone.get("regulaciones") or []}
+        for zone in (zonation_data or {}).get("zonas") or []
+        if isinstance(zone, dict)
+    ]
+    if _check_format(input_format) == "json":
+        return _minified(zones)
+    return "\n".join(
+        f"{number}. {zone['nombre_zona']}: " + ("; ".join(map(str, zone["regulaciones"])) or "sin regulaciones")
+        for number, zone in enumerate(zones, 1)
+    )
+
+
+def encode_objectives(objectives_data: Dict, input_format: str = None) -> str:
+    """
+    Encode conservation objectives for the SMART evaluation.
+
+    Args:
+        objectives_data: Objectives results with an "objetivos_conservacion" list
+        input_format: "lines" or "json" (defaults to PROMPT_INPUT_FORMAT)
+
+    Returns:
+        Encoded objectives
+    """
+    objectives = [str(objective) for objective in (objectives_data or {}).get("objetivos_conservacion") or []]
+    if _check_format(input_format) == "json":
+        return _minified(objectives)
+    return _numbered(objectives)
+
+
+def encode_congruence(objectives_data: Dict, literature_data: Dict, input_format: str = None) -> str:
+    """
+    Encode objectives and references for the literature congruence analysis.
+
+    Args:
+        objectives_data: Objectives results with an "objetivos_conservacion" list
+        literature_data: Literature results with a "referencias_bibliograficas" list
+        input_format: "lines" or "json" (defaults to PROMPT_INPUT_FORMAT)
+
+    Returns:
+        Encoded objectives followed by the encoded references
+    """
+    objectives = [str(objective) for objective in (objectives_data or {}).get("objetivos_conservacion") or []]
+    references = (literature_data or {}).get("referencias_bibliograficas") or []
+    if _check_format(input_format) == "json":
+        return _minified({"objetivos": objectives, "referencias": [_reference_fields(ref) for ref in references]})
+    return (
+        "Objetivos:\n" + _numbered(objectives)
+        + "\n\nReferencias:\n" + _numbered([_reference_line(ref) for ref in references], prefix="R")
+    )
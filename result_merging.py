@@ -0,0 +1,147 @@
+"""
+MPAgent Result Merging
+
+This module merges per-chunk extraction results into a single result per
+extractor. Items are deduplicated through hash sets of normalised keys, so the
+merge runs in linear time and catches duplicates that differ only in case,
+accents, punctuation or whitespace. Zones extracted from several chunks are
+merged by name and their regulations combined.
+"""
+
+import re
+import unicodedata
+from typing import Any, Dict, List
+
+# Placeholder the extractors use for missing fields
+NOT_SPECIFIED = "no especificado"
+
+
+def normalize_text(value: Any) -> str:
+    """
+    Build a comparison key for a piece of text.
+
+    Case, accents, punctuation and runs of whitespace are ignored.
+
+    Args:
+        value: Text (other values are converted with str)
+
+    Returns:
+        Normalised key
+    """
+    text = unicodedata.normalize("NFKD", str(value))
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def _is_specified(value: Any) -> bool:
+    """Check whether a field holds real content rather than a placeholder."""
+    return bool(value) and normalize_text(value) != NOT_SPECIFIED
+
+
+def reference_key(reference: Any) -> str:
+    """
+    Build the deduplication key of a bibliographic reference.
+
+    Structured references are keyed by authors, title and year; plain strings by
+    their whole normalised text.
+    """
+    if isinstance(reference, dict):
+        fields = [reference.get(field, "") for field in ("autores", "titulo", "ano_publicacion")]
+        if any(_is_specified(field) for field in fields):
+            return "|".join(normalize_text(field) for field in fields)
+        return "|".join(f"{key}={normalize_text(value)}" for key, value in sorted(reference.items()))
+    return normalize_text(reference)
+
+
+def merge_zones(zone_lists: List[List[Dict]]) -> List[Dict]:
+    """
+    Merge zones extracted from several chunks.
+
+    Zones with the same normalised ``nombre_zona`` become one zone whose
+    regulations are the union of theirs, in first-seen order. The first
+    specified ``limites`` is kept.
+
+    Args:
+        zone_lists: Zone lists, one per chunk, in chunk order
+
+    Returns:
+        Merged list of zones
+    """
+    merged = {}
+    regulation_keys = {}
+
+    for zones in zone_lists:
+        for zone in zones:
+            if not isinstance(zone, dict):
+                continue
+            name = zone.get("nombre_zona", "")
+            key = normalize_text(name) if _is_specified(name) else reference_key(zone)
+
+            if key not in merged:
+                merged[key] = {**zone, "regulaciones": []}
+                regulation_keys[key] = set()
+            elif not _is_specified(merged[key].get("limites")) and _is_specified(zone.get("limites")):
+                merged[key]["limites"] = zone["limites"]
+
+            # A single regulation may come back as a bare string or object instead of a list
+            regulations = zone.get("regulaciones") or []
+            if not isinstance(regulations, list):
+                regulations = [regulations]
+
+            for regulation in regulations:
+                regulation_key = normalize_text(regulation)
+                if regulation_key not in regulation_keys[key]:
+                    regulation_keys[key].add(regulation_key)
+                    merged[key]["regulaciones"].append(regulation)
+
+    return list(merged.values())
+
+
+def dedupe(items: List[Any], key_function=normalize_text) -> List[Any]:
+    """
+    Remove duplicates from a list, keeping the first occurrence.
+
+    Args:
+        items: Items to deduplicate
+        key_function: Function mapping an item to its comparison key
+
+    Returns:
+        Items with duplicate keys removed, in original order
+    """
+    seen = set()
+    unique = []
+    for item in items:
+        key = key_function(item)
+        if key not in seen:
+            seen.add(key)
+            unique.append(item)
+    return unique
+
+
+def merge_extraction_results(chunk_results: Dict[str, List[Dict]]) -> Dict[str, Dict[str, List]]:
+    """
+    Merge per-chunk extraction results.
+
+    Args:
+        chunk_results: Dictionary mapping "zonation", "objectives" and
+            "literature" to their per-chunk results, as returned by
+            extraction_modules.extract_chunks
+
+    Returns:
+        Dictionary with the merged "zonation", "objectives" and "literature" results
+    """
+    def items(key: str, result_key: str) -> List[Any]:
+        return [item for result in chunk_results.get(key, []) for item in (result or {}).get(result_key) or []]
+
+    return {
+        "zonation": {
+            "zonas": merge_zones([(result or {}).get("zonas") or [] for result in chunk_results.get("zonation", [])])
+        },
+        "objectives": {
+            "objetivos_conservacion": dedupe(items("objectives", "objetivos_conservacion"))
+        },
+        "literature": {
+            "referencias_bibliograficas": dedupe(items("literature", "referencias_bibliograficas"), reference_key)
+        }
+    }
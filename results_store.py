@@ -0,0 +1,328 @@
+"""
+MPAgent Results Store
+
+This module persists finished analyses in a local SQLite database so a past
+report can be reopened without calling the language model again.
+
+Results are stored in normalised tables: one row per analysis (indexed by
+document hash, MPA name and model) plus one row per zone, objective, reference
+and evaluation item. Each item keeps its searchable fields as columns and its
+full content as JSON, and a whole report is loaded back with a single indexed
+query. Document text is stored compressed in its own table, once per document.
+"""
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Results store configuration from environment
+default_results_path = os.getenv("RESULTS_DB_PATH", "./data/results.sqlite3")
+
+# Item lists of a report: (section, result key, list key) -> (table, fixed evaluation name)
+ITEM_LISTS = {
+    ("extracted_data", "zonation", "zonas"): ("zones", None),
+    ("extracted_data", "objectives", "objetivos_conservacion"): ("objectives", None),
+    ("extracted_data", "literature", "referencias_bibliograficas"): ("citations", None),
+    ("analysis_results", "mpa_guide_evaluation", "evaluacion_zonas"): ("evaluations", "mpa_guide"),
+    ("analysis_results", "smart_criteria_evaluation", "evaluacion_objetivos"): ("evaluations", "smart"),
+    ("analysis_results", "literature_congruence_analysis", "congruencia_tematica"): ("evaluations", "congruence"),
+}
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS analyses (
+        id INTEGER PRIMARY KEY,
+        document_hash TEXT NOT NULL,
+        model_name TEXT NOT NULL,
+        mpa_name TEXT,
+        source TEXT,
+        pages INTEGER,
+        summary TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        UNIQUE (document_hash, model_name)
+    );
+    CREATE INDEX IF NOT EXISTS analyses_mpa_name ON analyses (mpa_name);
+    CREATE INDEX IF NOT EXISTS analyses_model_name ON analyses (model_name, created_at);
+
+    CREATE TABLE IF NOT EXISTS documents (
+        document_hash TEXT PRIMARY KEY,
+        text BLOB NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS zones (
+        analysis_id INTEGER NOT NULL REFERENCES analyses (id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        name TEXT,
+        data TEXT NOT NULL,
+        PRIMARY KEY (analysis_id, position)
+    );
+    CREATE INDEX IF NOT EXISTS zones_name ON zones (name);
+
+    CREATE TABLE IF NOT EXISTS objectives (
+        analysis_id INTEGER NOT NULL REFERENCES analyses (id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        text TEXT,
+        data TEXT NOT NULL,
+        PRIMARY KEY (analysis_id, position)
+    );
+
+    CREATE TABLE IF NOT EXISTS citations (
+        analysis_id INTEGER NOT NULL REFERENCES analyses (id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        authors TEXT,
+        title TEXT,
+        year TEXT,
+        data TEXT NOT NULL,
+        PRIMARY KEY (analysis_id, position)
+    );
+
+    CREATE TABLE IF NOT EXISTS evaluations (
+        analysis_id INTEGER NOT NULL REFERENCES analyses (id) ON DELETE CASCADE,
+        evaluation TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        subject TEXT,
+        data TEXT NOT NULL,
+        PRIMARY KEY (analysis_id, evaluation, position)
+    );
+"""
+
+# Loads the latest analysis of a document and all of its items in one statement
+_LOAD_QUERY = """
+    WITH target AS (
+        SELECT id, summary FROM analyses
+        WHERE document_hash = :document_hash AND (:model_name IS NULL OR model_name = :model_name)
+        ORDER BY created_at DESC LIMIT 1
+    )
+    SELECT 'summary', NULL, 0, summary FROM target
+    UNION ALL SELECT 'zones', NULL, position, data FROM zones WHERE analysis_id = (SELECT id FROM target)
+    UNION ALL SELECT 'objectives', NULL, position, data FROM objectives WHERE analysis_id = (SELECT id FROM target)
+    UNION ALL SELECT 'citations', NULL, position, data FROM citations WHERE analysis_id = (SELECT id FROM target)
+    UNION ALL SELECT 'evaluations', evaluation, position, data FROM evaluations WHERE analysis_id = (SELECT id FROM target)
+    ORDER BY 1, 2, 3
+"""
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _field(item: Any, key: str) -> Optional[str]:
+    """Return a searchable field of a list item (plain strings are their own text)."""
+    if isinstance(item, dict):
+        value = item.get(key)
+        return None if value is None else str(value)
+    return str(item) if key is None else None
+
+
+class ResultsStore:
+    """
+    SQLite-backed store of finished analyses.
+
+    The store is safe to share between threads; all access goes through a single
+    connection guarded by a lock.
+    """
+
+    def __init__(self, path: str = None):
+        """
+        Initialize the results store.
+
+        Args:
+            path: SQLite database file (defaults to RESULTS_DB_PATH)
+        """
+        self.path = Path(path or default_results_path)
+
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def save(
+        self,
+        document_hash: str,
+        model_name: str,
+        extracted_data: Dict[str, Any],
+        analysis_results: Dict[str, Any],
+        mpa_name: str = None,
+        source: str = None,
+        pages: int = None,
+        text: str = None
+    ) -> int:
+        """
+        Store an analysis, replacing any earlier analysis of the document with the same model.
+
+        Args:
+            document_hash: Content hash of the document
+            model_name: Model the analysis was made with
+            extracted_data: Merged extraction results ("zonation", "objectives", "literature")
+            analysis_results: Results of analytical_modules.analyze_all
+            mpa_name: Name of the protected area, for lookups
+            source: Original file name or path
+            pages: Page count of the document
+            text: Extracted document text, stored compressed once per document
+
+        Returns:
+            Id of the stored analysis
+        """
+        sections = {"extracted_data": extracted_data or {}, "analysis_results": analysis_results or {}}
+
+        # Everything except the item lists goes into the summary (messages, gaps, errors)
+        summary = {
+            "document_hash": document_hash, "model_name": model_name, "mpa_name": mpa_name,
+            "source": source, "pages": pages, "created_at": time.time(),
+            "extracted_data": {}, "analysis_results": {}
+        }
+        for section, results in sections.items():
+            for key, result in results.items():
+                if key == "text":
+                    continue
+                summary[section][key] = {
+                    name: value for name, value in (result or {}).items()
+                    if (section, key, name) not in ITEM_LISTS
+                }
+
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM analyses WHERE document_hash = ? AND model_name = ?", (document_hash, model_name)
+            )
+            cursor = self._conn.execute(
+                "INSERT INTO analyses (document_hash, model_name, mpa_name, source, pages, summary, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (document_hash, model_name, mpa_name, source, pages, _dumps(summary), summary["created_at"])
+            )
+            analysis_id = cursor.lastrowid
+
+            for (section, key, name), (table, evaluation) in ITEM_LISTS.items():
+                items = (sections[section].get(key) or {}).get(name) or []
+                rows = list(enumerate(items))
+                if table == "zones":
+                    self._conn.executemany(
+                        "INSERT INTO zones VALUES (?, ?, ?, ?)",
+                        [(analysis_id, i, _field(item, "nombre_zona"), _dumps(item)) for i, item in rows]
+                    )
+                elif table == "objectives":
+                    self._conn.executemany(
+                        "INSERT INTO objectives VALUES (?, ?, ?, ?)",
+                        [(analysis_id, i, _field(item, None), _dumps(item)) for i, item in rows]
+                    )
+                elif table == "citations":
+                    self._conn.executemany(
+                        "INSERT INTO citations VALUES (?, ?, ?, ?, ?, ?)",
+                        [(analysis_id, i, _field(item, "autores"), _field(item, "titulo") or _field(item, None),
+                          _field(item, "ano_publicacion"), _dumps(item)) for i, item in rows]
+                    )
+                else:
+                    self._conn.executemany(
+                        "INSERT INTO evaluations VALUES (?, ?, ?, ?, ?)",
+                        [(analysis_id, evaluation, i, _field(item, "nombre_zona") or _field(item, "objetivo"), _dumps(item))
+                         for i, item in rows]
+                    )
+
+            if text is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO documents (document_hash, text) VALUES (?, ?)",
+                    (document_hash, zlib.compress(text.encode("utf-8")))
+                )
+            self._conn.commit()
+
+        return analysis_id
+
+    def load(self, document_hash: str, model_name: str = None) -> Optional[Dict[str, Any]]:
+        """
+        Load a stored analysis.
+
+        Args:
+            document_hash: Content hash of the document
+            model_name: Model of the analysis (defaults to the latest analysis with any model)
+
+        Returns:
+            Dictionary with the analysis metadata, "extracted_data" and
+            "analysis_results" shaped as when they were saved, or None if the
+            document has no stored analysis
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                _LOAD_QUERY, {"document_hash": document_hash, "model_name": model_name}
+            ).fetchall()
+
+        if not rows:
+            return None
+
+        items = {}
+        report = None
+        for table, evaluation, _, data in rows:
+            if table == "summary":
+                report = json.loads(data)
+            else:
+                items.setdefault((table, evaluation), []).append(json.loads(data))
+
+        for (section, key, name), location in ITEM_LISTS.items():
+            report[section].setdefault(key, {})[name] = items.get(location, [])
+        return report
+
+    def load_text(self, document_hash: str) -> Optional[str]:
+        """Return the stored text of a document, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM documents WHERE document_hash = ?", (document_hash,)
+            ).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def list_analyses(self, mpa_name: str = None, model_name: str = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        List stored analyses, newest first.
+
+        Args:
+            mpa_name: Only analyses whose MPA name contains this text
+            model_name: Only analyses made with this model
+            limit: Maximum number of analyses returned
+
+        Returns:
+            Analysis metadata dictionaries
+        """
+        query = "SELECT document_hash, model_name, mpa_name, source, pages, created_at FROM analyses WHERE 1 = 1"
+        params = []
+        if mpa_name:
+            query += " AND mpa_name LIKE ?"
+            params.append(f"%{mpa_name}%")
+        if model_name:
+            query += " AND model_name = ?"
+            params.append(model_name)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        columns = ("document_hash", "model_name", "mpa_name", "source", "pages", "created_at")
+        return [dict(zip(columns, row)) for row in rows]
+
+    def delete_document(self, document_hash: str) -> None:
+        """Remove every stored analysis and the text of a document."""
+        with self._lock:
+            self._conn.execute("DELETE FROM analyses WHERE document_hash = ?", (document_hash,))
+            self._conn.execute("DELETE FROM documents WHERE document_hash = ?", (document_hash,))
+            self._conn.commit()
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_results_store() -> ResultsStore:
+    """Return the process-wide results store, creating it on first use."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ResultsStore()
+        return _default_store
@@ -0,0 +1,240 @@
+"""
+MPAgent Text Chunking
+
+This module splits document text into chunks measured in real model tokens. Chunks
+are packed up to a per-model budget that leaves room for the prompt template and
+the model's answer, and they break at paragraph and heading boundaries rather than
+in the middle of words.
+
+Token counting uses tiktoken when it is installed and falls back to a character
+based estimate otherwise; any other counter can be passed in explicitly.
+"""
+
+import re
+from functools import lru_cache
+from typing import Callable, Iterable, List, Optional, Union
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+# Context window (prompt + completion) of the supported models, in tokens
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 4096,
+    "gpt-3.5-turbo-16k": 16385,
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+}
+DEFAULT_CONTEXT_WINDOW = 4096
+
+# Share of the context window reserved for the model's answer, and its minimum
+OUTPUT_RESERVE_RATIO = 0.25
+MIN_OUTPUT_TOKENS = 512
+
+# Average characters per token for Spanish text, used when tiktoken is unavailable
+CHARS_PER_TOKEN = 3.5
+
+# Lines that look like section headings: numbered titles or short uppercase lines
+_HEADING_PATTERN = re.compile(
+    r"^(\d+(\.\d+)*\.?\s+[A-ZÁÉÍÓÚÑ]|[IVXLC]+[\.\)]\s+[A-ZÁÉÍÓÚÑ]|[A-ZÁÉÍÓÚÑ0-9\s,;:\-\(\)]{3,80}$)"
+)
+_SENTENCE_END = re.compile(r"(?<=[\.\!\?;:])\s+")
+
+# Tokens added by the blank line joining two blocks of a chunk
+SEPARATOR_TOKENS = 1
+
+TokenCounter = Callable[[str], int]
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(model_name: str = None) -> TokenCounter:
+    """
+    Get a function that counts tokens for a model.
+
+    Args:
+        model_name: OpenAI model name
+
+    Returns:
+        Function returning the number of tokens in a string
+    """
+    if tiktoken is not None:
+        try:
+            try:
+                encoding = tiktoken.encoding_for_model(model_name or "gpt-4")
+            except KeyError:
+                encoding = tiktoken.get_encoding("cl100k_base")
+            return lambda text: len(encoding.encode(text, disallowed_special=()))
+        except Exception:
+            # The encoding files could not be loaded (e.g. no network access)
+            pass
+
+    return lambda text: int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def context_window(model_name: str = None) -> int:
+    """Return the context window of a model, matching the longest known prefix."""
+    if model_name in MODEL_CONTEXT_WINDOWS:
+        return MODEL_CONTEXT_WINDOWS[model_name]
+    for name in sorted(MODEL_CONTEXT_WINDOWS, key=len, reverse=True):
+        if model_name and model_name.startswith(name):
+            return MODEL_CONTEXT_WINDOWS[name]
+    return DEFAULT_CONTEXT_WINDOW
+
+
+def chunk_token_budget(model_name: str = None, prompt_template: str = "", max_output_tokens: int = None) -> int:
+    """
+    Compute how many tokens of document text fit into one call.
+
+    Args:
+        model_name: OpenAI model name
+        prompt_template: Prompt the chunk is inserted into
+        max_output_tokens: Tokens reserved for the answer (defaults to a quarter
+            of the context window, at least MIN_OUTPUT_TOKENS)
+
+    Returns:
+        Token budget for a single chunk
+    """
+    window = context_window(model_name)
+    if max_output_tokens is None:
+        max_output_tokens = max(MIN_OUTPUT_TOKENS, int(window * OUTPUT_RESERVE_RATIO))
+    template_tokens = get_token_counter(model_name)(prompt_template)
+    return max(window - template_tokens - max_output_tokens, 1)
+
+
+def _is_heading(line: str) -> bool:
+    """Check whether a line looks like a section heading."""
+    line = line.strip()
+    return bool(line) and len(line) <= 80 and not line.endswith(".") and bool(_HEADING_PATTERN.match(line))
+
+
+def split_blocks(text: str) -> List[str]:
+    """
+    Split text into paragraphs, starting a new block at every heading.
+
+    Args:
+        text: Document text
+
+    Returns:
+        List of non-empty blocks
+    """
+    blocks = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        current = []
+        for line in paragraph.split("\n"):
+            if _is_heading(line) and current:
+                blocks.append("\n".join(current))
+                current = []
+            if line.strip():
+                current.append(line.rstrip())
+        if current:
+            blocks.append("\n".join(current))
+    return blocks
+
+
+def _split_oversized(block: str, max_tokens: int, count_tokens: TokenCounter) -> List[str]:
+    """Split a block larger than the budget at sentence, then word, boundaries."""
+    pieces = []
+    for sentence in _SENTENCE_END.split(block):
+        if count_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+            continue
+        words = sentence.split()
+        current = []
+        current_tokens = 0
+        for word in words:
+            word_tokens = count_tokens(word + " ")
+            if current and current_tokens + word_tokens > max_tokens:
+                pieces.append(" ".join(current))
+                current = []
+                current_tokens = 0
+            current.append(word)
+            current_tokens += word_tokens
+        if current:
+            pieces.append(" ".join(current))
+    return pieces
+
+
+def chunk_text(
+    text: Union[str, Iterable[str]],
+    model_name: str = None,
+    max_tokens: int = None,
+    overlap_tokens: int = 0,
+    count_tokens: Optional[TokenCounter] = None,
+    prompt_template: str = ""
+) -> List[str]:
+    """
+    Split text into chunks that fill, but do not exceed, a token budget.
+
+    Blocks (paragraphs and headed sections) are packed greedily. A chunk that is
+    at least half full is closed early when the next block is a heading, so
+    sections tend to start at the top of a chunk. Blocks larger than the budget
+    are split at sentence boundaries.
+
+    Args:
+        text: Document text, or an iterable of text pieces such as pages
+        model_name: OpenAI model name, used for token counting and the budget
+        max_tokens: Maximum tokens per chunk (defaults to chunk_token_budget)
+        overlap_tokens: Tokens of trailing context repeated at the start of the
+            next chunk
+        count_tokens: Token counting function (defaults to get_token_counter)
+        prompt_template: Prompt the chunks are inserted into, used for the
+            default budget
+
+    Returns:
+        List of text chunks
+    """
+    count_tokens = count_tokens or get_token_counter(model_name)
+    if max_tokens is None:
+        max_tokens = chunk_token_budget(model_name, prompt_template)
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    pieces = [text] if isinstance(text, str) else text
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    fresh = 0  # blocks in the current chunk that were not carried over as overlap
+
+    def flush() -> None:
+        nonlocal current, current_tokens, fresh
+        chunks.append("\n\n".join(block for block, _ in current))
+
+        # Carry the trailing blocks into the next chunk as overlap
+        carried = []
+        carried_tokens = 0
+        for block, tokens in reversed(current):
+            if carried_tokens + tokens > overlap_tokens:
+                break
+            carried.insert(0, (block, tokens))
+            carried_tokens += tokens + SEPARATOR_TOKENS
+        current = carried
+        current_tokens = carried_tokens
+        fresh = 0
+
+    for piece in pieces:
+        for block in split_blocks(piece):
+            tokens = count_tokens(block)
+            parts = [(block, tokens)] if tokens <= max_tokens else [
+                (part, count_tokens(part)) for part in _split_oversized(block, max_tokens, count_tokens)
+            ]
+
+            for part, part_tokens in parts:
+                too_big = current_tokens + part_tokens > max_tokens
+                starts_section = _is_heading(part.split("\n", 1)[0]) and current_tokens >= max_tokens // 2
+                if fresh and (too_big or starts_section):
+                    flush()
+                # Drop overlap that would not leave room for the new block
+                while current and current_tokens + part_tokens > max_tokens:
+                    current_tokens -= current.pop(0)[1] + SEPARATOR_TOKENS
+                current.append((part, part_tokens))
+                current_tokens += part_tokens + SEPARATOR_TOKENS
+                fresh += 1
+
+    if fresh:
+        chunks.append("\n\n".join(block for block, _ in current))
+
+    return chunks
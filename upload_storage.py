@@ -0,0 +1,111 @@
+"""
+MPAgent Upload Storage
+
+This module keeps uploaded management plans on disk under their content hash.
+The upload buffer is hashed and written once, without intermediate copies, and
+the resulting file is what PyMuPDF opens. Uploading the same document again maps
+to the same file, so duplicates are detected for free and the hash doubles as the
+document identifier for caches and stored results.
+
+Old uploads are removed by age and by count so the directory does not grow
+without bound.
+"""
+
+import os
+import time
+import uuid
+import hashlib
+from pathlib import Path
+from typing import Tuple, Union
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Upload storage configuration from environment
+upload_dir = Path(os.getenv("UPLOAD_DIR", "./temp_uploads"))
+retention_hours = float(os.getenv("UPLOAD_RETENTION_HOURS", "24"))
+max_uploads = int(os.getenv("UPLOAD_MAX_FILES", "50"))
+
+
+def content_hash(data: Union[bytes, memoryview]) -> str:
+    """Return the SHA-256 hex digest of a document's bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def store_upload(data: Union[bytes, memoryview], directory: Path = None) -> Tuple[Path, str, bool]:
+    """
+    Store an uploaded document under its content hash.
+
+    Args:
+        data: Document contents; a memoryview (e.g. from ``getbuffer()``) avoids
+            copying the upload
+        directory: Storage directory (defaults to UPLOAD_DIR)
+
+    Returns:
+        Tuple of (file path, content hash, whether the document was already stored)
+    """
+    directory = Path(directory or upload_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    digest = content_hash(data)
+    path = directory / f"{digest}.pdf"
+
+    try:
+        # Refresh the modification time so retention counts from the latest upload;
+        # unlike touch(), utime never recreates a file just removed by a cleanup
+        os.utime(path)
+        return path, digest, True
+    except FileNotFoundError:
+        pass
+
+    # Write to a temporary name first so readers never see a partial file; the name
+    # is unique per call since Streamlit sessions are threads of the same process
+    temp_path = directory / f".{digest}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, "wb") as handle:
+        handle.write(data)
+    os.replace(temp_path, path)
+
+    cleanup_uploads(directory)
+    return path, digest, False
+
+
+def cleanup_uploads(directory: Path = None, max_age_hours: float = None, max_files: int = None) -> int:
+    """
+    Delete uploads older than the retention period, then the oldest beyond the file limit.
+
+    Args:
+        directory: Storage directory (defaults to UPLOAD_DIR)
+        max_age_hours: Retention period in hours (defaults to UPLOAD_RETENTION_HOURS)
+        max_files: Maximum number of stored uploads (defaults to UPLOAD_MAX_FILES)
+
+    Returns:
+        Number of files removed
+    """
+    directory = Path(directory or upload_dir)
+    max_age_hours = retention_hours if max_age_hours is None else max_age_hours
+    max_files = max_uploads if max_files is None else max_files
+
+    if not directory.exists():
+        return 0
+
+    # Stat each file once; files removed meanwhile by another session are skipped
+    files = []
+    for path in directory.glob("*.pdf"):
+        try:
+            files.append((path.stat().st_mtime, path))
+        except FileNotFoundError:
+            continue
+    files.sort(reverse=True)
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+
+    for index, (mtime, path) in enumerate(files):
+        if index >= max_files or mtime < cutoff:
+            try:
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+
+    return removed